@@ -0,0 +1,110 @@
+"""
+Cold-start cost of the app and its pages: the time the module-level imports
+of each page take in a fresh interpreter, on top of `import streamlit`
+(paid once per server process whatever the page), and the heavy modules
+they load. Heavy modules are imported on first use (see utils.lazy), so no
+page should load them at start.
+
+    python -m benchmarks.startup [--repeats 5] [--page pages/jobs.py ...]
+
+Exits with status 1 if a page goes over its budget.
+"""
+import os
+import ast
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = ["streamlit_app.py"] + sorted(
+    os.path.join("pages", fname)
+    for fname in os.listdir(os.path.join(ROOT, "pages"))
+    if fname.endswith(".py") and fname != "__init__.py"
+)
+
+# Seconds of module-level imports allowed per page at cold start, beyond streamlit
+DEFAULT_BUDGET = 0.15
+PAGE_BUDGETS = {
+    # these import the run, rerun and isolation services and their executors
+    os.path.join("pages", "run_function.py"): 0.3,
+    os.path.join("pages", "rerun_function.py"): 0.3,
+}
+
+# Modules no page may load at start
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "utils.compare_dfs", "utils.fingerprint")
+
+# Run by a fresh interpreter: argv[1] is the import block of a page, argv[2] the heavy modules
+_PROBE = """
+import sys, json, time
+import streamlit
+start = time.perf_counter()
+exec(compile(sys.argv[1], "<page imports>", "exec"), {"__name__": "__page__"})
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "heavy_modules": [m for m in json.loads(sys.argv[2]) if m in sys.modules]}))
+"""
+
+
+def page_imports(page: str) -> str:
+    """The module-level import statements of a page, as source."""
+    with open(os.path.join(ROOT, page), encoding="utf-8") as f:
+        tree = ast.parse(f.read(), page)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def page_budget(page: str) -> float:
+    return PAGE_BUDGETS.get(page, DEFAULT_BUDGET)
+
+
+def measure_page(page: str, repeats: int = 5) -> dict:
+    """
+    Best and median seconds of the imports of page over repeats fresh
+    interpreters, the heavy modules they loaded, its budget and whether it
+    is over it (too slow, or any heavy module loaded).
+    Raises RuntimeError if the imports fail.
+    """
+    source = page_imports(page)
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+    times, heavy = [], set()
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, "-c", _PROBE, source, json.dumps(HEAVY_MODULES)],
+            cwd=ROOT, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"importing {page} failed:\n{completed.stderr}")
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        times.append(probe["seconds"])
+        heavy.update(probe["heavy_modules"])
+    budget = page_budget(page)
+    return {
+        "seconds": min(times),
+        "median": statistics.median(times),
+        "repeats": repeats,
+        "heavy_modules": sorted(heavy),
+        "budget": budget,
+        "over_budget": min(times) > budget or bool(heavy),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measures the cold-start imports of the app's pages.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--page", nargs="*", choices=PAGES, help="pages to measure, all by default")
+    args = parser.parse_args(argv)
+
+    over = 0
+    for page in args.page or PAGES:
+        result = measure_page(page, args.repeats)
+        over += result["over_budget"]
+        heavy = f" loads {', '.join(result['heavy_modules'])}" if result["heavy_modules"] else ""
+        status = "OVER BUDGET" if result["over_budget"] else "ok"
+        print(f"{page:<32} {result['seconds']:.3f}s (budget {result['budget']:.2f}s){heavy} {status}")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
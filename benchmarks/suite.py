@@ -0,0 +1,287 @@
+"""
+Self-benchmarks of the app's hot paths on synthetic workloads:
+
+    python -m benchmarks.suite [--scale smoke|default|full] [--only CASE ...]
+                               [--baseline data/benchmarks/<previous>.json]
+
+Results are written as JSON to data/benchmarks/<timestamp>.json, one entry
+per (case, operation, parameters). With --baseline, timings are compared
+with a previous results file and the process exits with status 1 if any
+operation got slower than --tolerance times its baseline. The startup case
+measures the cold-start imports of each page (see benchmarks.startup); a
+page over its budget also makes the process exit with status 1.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.startup import PAGES, measure_page
+from benchmarks.workloads import KEY_LAYOUTS, make_frame, make_parameter_space, make_results_tree, mutate_frame
+from services.compare_service import compare_run_data
+from services.execution_service import save_run
+from services.generation_service import generate_parameters
+from services.rerun_service import list_rerun_files
+from services.results_service import find_result_folders, list_run_files, load_run
+from utils.compare_dfs import compare_dfs, diff_cells, join_by_key_column
+from utils.resources import ResourceMeter
+
+BENCHMARKS_PATH = os.path.join("data", "benchmarks")
+
+# Bump whenever the workloads change, timings of different versions are not comparable
+SUITE_VERSION = 2
+
+SCALES = {
+    "smoke": {"rows": [1_000, 10_000], "files": [1_000], "params": [10, 100]},
+    "default": {"rows": [1_000, 10_000, 100_000, 1_000_000], "files": [1_000, 10_000], "params": [10, 100, 1_000]},
+    "full": {
+        "rows": [1_000, 10_000, 100_000, 1_000_000, 10_000_000],
+        "files": [1_000, 10_000, 100_000],
+        "params": [10, 100, 1_000],
+    },
+}
+
+
+def measure(fn: Callable[[], object], repeats: int) -> dict:
+    """Best and median wall time of repeats calls of fn, in seconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "median": statistics.median(times), "repeats": repeats}
+
+
+class _Recorder:
+    """
+    Collects results. Once an operation takes more than max_seconds for some
+    parameters, its larger sizes are recorded as skipped instead of run.
+    """
+
+    def __init__(self, repeats: int, max_seconds: float):
+        self.repeats = repeats
+        self.max_seconds = max_seconds
+        self.results: List[dict] = []
+        self._too_slow = set()
+
+    def run(
+            self,
+            case: str,
+            op: str,
+            params: dict,
+            fn: Callable[[], object],
+            series: str = "",
+            memory: bool = False,
+            **extra) -> None:
+        """With memory, fn is run once more under tracemalloc and peak_alloc (bytes) is recorded."""
+        entry = {"case": case, "op": op, "params": params}
+        if (case, op, series) in self._too_slow:
+            entry["skipped"] = True
+        else:
+            entry.update(measure(fn, self.repeats), **extra)
+            if memory:
+                with ResourceMeter() as meter:
+                    fn()
+                entry["peak_alloc"] = meter.usage["peak_alloc"]
+            if entry["seconds"] > self.max_seconds:
+                self._too_slow.add((case, op, series))
+        self.add(entry)
+
+    def add(self, entry: dict) -> None:
+        """Records an entry measured by the case itself."""
+        self.results.append(entry)
+        timing = "skipped" if entry.get("skipped") else f"{entry['seconds']:.4f}s"
+        if "peak_alloc" in entry:
+            timing += f" {entry['peak_alloc'] / 1024 ** 2:.1f} MB peak"
+        if entry.get("over_budget"):
+            timing += f" over its {entry['budget']}s budget"
+        print(f"{entry['case']:<18} {entry['op']:<20} {json.dumps(entry['params']):<50} {timing}", file=sys.stderr)
+
+
+def bench_frame_compare(recorder: _Recorder, scale: dict) -> None:
+    for rows in scale["rows"]:
+        before = make_frame(rows)
+        for layout, key_columns in KEY_LAYOUTS.items():
+            # without key columns rows are aligned by position, so keep the order
+            after = mutate_frame(before, shuffle=bool(key_columns))
+            params = {"rows": rows, "keys": layout}
+            run_before = {"result": before, "parameters": {}}
+            run_after = {"result": after, "parameters": {}}
+            recorder.run("frame_compare", "equals", params,
+                         lambda: compare_run_data("run", run_before, run_after, key_columns), series=layout)
+            recorder.run("frame_compare", "join_by_key_column", params,
+                         lambda: join_by_key_column(before, after, key_columns), series=layout, memory=True)
+            recorder.run("frame_compare", "diff_cells", params,
+                         lambda: diff_cells(before, after, key_columns), series=layout, memory=True)
+            recorder.run("frame_compare", "compare_dfs", params,
+                         lambda: compare_dfs(before, after, key_columns, "before", "after"), series=layout, memory=True)
+
+
+def bench_pickle_io(recorder: _Recorder, scale: dict) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run_20240101000000000000.pkl")
+        for rows in scale["rows"]:
+            run = {"result": make_frame(rows), "parameters": {"rows": rows}, "time": 0.0, "status": "ok"}
+            params = {"rows": rows}
+            recorder.run("pickle_io", "save_run", params, lambda: save_run(path, run))
+            size = os.path.getsize(path) if os.path.exists(path) else None
+            recorder.run("pickle_io", "load_run", params, lambda: load_run(path), bytes=size)
+
+
+def bench_folder_discovery(recorder: _Recorder, scale: dict) -> None:
+    for files in scale["files"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_results_tree(tmp, files)
+            fn_folder = os.path.join(tmp, "folder_0", "nested", "fn_0")
+            params = {"files": files}
+            recorder.run("folder_discovery", "find_result_folders", params,
+                         lambda: find_result_folders(tmp, "fn_0"))
+            recorder.run("folder_discovery", "list_run_files", params, lambda: list_run_files(fn_folder))
+            recorder.run("folder_discovery", "list_rerun_files", params, lambda: list_rerun_files(fn_folder))
+
+
+def bench_startup(recorder: _Recorder, scale: dict) -> None:
+    # the cold-start imports of each page do not depend on the scale
+    for page in PAGES:
+        recorder.add({"case": "startup", "op": "page_imports", "params": {"page": page},
+                      **measure_page(page, recorder.repeats)})
+
+
+def bench_parameter_generation(recorder: _Recorder, scale: dict, calls: int = 100) -> None:
+    for n_params in scale["params"]:
+        space = make_parameter_space(n_params)
+
+        def generate():
+            for _ in range(calls):
+                generate_parameters(space)
+
+        recorder.run("parameters", "generate_parameters", {"params": n_params, "calls": calls}, generate)
+
+
+CASES: Dict[str, Callable[[_Recorder, dict], None]] = {
+    "frame_compare": bench_frame_compare,
+    "pickle_io": bench_pickle_io,
+    "folder_discovery": bench_folder_discovery,
+    "parameters": bench_parameter_generation,
+    "startup": bench_startup,
+}
+
+
+def machine_info() -> dict:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def run_suite(
+        scale: str = "default",
+        only: Optional[List[str]] = None,
+        repeats: int = 3,
+        max_seconds: float = 60.0) -> dict:
+    """
+    Runs the selected cases (all by default) at the given scale and returns
+    the results document.
+    """
+    recorder = _Recorder(repeats, max_seconds)
+    started = datetime.now()
+    for name, case in CASES.items():
+        if only and name not in only:
+            continue
+        case(recorder, SCALES[scale])
+    return {
+        "suite_version": SUITE_VERSION,
+        "scale": scale,
+        "started": started.isoformat(),
+        "elapsed": (datetime.now() - started).total_seconds(),
+        "machine": machine_info(),
+        "results": recorder.results,
+    }
+
+
+def _result_key(entry: dict) -> str:
+    return json.dumps([entry["case"], entry["op"], entry["params"]], sort_keys=True)
+
+
+def compare_with_baseline(document: dict, baseline: dict, tolerance: float = 1.25) -> List[dict]:
+    """
+    Returns the operations measured in both documents with their time
+    ratio, flagged as regressions above tolerance.
+    Raises ValueError if the documents come from different suite versions.
+    """
+    if baseline.get("suite_version") != document["suite_version"]:
+        raise ValueError("The baseline was produced by a different version of the benchmark suite.")
+    baseline_times = {
+        _result_key(entry): entry["seconds"] for entry in baseline["results"] if not entry.get("skipped")
+    }
+    rows = []
+    for entry in document["results"]:
+        before = baseline_times.get(_result_key(entry))
+        if entry.get("skipped") or not before:
+            continue
+        ratio = entry["seconds"] / before
+        rows.append({
+            "case": entry["case"], "op": entry["op"], "params": entry["params"],
+            "baseline": before, "seconds": entry["seconds"], "ratio": ratio, "regression": ratio > tolerance,
+        })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks the app's hot paths on synthetic workloads.")
+    parser.add_argument("--scale", choices=list(SCALES), default="default")
+    parser.add_argument("--only", nargs="*", choices=list(CASES), help="cases to run, all by default")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=60.0,
+                        help="skip the larger sizes of an operation once it takes longer than this")
+    parser.add_argument("--out", default=BENCHMARKS_PATH, help="folder of the JSON results")
+    parser.add_argument("--baseline", help="previous results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    document = run_suite(args.scale, args.only, args.repeats, args.max_seconds)
+    if args.baseline:
+        with open(args.baseline) as f:
+            document["baseline"] = {
+                "path": args.baseline,
+                "tolerance": args.tolerance,
+                "comparison": compare_with_baseline(document, json.load(f), args.tolerance),
+            }
+
+    os.makedirs(args.out, exist_ok=True)
+    out_path = os.path.join(args.out, f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{args.scale}.json")
+    with open(out_path, "w") as f:
+        json.dump(document, f, indent=2)
+    print(out_path)
+
+    regressions = [row for row in document.get("baseline", {}).get("comparison", []) if row["regression"]]
+    for row in regressions:
+        print(
+            f"REGRESSION {row['case']} {row['op']} {json.dumps(row['params'])}: "
+            f"{row['baseline']:.4f}s -> {row['seconds']:.4f}s ({row['ratio']:.2f}x)",
+            file=sys.stderr,
+        )
+    over_budget = [entry for entry in document["results"] if entry.get("over_budget")]
+    for entry in over_budget:
+        print(
+            f"OVER BUDGET {entry['params']['page']}: {entry['seconds']:.3f}s (budget {entry['budget']}s)"
+            + (f", loads {', '.join(entry['heavy_modules'])}" if entry["heavy_modules"] else ""),
+            file=sys.stderr,
+        )
+    return 1 if regressions or over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Synthetic workloads for the self-benchmarks: result frames, results trees
+and parameter spaces shaped like the ones the app handles in production.
+"""
+import os
+from datetime import date
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from models.parameter_definition import ParameterDefinition
+
+# key columns of the synthetic frames: a unique int key, a composite key
+# with a low cardinality string, a composite key of strings only (repeated
+# labels), and no key (aligned by index)
+KEY_LAYOUTS = {
+    "unique_int": ["id"],
+    "composite_low_card": ["region", "id"],
+    "composite_strings": ["label", "region"],
+    "index": [],
+}
+
+REGIONS = np.array(["north", "south", "east", "west", "center"])
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    A frame with the dtypes results usually carry: int and string keys,
+    floats with NaNs, ints, a low cardinality category, strings, dates and bools.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=rows)
+    values[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "id": np.arange(rows, dtype="int64"),
+        "region": REGIONS[rng.integers(0, len(REGIONS), rows)],
+        "value": values,
+        "count": rng.integers(0, 1_000, rows),
+        "segment": pd.Categorical.from_codes(rng.integers(0, 20, rows), [f"s{i}" for i in range(20)]),
+        "label": pd.Series(rng.integers(0, 50_000, rows)).map("label_{}".format),
+        "as_of": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+        "flag": rng.random(rows) < 0.5,
+    })
+
+
+def mutate_frame(df: pd.DataFrame, rate: float = 0.001, seed: int = 1, shuffle: bool = True) -> pd.DataFrame:
+    """A copy of df with a fraction of rate of its values changed, and its rows shuffled."""
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    changed = rng.random(len(df)) < rate
+    df.loc[changed, "value"] = df.loc[changed, "value"] + 1.0
+    df.loc[rng.random(len(df)) < rate, "count"] += 1
+    if shuffle:
+        df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    return df
+
+
+def make_results_tree(root: str, files: int, folders: int = 10, fn_names: int = 5) -> None:
+    """
+    Lays out root/folder_<i>/nested/fn_<j>/run_*.pkl with files run files in total.
+    The run files are empty: discovery only looks at names.
+    """
+    per_dir = max(files // (folders * fn_names), 1)
+    n = 0
+    for i in range(folders):
+        for j in range(fn_names):
+            fn_folder = os.path.join(root, f"folder_{i}", "nested", f"fn_{j}")
+            os.makedirs(fn_folder, exist_ok=True)
+            for k in range(per_dir):
+                open(os.path.join(fn_folder, f"run_20240101{n:012d}.pkl"), "wb").close()
+                n += 1
+
+
+def make_parameter_space(params: int, list_length: int = 100) -> List[ParameterDefinition]:
+    """
+    params parameter definitions cycling through every type, sampling mode
+    (range or specific values) and list shape.
+    """
+    definitions = []
+    for i in range(params):
+        kind = i % 5
+        is_list = i % 3 == 0
+        length = (1, list_length) if is_list else None
+        if kind == 0:
+            definition = ParameterDefinition(f"p{i}", "int", range=(0, 1_000_000), is_list=is_list, list_length=length)
+        elif kind == 1:
+            definition = ParameterDefinition(f"p{i}", "float", range=(-1.0, 1.0), is_list=is_list, list_length=length)
+        elif kind == 2:
+            definition = ParameterDefinition(
+                f"p{i}", "date", range=(date(2000, 1, 1), "today"), is_list=is_list, list_length=length
+            )
+        elif kind == 3:
+            definition = ParameterDefinition(
+                f"p{i}", "str", specific_values=[f"v{j}" for j in range(1_000)], is_list=is_list, list_length=length
+            )
+        else:
+            definition = ParameterDefinition(f"p{i}", "boolean", specific_values=[True, False])
+        definitions.append(definition)
+    return definitions
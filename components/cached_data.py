@@ -0,0 +1,57 @@
+import os
+import json
+from typing import List
+
+import streamlit as st
+
+from services.estimate_service import TimingHistories
+from services.results_service import RunCache, find_result_folders, results_changed_at
+from services.storage_service import FUNCTION_CALLS_PATH
+
+# Folder listings are also refreshed after this delay, for folders created outside the app
+FOLDERS_TTL = 60
+# Total size of the results kept in memory by the run cache
+RUN_CACHE_MB = int(os.environ.get("FCHK_RUN_CACHE_MB", "512"))
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _read_function_calls(path: str, mtime_ns: int) -> list:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def cached_function_calls(path: str = FUNCTION_CALLS_PATH) -> List[dict]:
+    """
+    The raw function call definitions, read again only when the file changes.
+    Raises the same errors as reading the file directly (missing file, bad JSON).
+    """
+    return _read_function_calls(path, os.stat(path).st_mtime_ns)
+
+
+@st.cache_data(ttl=FOLDERS_TTL, max_entries=256, show_spinner=False)
+def _result_folders(base_results_path: str, fn_name: str, changed_at: int) -> list:
+    return find_result_folders(base_results_path, fn_name)
+
+
+def cached_result_folders(base_results_path: str, fn_name: str) -> list:
+    """
+    find_result_folders, cached until the app creates a results folder or
+    FOLDERS_TTL seconds have passed.
+    """
+    return _result_folders(base_results_path, fn_name, results_changed_at())
+
+
+def refresh_result_folders() -> None:
+    _result_folders.clear()
+
+
+@st.cache_resource(show_spinner=False)
+def run_cache() -> RunCache:
+    """Loaded run files shared by every session, up to RUN_CACHE_MB of results."""
+    return RunCache(RUN_CACHE_MB * 1024 * 1024)
+
+
+@st.cache_resource(show_spinner=False)
+def timing_histories() -> TimingHistories:
+    """Past run times of every function, read in the background and shared by every session."""
+    return TimingHistories()
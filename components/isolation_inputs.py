@@ -0,0 +1,23 @@
+import streamlit as st
+
+
+def isolation_inputs(key_prefix: str = "") -> dict:
+    """
+    Renders the limits of supervised worker processes and returns them as
+    IsolatedPool keyword arguments (0 means no limit).
+    """
+    col1, col2, col3 = st.columns(3)
+    timeout = col1.number_input(
+        "Timeout per call (s)", min_value=0.0, step=1.0, value=60.0, key=f"{key_prefix}_timeout"
+    )
+    max_rss_mb = col2.number_input(
+        "Memory limit per worker (MB)", min_value=0, step=256, value=0, key=f"{key_prefix}_max_rss"
+    )
+    max_calls = col3.number_input(
+        "Recycle workers after N calls", min_value=0, step=10, value=0, key=f"{key_prefix}_max_calls"
+    )
+    return {
+        "timeout": timeout or None,
+        "max_rss_mb": max_rss_mb or None,
+        "max_calls_per_worker": int(max_calls) or None,
+    }
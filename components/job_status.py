@@ -0,0 +1,39 @@
+import streamlit as st
+
+from services.job_service import ACTIVE_STATUSES, DONE, get_job_manager
+
+
+def job_status(job_id: str, log_lines: int = 20) -> dict:
+    """
+    Renders the live progress of a background job (refreshed every second
+    while it is queued or running), with a cancel button and the tail of its
+    log. Reruns the whole page once the job finishes, so the page can render
+    its outcome. Returns the job as it was when the page ran.
+    """
+    manager = get_job_manager()
+    job = manager.get(job_id)
+    if job is None:
+        st.warning(f"Job {job_id} not found.")
+        return {}
+
+    def render():
+        current = manager.get(job_id)
+        progress = current["progress"]
+        done, total = progress["done"], progress["total"]
+        label = f"{current['title']}: {current['status']}"
+        if total:
+            st.progress(min(done / total, 1.0), text=f"{label} ({done} / {total})")
+        else:
+            st.progress(0.0 if current["status"] != DONE else 1.0, text=label)
+        if current["status"] in ACTIVE_STATUSES:
+            if st.button("Cancel", key=f"cancel_{job_id}"):
+                manager.cancel(job_id)
+        with st.expander("Log"):
+            st.code("\n".join(manager.log_tail(job_id, log_lines)) or "(empty)")
+        if job["status"] in ACTIVE_STATUSES and current["status"] not in ACTIVE_STATUSES:
+            st.rerun()
+
+    active = job["status"] in ACTIVE_STATUSES
+    st.fragment(render, run_every=1.0 if active else None)()
+    return job
+
@@ -0,0 +1,91 @@
+import os
+import sys
+import streamlit as st
+from datetime import datetime
+
+from services.ab_service import AB_PATH, Environment, run_ab
+from services.storage_service import load_function_calls
+from utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+st.title("🆎 Live A/B Compare")
+
+st.markdown("""
+Runs the same generated parameter sets through two code versions side by side
+(for instance two git worktrees) and compares the results as they arrive.
+Only mismatches and a summary are written to disk.
+""")
+
+function_calls = load_function_calls()
+if not function_calls:
+    st.error("No function calls defined yet.")
+    st.stop()
+
+options = {f"{fc.full_name} ({fc.name})": fc for fc in function_calls}
+selected_key = st.selectbox("Select a function", list(options.keys()))
+selected_call = options[selected_key]
+
+col_a, col_b = st.columns(2)
+with col_a:
+    st.subheader("Version A (before)")
+    python_a = st.text_input("Python interpreter", value=sys.executable, key="python_a")
+    root_a = st.text_input("Source root", value=os.getcwd(), key="root_a")
+with col_b:
+    st.subheader("Version B (after)")
+    python_b = st.text_input("Python interpreter", value=sys.executable, key="python_b")
+    root_b = st.text_input("Source root", value=os.getcwd(), key="root_b")
+
+col1, col2 = st.columns(2)
+num_runs = col1.number_input("Number of runs", min_value=1, step=1, value=100)
+workers = col2.number_input("Warm workers per version", min_value=1, step=1, value=1)
+
+with st.expander("Adaptive sampling and shrinking"):
+    adaptive = st.checkbox(
+        "Focus on mismatches", value=False,
+        help="Once a mismatch is found, draw most parameter sets close to the mismatching ones."
+    )
+    explore = st.slider("Share of uniform draws after a mismatch", 0.0, 1.0, 0.3, 0.05, disabled=not adaptive)
+    shrink_calls = st.number_input(
+        "Shrink the first mismatch (max calls, 0 to skip)", min_value=0, step=10, value=0,
+        help="Delta-minimizes the mismatching parameters: shorter lists, values toward 0 or the range bound."
+    )
+
+if st.button("Run A/B"):
+    for root in (root_a, root_b):
+        if not os.path.isdir(root):
+            st.error(f"Source root '{root}' does not exist.")
+            st.stop()
+    out_dir = os.path.join(os.getcwd(), AB_PATH, selected_call.name, datetime.now().strftime("%Y%m%d%H%M%S"))
+    progress_bar = st.progress(0.0)
+    try:
+        summary = run_ab(
+            selected_call,
+            Environment(python_a, root_a),
+            Environment(python_b, root_b),
+            int(num_runs),
+            out_dir,
+            workers=int(workers),
+            adaptive=adaptive,
+            explore=explore,
+            shrink_calls=int(shrink_calls),
+            progress=lambda done, total, mismatches: progress_bar.progress(
+                done / total, text=f"{done} / {total} runs, {mismatches} mismatch(es)"
+            ),
+        )
+    except RuntimeError as e:
+        st.error(str(e))
+        st.stop()
+
+    if summary["mismatches"]:
+        st.error(f"{summary['mismatches']} of {summary['runs']} run(s) mismatch. Details saved in {out_dir}")
+    else:
+        st.success(f"All {summary['runs']} run(s) match. Summary saved in {out_dir}")
+    st.dataframe(pd.DataFrame({"A": summary["time_a"], "B": summary["time_b"]}))
+    if summary["sampling"]:
+        st.subheader("Sampling")
+        st.dataframe(pd.DataFrame(summary["sampling"]).T)
+    if summary["shrunk"]:
+        st.subheader("Minimal mismatch")
+        st.caption(f"Shrunk from {summary['shrunk']['from']} in {summary['shrunk']['calls']} call(s), saved as shrunk.pkl")
+        st.json(summary["shrunk"]["parameters"])
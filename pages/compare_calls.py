@@ -1,13 +1,20 @@
 import os
-import json
-import pickle
 from datetime import datetime
-from pathlib import Path
 import streamlit as st
-import pandas as pd
-import glob
-from importlib import import_module
-from utils.compare_dfs import compare_dfs
+from services.compare_service import (
+    MismatchBudget, compare_folders, compare_sample, common_run_files, run_strata, build_detail, memory_regressions
+)
+from services.sampling_service import sample_pairs
+from services.storage_service import load_function_calls
+from services.report_service import export_report, REPORTS_PATH
+from services.job_service import DONE, FAILED, get_job_manager
+from services.table_service import RecordsQuery, parameter_columns, query_records, records_table
+from components.cached_data import cached_function_calls, cached_result_folders, refresh_result_folders, run_cache
+from components.job_status import job_status
+from utils.lazy import lazy_import
+from utils.resources import ResourceMeter
+
+pd = lazy_import("pandas")
 
 def stringify_keys(d):
     if isinstance(d, dict):
@@ -23,11 +30,11 @@ st.title("🔍 Compare Function Calls")
 if 'records' not in st.session_state:
     st.session_state['records'] = []
     st.session_state['df_records'] = None
+    st.session_state['compare_context'] = None
 
 json_path = os.path.join(os.getcwd(), "data", "function_calls.json")
 try:
-    with open(json_path, "r") as f:
-        function_calls = json.load(f)
+    function_calls = cached_function_calls(json_path)
 except Exception as e:
     st.error(f"Error loading function calls: {e}")
     st.stop()
@@ -38,12 +45,10 @@ selected_function = options[selected_key]
 fn_name = selected_function["name"]
 
 base_results_path = os.path.join(os.getcwd(), "data", "results")
-folder_candidates = []
-base_path = Path(base_results_path)
-for candidate in base_path.rglob('*'):
-    if candidate.is_dir() and (candidate / fn_name).is_dir():
-        folder_candidates.append(str(candidate.relative_to(base_path)))
-folder_candidates = list(set(folder_candidates))
+folder_candidates = cached_result_folders(base_results_path, fn_name)
+if st.button("↻ Refresh folders", help="Folder lists are cached, refresh after copying results into data/results."):
+    refresh_result_folders()
+    st.rerun()
 if not folder_candidates:
     st.error("No available result folders found for the selected function.")
     st.stop()
@@ -51,6 +56,97 @@ if not folder_candidates:
 path_before = st.selectbox("Select 'Path Before'", folder_candidates, key="before")
 path_after = st.selectbox("Select 'Path After'", folder_candidates, key="after")
 
+mode = st.radio("Compare mode", ["Full", "Sampled"], horizontal=True)
+if mode == "Full":
+    use_cache = st.checkbox(
+        "Reuse cached verdicts (only recompare new or changed runs)", value=True,
+        help="Compare reports are persisted per folder pair and function, keyed by the run files' fingerprints."
+    )
+    col1, col2 = st.columns(2)
+    max_mismatches = col1.number_input("Stop after N mismatches (0 = compare all)", min_value=0, step=1, value=0)
+    max_rate = col2.number_input(
+        "Stop above mismatch rate (0 = compare all)", min_value=0.0, max_value=1.0, step=0.01, value=0.0
+    )
+else:
+    col1, col2 = st.columns(2)
+    sample_size = col1.number_input("Pairs to sample", min_value=1, step=1, value=500)
+    strategy = col2.selectbox("Sampling", ["Random", "Stratified by parameter values"])
+    max_rows = col1.number_input(
+        "Max rows compared per frame (0 = all rows)", min_value=0, step=1000, value=0
+    )
+    seed = col2.number_input("Seed", min_value=0, step=1, value=0)
+    confidence = col1.slider("Confidence level", min_value=0.80, max_value=0.99, value=0.95)
+    threshold = col2.number_input(
+        "Escalation threshold (mismatch rate)", min_value=0.0, max_value=1.0, value=0.01, step=0.005, format="%.3f"
+    )
+    escalate = st.checkbox("Escalate to a full compare when the estimate crosses the threshold", value=False)
+measure_memory = st.checkbox(
+    "Report the peak memory of each compare",
+    help="Adds 'Compare Peak MB', the peak allocations of comparing each pair. Tracing allocations slows compares down."
+)
+
+def compare_job(context, mode, fn_name, ctx, settings):
+    """Background job of a compare, see services.job_service."""
+    abs_before, abs_after = ctx["abs_before"], ctx["abs_after"]
+    path_before, path_after, key_columns = ctx["path_before"], ctx["path_after"], ctx["key_columns"]
+    messages = []
+    if mode == "Full":
+        budget = None
+        if settings["max_mismatches"] or settings["max_rate"]:
+            budget = MismatchBudget(settings["max_mismatches"] or None, settings["max_rate"] or None)
+        records, stats = compare_folders(
+            abs_before, abs_after, path_before, path_after, fn_name, key_columns,
+            use_cache=settings["use_cache"], budget=budget, progress=context.progress,
+            measure_memory=settings["measure_memory"],
+        )
+        if records:
+            messages.append((
+                "info", f"{stats['total']} pair(s): {stats['compared']} compared, {stats['cached']} taken from cache."
+            ))
+        if stats["stopped_early"]:
+            messages.append(("error", f"Compare stopped early: {budget.describe()}. Only those pairs are shown."))
+    else:
+        files = common_run_files(abs_before, abs_after)
+        strata = None
+        if settings["strategy"] != "Random":
+            call = next(c for c in load_function_calls() if c.name == fn_name)
+            strata = run_strata(
+                abs_before, files, call.parameters, path_before, path_after, fn_name, key_columns
+            )
+        sampled_files = sample_pairs(files, settings["sample_size"], strata, settings["seed"])
+        records, estimate = compare_sample(
+            abs_before, abs_after, sampled_files, len(files), key_columns,
+            settings["max_rows"] or None, settings["confidence"], progress=context.progress,
+            measure_memory=settings["measure_memory"], strata=strata,
+        )
+        if records:
+            messages.append((
+                "info",
+                f"{estimate['mismatches']} mismatch(es) in {estimate['sampled']} of {estimate['population']} pair(s). "
+                f"Estimated mismatch rate: {estimate['rate']:.2%} "
+                f"({estimate['confidence']:.0%} CI {estimate['low']:.2%} - {estimate['high']:.2%})."
+            ))
+            if estimate["rate"] > settings["threshold"]:
+                if settings["escalate"]:
+                    messages.append(("warning", "Estimate above the threshold, ran a full compare."))
+                    records, _ = compare_folders(
+                        abs_before, abs_after, path_before, path_after, fn_name, key_columns,
+                        progress=context.progress, measure_memory=settings["measure_memory"],
+                    )
+                else:
+                    messages.append(("warning", "Estimate above the threshold, consider running a full compare."))
+    context.keep(records)
+    return {"pairs": len(records), "messages": messages}
+
+
+def export_job(context, ctx, files, title, out_dir):
+    """Background job of "Export Report", see services.report_service."""
+    return export_report(
+        ctx["abs_before"], ctx["abs_after"], files, ctx["key_columns"], out_dir, title, ctx["parameter_names"],
+        progress=lambda done: context.progress(done, len(files)),
+    )
+
+
 if st.button("Compare Calls"):
     abs_before = os.path.join(base_results_path, path_before, fn_name)
     abs_after = os.path.join(base_results_path, path_after, fn_name)
@@ -58,72 +154,132 @@ if st.button("Compare Calls"):
         st.error("One of the selected folders does not exist.")
         st.stop()
 
-    files_before = set([f for f in os.listdir(abs_before) if f.startswith("run_") and f.endswith(".pkl")])
-    files_after = set([f for f in os.listdir(abs_after) if f.startswith("run_") and f.endswith(".pkl")])
-    common_files = files_before.intersection(files_after)
-
-    if not common_files:
-        st.warning("No matching run files found between the two folders.")
+    key_columns = selected_function.get("key_columns", [])
+    if mode == "Full":
+        settings = {"use_cache": use_cache, "max_mismatches": int(max_mismatches), "max_rate": max_rate}
     else:
-        records = []
-        for fname in sorted(common_files):
-            fpath_before = os.path.join(abs_before, fname)
-            fpath_after = os.path.join(abs_after, fname)
-            with open(fpath_before, "rb") as fb, open(fpath_after, "rb") as fa:
-                data_before = pickle.load(fb)
-                data_after = pickle.load(fa)
-
-            params_before = data_before.get("parameters", {})
-            params_after = data_after.get("parameters", {})
-            record = {"File": fname}
-            all_params = set(list(params_before.keys()) + list(params_after.keys()))
-            for key in all_params:
-                assert params_before.get(key, "N/A") == params_after.get(key, "N/A"), \
-                    f"Parameter '{key}' differs between before and after for file {fname}"
-                record[f"{key}"] = params_before.get(key, "N/A")
-
-            result_before = data_before.get("result")
-            result_after = data_after.get("result")
-
-            is_df_before = isinstance(result_before, pd.DataFrame)
-            is_df_after = isinstance(result_after, pd.DataFrame)
-            data_frame_before_check = "✅" if is_df_before else "❌"
-            data_frame_after_check = "✅" if is_df_after else "❌"
-            record["DataFrame Check"] = data_frame_before_check + " " + data_frame_after_check
-
-            record["Columns Check"] = "-"
-            record["Values Check"] = "-"
-            detail = {}
-            if is_df_before and is_df_after:
-                record["Columns Check"] = "✅" if result_before.shape[1] == result_after.shape[1] else "❌"
-                cmp_df = compare_dfs(result_before, result_after, selected_function.get("key_columns", []), path_before, path_after)
-                
-                record["Values Check"] = "✅" if result_before.equals(result_after) else "❌"
-                detail = cmp_df
-            else:
-                detail = pd.DataFrame({"before": [str(result_before)], "after": [str(result_after)]})
-
-            record["_detail"] = detail
-            records.append(record)
+        settings = {
+            "strategy": strategy, "sample_size": int(sample_size), "seed": int(seed), "max_rows": int(max_rows),
+            "confidence": confidence, "threshold": threshold, "escalate": escalate,
+        }
+    settings["measure_memory"] = measure_memory
+    st.session_state["compare_job_context"] = {
+        "abs_before": abs_before,
+        "abs_after": abs_after,
+        "path_before": path_before,
+        "path_after": path_after,
+        "key_columns": key_columns,
+        # the function compared, whatever is selected when the results are exported
+        "fn_name": fn_name,
+        "parameter_names": [p["name"] for p in selected_function.get("parameters", [])],
+    }
+    st.session_state["compare_job_id"] = get_job_manager().submit(
+        "compare", f"Compare {fn_name}: {path_before} vs {path_after}",
+        compare_job, mode, fn_name, st.session_state["compare_job_context"], settings,
+    )
 
-        df_records = pd.DataFrame(records)
-        st.session_state['records'] = records
-        st.session_state['df_records'] = df_records
+job_id = st.session_state.get("compare_job_id")
+if job_id:
+    job = job_status(job_id)
+    if job.get("status") == FAILED:
+        st.error(job["error"])
+    elif job.get("status") == DONE:
+        for level, message in job["summary"]["messages"]:
+            getattr(st, level)(message)
+        if st.session_state.get("compare_job_loaded") != job_id:
+            # records are only kept in memory by the app process that ran the job
+            st.session_state["compare_job_loaded"] = job_id
+            records = get_job_manager().result(job_id) or []
+            st.session_state['records'] = records
+            st.session_state['df_records'] = records_table(records) if records else None
+            st.session_state['compare_context'] = st.session_state["compare_job_context"]
+        if not st.session_state['records']:
+            st.warning("No matching run files found between the two folders.")
 
 # render results (persists across reruns)
 if st.session_state['records']:
     df_records = st.session_state['df_records']
     records    = st.session_state['records']
+    ctx        = st.session_state['compare_context']
 
     st.subheader("Comparison Results")
-    st.dataframe(df_records.drop(columns=["_detail"]).style.set_properties(**{'text-align': 'center'}))
+    # filtering, sorting and paging run here, only the visible page is sent to the browser
+    query = RecordsQuery()
+    with st.expander("Filter and sort"):
+        col1, col2, col3 = st.columns(3)
+        query.status = col1.multiselect("Status", ["match", "mismatch"])
+        query.search = col2.text_input("Search Files", "")
+        query.min_mismatches = int(col3.number_input("Min failed checks", min_value=0, max_value=3, step=1))
+        if "Time Delta" in df_records.columns:
+            min_delta = col1.number_input("Min |timing delta| (s)", min_value=0.0, step=0.1, value=0.0)
+            query.min_time_delta = min_delta or None
+        param_columns = parameter_columns(df_records)
+        for column in col2.multiselect("Filter on parameters", param_columns):
+            values = df_records[column]
+            if pd.api.types.is_numeric_dtype(values) and values.nunique() > 20:
+                low, high = float(values.min()), float(values.max())
+                query.parameter_ranges[column] = st.slider(column, low, high, (low, high))
+            else:
+                query.parameter_values[column] = st.multiselect(column, sorted(values.dropna().unique(), key=str))
+        sortable = [c for c in df_records.columns if c != "File"]
+        query.sort_by = col3.selectbox("Sort by", ["File"] + sortable)
+        query.ascending = col3.radio("Order", ["Ascending", "Descending"], horizontal=True) == "Ascending"
 
-    search_term = st.text_input("Search Files", "")
-    if search_term:
-        filtered_records = [rec for rec in records if search_term.lower() in rec["File"].lower()]
-    else:
-        filtered_records = records
+    col1, col2 = st.columns(2)
+    query.page_size = col1.selectbox("Rows per page", [25, 50, 100, 500], index=1)
+    _, matching = query_records(df_records, query)
+    pages = max((matching - 1) // query.page_size + 1, 1)
+    query.page = int(col2.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1))
+    page_records, matching = query_records(df_records, query)
+    st.caption(f"{matching} of {len(df_records)} pair(s) match the filters.")
+    st.dataframe(page_records.drop(columns=["File"]), use_container_width=True)
+
+    if len(page_records):
+        detail_file = st.selectbox("Detail for", page_records["File"].tolist())
+        # details are only loaded on demand, cached verdicts carry no result data
+        if st.checkbox("Load detail", key="detail"):
+            with ResourceMeter() as meter:
+                detail = build_detail(
+                    ctx["abs_before"], ctx["abs_after"], detail_file, ctx["key_columns"],
+                    ctx["path_before"], ctx["path_after"], load=run_cache().load
+                )
+            st.dataframe(detail)
+            st.caption(f"Peak memory of the aligned comparison: {meter.usage['peak_alloc'] / 1024 ** 2:.1f} MB")
+
+    if "Peak Change" in df_records.columns:
+        st.subheader("Memory Regressions")
+        st.caption("Pairs where both runs were profiled and the peak Python allocations grew.")
+        growth = st.number_input(
+            "Flag peak growth above (0.2 = +20%)", min_value=0.0, step=0.05, value=0.2, format="%.2f"
+        )
+        regressions = memory_regressions(records, growth)
+        if regressions:
+            st.warning(f"{len(regressions)} pair(s) with peak allocations above +{growth:.0%}.")
+            st.dataframe(pd.DataFrame(regressions).sort_values("Peak Change", ascending=False))
+        else:
+            st.success(f"No pair with peak allocations above +{growth:.0%}.")
+
+    st.subheader("Export Report")
+    st.caption("Streams the summary and per-pair differences to CSV/JSONL and a paginated HTML report.")
+    if st.button("Export Report"):
+        out_dir = os.path.join(
+            os.getcwd(), REPORTS_PATH, ctx["fn_name"], datetime.now().strftime("%Y%m%d%H%M%S")
+        )
+        st.session_state["export_job_id"] = get_job_manager().submit(
+            "report", f"Export report {ctx['fn_name']}: {ctx['path_before']} vs {ctx['path_after']}",
+            export_job, ctx, [rec["File"] for rec in records],
+            f"{ctx['fn_name']}: {ctx['path_before']} vs {ctx['path_after']}", out_dir,
+            target=out_dir,
+        )
 
-    for rec in filtered_records:
-        with st.expander(f"Detail for {rec['File']}"):
-            st.dataframe(rec["_detail"])
\ No newline at end of file
+    export_job_id = st.session_state.get("export_job_id")
+    if export_job_id:
+        job = job_status(export_job_id)
+        if job.get("status") == DONE:
+            summary = job["summary"]
+            st.success(
+                f"Report written to {summary['out_dir']}: {summary['pairs']} pair(s), "
+                f"{summary['mismatches']} mismatch(es), {summary['diff_lines']} differing cell(s)."
+            )
+        elif job.get("status") == FAILED:
+            st.error(job["error"])
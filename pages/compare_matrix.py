@@ -0,0 +1,54 @@
+import os
+import streamlit as st
+
+from services.matrix_service import compare_matrix
+from components.cached_data import cached_function_calls, cached_result_folders
+
+st.title("🧮 Compare Matrix")
+
+json_path = os.path.join(os.getcwd(), "data", "function_calls.json")
+try:
+    function_calls = cached_function_calls(json_path)
+except Exception as e:
+    st.error(f"Error loading function calls: {e}")
+    st.stop()
+
+options = {f'{fc["full_name"]} ({fc["name"]})': fc for fc in function_calls}
+selected_key = st.selectbox("Select a function", list(options.keys()))
+fn_name = options[selected_key]["name"]
+
+base_results_path = os.path.join(os.getcwd(), "data", "results")
+folder_candidates = cached_result_folders(base_results_path, fn_name)
+if len(folder_candidates) < 2:
+    st.error("At least two result folders are needed for the selected function.")
+    st.stop()
+
+selected_folders = st.multiselect("Result folders to compare", folder_candidates, default=folder_candidates)
+
+if st.button("Compare Matrix"):
+    if len(selected_folders) < 2:
+        st.error("Select at least two folders.")
+        st.stop()
+    progress_bar = st.progress(0.0)
+    df_runs, agreement = compare_matrix(
+        [os.path.join(base_results_path, folder, fn_name) for folder in selected_folders],
+        selected_folders,
+        progress=lambda done, total: progress_bar.progress(done / total),
+    )
+    st.session_state["matrix_runs"] = df_runs
+    st.session_state["matrix_agreement"] = agreement
+
+if st.session_state.get("matrix_runs") is not None:
+    df_runs = st.session_state["matrix_runs"]
+    agreement = st.session_state["matrix_agreement"]
+
+    st.subheader("Agreement between versions")
+    st.caption("Share of the runs present in both folders that produced the same result.")
+    st.dataframe(agreement.style.format("{:.1%}"))
+
+    st.subheader("Equivalence classes per run")
+    st.caption("Folders sharing a letter produced the same result for that run.")
+    only_divergent = st.checkbox("Only runs where versions disagree", value=True)
+    if only_divergent:
+        df_runs = df_runs[df_runs["Classes"] > 1]
+    st.dataframe(df_runs)
@@ -3,6 +3,7 @@ import streamlit as st
 from components.function_call_form import render_function_call_form
 from services.validation_service import validate_function_call
 from services.storage_service import add_function_call
+from services.import_service import DefinitionErrors, import_definitions, parse_definitions
 
 def main():
     st.title("🚀 Create New Function Call")
@@ -17,5 +18,29 @@ def main():
         except Exception as err:
             st.error(f"Error: {err}")
 
+    st.header("Bulk import")
+    st.caption(
+        "JSON or YAML files holding one definition or a list of them, in the format of data/function_calls.json. "
+        "Everything is validated first and saved in one go, or nothing is saved. "
+        "For a directory on the server, use `python -m services.import_service <directory>`."
+    )
+    uploads = st.file_uploader("Definition files", type=["json", "yaml", "yml"], accept_multiple_files=True)
+    update_existing = st.checkbox("Replace saved function calls with the same name")
+    if uploads and st.button("Import"):
+        try:
+            entries, errors = [], []
+            for upload in uploads:
+                try:
+                    entries.extend(parse_definitions(upload.getvalue().decode("utf-8"), upload.name))
+                except DefinitionErrors as e:
+                    errors.extend(e.errors)
+            if errors:
+                raise DefinitionErrors(errors)
+            summary = import_definitions(entries, update_existing)
+            st.success(f"{summary['added']} added, {summary['updated']} updated, {summary['total']} function call(s) saved.")
+        except DefinitionErrors as e:
+            st.error(f"Nothing was imported, {len(e.errors)} problem(s) found:")
+            st.dataframe({"Problem": e.errors}, use_container_width=True)
+
 if __name__ == "__main__":
     main()
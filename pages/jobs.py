@@ -0,0 +1,47 @@
+import streamlit as st
+
+from components.job_status import job_status
+from services.job_service import ACTIVE_STATUSES, MAX_CONCURRENT_JOBS, get_job_manager
+from utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+st.title("⏳ Jobs")
+st.caption(
+    f"Runs, reruns, compares and report exports run in the background, at most {MAX_CONCURRENT_JOBS} at a time "
+    "(set FCHK_MAX_JOBS to change it). Jobs left unfinished by a restart of the app are marked interrupted."
+)
+
+manager = get_job_manager()
+jobs = manager.list_jobs()
+if not jobs:
+    st.info("No jobs yet.")
+    st.stop()
+
+show_finished = st.checkbox("Show finished jobs", value=True)
+if not show_finished:
+    jobs = [job for job in jobs if job["status"] in ACTIVE_STATUSES]
+
+st.dataframe(pd.DataFrame([
+    {
+        "Job": job["job_id"],
+        "Title": job["title"],
+        "Status": job["status"],
+        "Progress": f"{job['progress']['done']} / {job['progress']['total']}" if job["progress"]["total"] else "-",
+        "Created": job["created"],
+        "Finished": job["finished"],
+    }
+    for job in jobs
+]), hide_index=True)
+
+if jobs:
+    selected_job = st.selectbox(
+        "Job", [job["job_id"] for job in jobs],
+        format_func=lambda job_id: f"{job_id}: {manager.get(job_id)['title']}"
+    )
+    job = job_status(selected_job, log_lines=50)
+    if job.get("error"):
+        st.error(job["error"])
+    if job.get("summary"):
+        with st.expander("Summary"):
+            st.json(job["summary"])
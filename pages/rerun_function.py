@@ -1,19 +1,22 @@
 import os
 import json
-import pickle
 import streamlit as st
 from datetime import datetime
-import time as timer
-from importlib import import_module
-import glob
-from pathlib import Path
+
+from components.cached_data import cached_function_calls, cached_result_folders, refresh_result_folders
+from components.isolation_inputs import isolation_inputs
+from components.job_status import job_status
+from services.checkpoint_service import BatchJournal, list_batches
+from services.compare_service import MismatchBudget
+from services.job_service import CANCELLED, DONE, FAILED, INTERRUPTED, get_job_manager
+from services.rerun_service import EXECUTOR_KINDS, list_rerun_files, rerun_files
+from services.worker_daemon import daemon_available
 
 st.title("🔄 Rerun Function")
 
 functions_json_path = os.path.join(os.getcwd(), "data", "function_calls.json")
 try:
-    with open(functions_json_path, "r") as f:
-        available_functions = json.load(f)
+    available_functions = cached_function_calls(functions_json_path)
 except Exception as e:
     st.error(f"Error loading functions: {e}")
     available_functions = []
@@ -24,14 +27,10 @@ selected_function = options[selected_key]
 func_name = selected_function["name"]
 
 base_results_path = os.path.join(os.getcwd(), "data", "results")
-from_folder_candidates = []
-
-base_path = Path(base_results_path)
-for candidate in base_path.rglob('*'):
-    if candidate.is_dir() and (candidate / func_name).is_dir():
-        rel_path = str(candidate.relative_to(base_path))
-        from_folder_candidates.append(rel_path)
-from_folder_candidates = list(set(from_folder_candidates))
+from_folder_candidates = cached_result_folders(base_results_path, func_name)
+if st.button("↻ Refresh folders", help="Folder lists are cached, refresh after copying results into data/results."):
+    refresh_result_folders()
+    st.rerun()
 
 if not from_folder_candidates:
     st.error("Run this function before selecting Rerun or choose another function")
@@ -40,6 +39,112 @@ selected_from_folder = st.selectbox("From folder", options=from_folder_candidate
 
 to_folder = st.text_input("To folder (relative to data/results)", "")
 dt_filter_input = st.text_input("Datetime filter (YYYY-MM-DD HH:MM:SS) - optional", "")
+profile = st.checkbox(
+    "Record resource footprint",
+    help="Stores peak Python allocations, RSS delta, CPU time, GC collections and result size in each run file. Tracing allocations slows calls down."
+)
+
+with st.expander("Execution"):
+    col1, col2, col3 = st.columns(3)
+    executor_kind = col1.selectbox(
+        "Workers", EXECUTOR_KINDS,
+        help="process: one process per core; thread: for functions that release the GIL; serial: no parallelism; "
+             "isolated: supervised processes with per-call timeout and memory limit; "
+             "daemon: the warm worker daemon (python -m services.worker_daemon)"
+    )
+    workers = col2.number_input("Concurrency", min_value=1, step=1, value=os.cpu_count() or 1)
+    chunk_size = col3.number_input(
+        "Calls per task", min_value=1, step=1, value=1,
+        help="Batch several small calls per task to amortize inter-process overhead."
+    )
+    isolation = None
+    if executor_kind == "isolated":
+        isolation = isolation_inputs()
+    if executor_kind == "daemon" and not daemon_available():
+        st.warning("No worker daemon is running, start it with `python -m services.worker_daemon`.")
+
+with st.expander("Fail fast"):
+    fail_fast = st.checkbox(
+        "Compare each result with the 'from folder' run as it is written",
+        help="Stops the rerun once the mismatch thresholds below are exceeded."
+    )
+    col1, col2, col3 = st.columns(3)
+    max_mismatches = col1.number_input("Max mismatches (0 = no limit)", min_value=0, step=1, value=50)
+    max_rate = col2.number_input(
+        "Max mismatch rate (0 = no limit)", min_value=0.0, max_value=1.0, step=0.01, value=0.0
+    )
+    min_compared = col3.number_input("Apply the rate after N results", min_value=1, step=1, value=20)
+
+with st.expander("Storage"):
+    fingerprints = st.checkbox(
+        "Store fingerprints instead of full results",
+        help="Keeps the parameters plus per-row and per-column hashes and statistics of each result: "
+             "a compact baseline that later releases can still be compared against."
+    )
+    capture_mismatches = st.checkbox(
+        "Keep the full result of runs that mismatch the 'from folder'",
+        disabled=not (fingerprints and fail_fast),
+        help="Needs the fail fast compare."
+    )
+
+def rerun_job(context, function, abs_from, abs_to, files, journal, settings):
+    """Background job of a rerun batch, see services.job_service."""
+    summary = rerun_files(
+        function["full_name"], abs_from, abs_to, files,
+        progress=context.progress,
+        key_columns=function.get("key_columns", []),
+        journal=journal,
+        **settings,
+    )
+    return {**summary, **journal.progress()}
+
+
+def submit_rerun(abs_from, abs_to, files, journal):
+    settings = {
+        "workers": int(workers),
+        "executor_kind": executor_kind,
+        "chunk_size": int(chunk_size),
+        "baseline_dir": abs_from if fail_fast else None,
+        "budget": MismatchBudget(int(max_mismatches) or None, max_rate or None, int(min_compared)),
+        "isolation": isolation,
+        "profile": profile,
+        "fingerprints": fingerprints,
+        "capture_mismatches": capture_mismatches and fail_fast,
+    }
+    st.session_state["rerun_job_id"] = get_job_manager().submit(
+        "rerun", f"Rerun {func_name} to '{to_folder}' ({journal.batch_id})",
+        rerun_job, selected_function, abs_from, abs_to, files, journal, settings,
+        target=journal.batch_id,
+    )
+
+
+def show_rerun_job(job_id):
+    job = job_status(job_id)
+    summary = job.get("summary")
+    if job.get("status") == FAILED:
+        st.error(f"Rerun failed: {job['error']}")
+    elif job.get("status") in (CANCELLED, INTERRUPTED):
+        st.warning(f"{job['title']} {job['status']}, resume the batch to finish it.")
+    elif job.get("status") != DONE:
+        return
+    elif summary["stopped_early"]:
+        st.error(
+            f"Rerun stopped early after {summary['done']} of {summary['planned']} file(s): "
+            f"{summary['mismatches']} mismatch(es) in {summary['compared']} compared result(s)."
+        )
+        st.write("Mismatching files:", summary["mismatch_files"])
+    elif summary["failed"]:
+        st.warning(
+            f"Batch {summary['batch_id']}: {summary['failed']} call(s) failed, resume the batch to retry them."
+        )
+    else:
+        st.success(
+            f"Rerun completed for {summary['files_ran']} file(s) in {summary['elapsed']:.1f}s. "
+            f"Batch {summary['batch_id']}"
+        )
+        if summary["compared"]:
+            st.info(f"{summary['mismatches']} mismatch(es) in {summary['compared']} compared result(s).")
+
 
 if st.button("Run Rerun"):
     if not (selected_key and selected_from_folder and to_folder):
@@ -55,68 +160,43 @@ if st.button("Run Rerun"):
 
         abs_from = os.path.join(base_results_path, selected_from_folder, func_name)
         abs_to = os.path.join(base_results_path, to_folder, func_name)
-        os.makedirs(abs_to, exist_ok=True)
 
-        files_ran = 0
         if os.path.exists(abs_from):
-            for filename in os.listdir(abs_from):
-                if filename.startswith("run_") and filename.endswith(".pkl"):
-                    try:
-                        ts_str = filename[4:-4]
-                        try:
-                            file_dt = datetime.strptime(ts_str, "%Y%m%d%H%M%S%f")
-                        except ValueError:
-                            file_dt = datetime.strptime(ts_str, "%Y%m%d%H%M%S")
-                    except Exception:
-                        continue
-                    if dt_filter and file_dt < dt_filter:
-                        continue
-                    file_path = os.path.join(abs_from, filename)
-                    with open(file_path, "rb") as f:
-                        data = pickle.load(f)
-                    parameters = data.get("parameters", {})
-                    
-                    try:
-                        module_path, func_attr = selected_function["full_name"].rsplit(".", 1)
-                        mod = import_module(module_path)
-                        func = getattr(mod, func_attr)
-                    except Exception as e:
-                        st.error(f"Failed to import function: {e}")
-                        st.stop()
-                    
-                    start_time = timer.time()
-                    try:
-                        result = func(**parameters)
-                    except TypeError as te:
-                        msg = str(te)
-                        if "takes no keyword arguments" in msg or "positional-only" in msg:
-                            import inspect
-                            sig = inspect.signature(func)
-                            pos_args = []
-                            kw_args = {}
-                            for name, param in sig.parameters.items():
-                                if param.kind == inspect.Parameter.POSITIONAL_ONLY:
-                                    pos_args.append(parameters[name])
-                                else:
-                                    kw_args[name] = parameters[name]
-                            result = func(*pos_args, **kw_args)
-                        else:
-                            raise
-                    elapsed = timer.time() - start_time
-
-                    new_data = {
-                        "result": result,
-                        "parameters": parameters,
-                        "timestamp": datetime.now().isoformat(),
-                        "time": elapsed
-                    }
-                    new_filename = filename
-                    with open(os.path.join(abs_to, new_filename), "wb") as f:
-                        pickle.dump(new_data, f)
-                    files_ran += 1
-            if files_ran:
-                st.success(f"Rerun completed for {files_ran} file(s).")
-            else:
+            files = list_rerun_files(abs_from, dt_filter)
+            if not files:
                 st.warning("No matching pickle files found for rerun.")
+                st.stop()
+            journal = BatchJournal.create(
+                abs_to, "rerun", planned=len(files), files=files, from_folder=selected_from_folder
+            )
+            submit_rerun(abs_from, abs_to, files, journal)
         else:
             st.error("The specified 'from folder' does not exist.")
+
+job_id = st.session_state.get("rerun_job_id")
+if job_id:
+    st.subheader("Current rerun")
+    st.caption("The rerun runs in the background: you can leave this page and follow it in Jobs.")
+    show_rerun_job(job_id)
+
+if to_folder:
+    abs_to = os.path.join(base_results_path, to_folder, func_name)
+    running = get_job_manager().active_targets("rerun")
+    incomplete = [
+        j for j in list_batches(abs_to, kind="rerun", incomplete_only=True) if j.batch_id not in running
+    ]
+    if incomplete:
+        st.subheader("Resume a batch")
+        batches = {
+            f"{p['batch_id']} from '{journal.header['from_folder']}' "
+            f"({p['done']} / {p['planned']} done, {p['failed']} failed)": journal
+            for journal in incomplete
+            for p in [journal.progress()]
+        }
+        selected_batch = st.selectbox("Unfinished batches in the 'to folder'", list(batches.keys()))
+        if st.button("Resume Batch"):
+            journal = batches[selected_batch]
+            header = journal.header
+            abs_from = os.path.join(base_results_path, header["from_folder"], func_name)
+            submit_rerun(abs_from, abs_to, journal.files(), journal)
+            st.rerun()
@@ -1,51 +1,45 @@
 import streamlit as st
 import os
-import json
-import time
-import pickle
-import random
-import importlib
-import inspect
-from datetime import datetime
+
+from components.cached_data import cached_function_calls, timing_histories
+from components.isolation_inputs import isolation_inputs
+from components.job_status import job_status
+from services.budget_service import run_budget
+from services.checkpoint_service import BatchJournal, list_batches
+from services.estimate_service import estimate_call, format_seconds
+from services.generation_service import generate_parameters
+from services.isolation_service import IsolatedPool
+from services.job_service import CANCELLED, DONE, FAILED, INTERRUPTED, get_job_manager
+from services.worker_daemon import DaemonPool, daemon_available
+from services.run_service import run_batch
+from services.storage_service import function_call_from_dict
 
 st.set_page_config(page_title="Run Function", page_icon="▶️")
 
-def generate_random_value(param):
-    def sample_value(p_type, rng):
-        if p_type == "int":
-            return random.randint(int(rng[0]), int(rng[1]))
-        elif p_type == "float":
-            return random.uniform(float(rng[0]), float(rng[1]))
-        elif p_type == "str":
-            return "sample"
-        elif p_type == "date":
-            return datetime.today().strftime("%Y-%m-%d")
-        elif p_type == "boolean":
-            return random.choice([True, False])
-        else:
-            return None
+# A run batch calls the function one run at a time, also through a worker pool
+RUN_WORKERS = 1
 
-    if param.get("specific_values"):
-        value = random.choice(param["specific_values"])
-    else:
-        value = sample_value(param["type"], param.get("range", [0, 1]))
-        
-    if param.get("is_list", False):
-        list_len = param.get("list_length")
-        if isinstance(list_len, list):
-            count = random.randint(int(list_len[0]), int(list_len[1]))
-        else:
-            count = int(list_len)
-        value = [value for _ in range(count)]
-    return value
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_estimate(function, runs, workers, history_stamp, _history):
+    """estimate_call, computed again only when the past run times change."""
+    return estimate_call(function_call_from_dict(function), runs, workers, _history)
+
+def estimate(function, runs, workers):
+    """cached_estimate, "reading" while the past run times are read, None if the function never ran."""
+    history = timing_histories().get(function["name"])
+    if history is None:
+        # only the first read of a function is waited for, briefly
+        history = timing_histories().wait(function["name"], timeout=1.0)
+    if history is None:
+        return "reading"
+    return cached_estimate(function, runs, workers, *history)
 
 def load_function_calls():
     json_path = os.path.join(os.getcwd(), "data/function_calls.json")
     if not os.path.exists(json_path):
         st.error("No function_calls.json file found!")
         return []
-    with open(json_path, "r") as f:
-        return json.load(f)
+    return cached_function_calls(json_path)
 
 st.title("▶️ Run Function")
 
@@ -62,64 +56,157 @@ st.write(f"Full name: {selected_function['full_name']}")
 st.write(f"Identifier: {selected_function['name']}")
 st.write(f"Parameters: {', '.join([p['name'] for p in selected_function.get('parameters', [])])}")
 
-num_runs = st.number_input("Number of runs", min_value=1, step=1, value=1)
+mode = st.radio("Mode", ["Number of runs", "Time budget"], horizontal=True)
+if mode == "Number of runs":
+    num_runs = st.number_input("Number of runs", min_value=1, step=1, value=1)
+    runs_estimate = estimate(selected_function, int(num_runs), RUN_WORKERS)
+    if runs_estimate == "reading":
+        st.caption("Reading the times of past runs to estimate the duration...")
+    elif runs_estimate:
+        st.caption(
+            f"Estimated duration: {format_seconds(runs_estimate['seconds'])} "
+            f"({format_seconds(runs_estimate['low'])} to {format_seconds(runs_estimate['high'])}), "
+            f"from {runs_estimate['samples']} past run(s)"
+        )
+    else:
+        st.caption("No past runs of this function to estimate the duration from.")
+else:
+    budget_keys = st.multiselect("Functions sharing the budget", list(options.keys()), default=[selected_key])
+    col1, col2 = st.columns(2)
+    budget_minutes = col1.number_input("Time budget (minutes)", min_value=0.1, step=1.0, value=5.0)
+    budget_workers = col2.number_input("Concurrent runs", min_value=1, step=1, value=1)
+    budget_calls = [function_call_from_dict(options[key]) for key in budget_keys]
+    share = budget_minutes * 60 * budget_workers / max(len(budget_calls), 1)
+    for key, call in zip(budget_keys, budget_calls):
+        call_estimate = estimate(options[key], 1, 1)
+        if call_estimate == "reading":
+            st.caption(f"{call.name}: reading the times of past runs...")
+        elif call_estimate and call_estimate["per_run"] > 0:
+            st.caption(f"{call.name}: about {int(share / call_estimate['per_run'])} run(s) in its share of the budget")
+        else:
+            st.caption(f"{call.name}: no past runs, its duration is learned as it runs")
 results_folder_input = st.text_input("Results folder (e.g., 'prd/pre')", value="prd/pre")
+base_path = os.path.join(os.getcwd(), "data", "results", results_folder_input, selected_function["name"])
+profile = st.checkbox(
+    "Record resource footprint",
+    help="Stores peak Python allocations, RSS delta, CPU time, GC collections and result size in each run file. Tracing allocations slows calls down."
+)
+
+with st.expander("Isolation"):
+    isolated = st.checkbox(
+        "Run each call in a supervised worker process",
+        help="Hung, crashing or memory-hungry calls are recorded as timeout/crashed/memory_limit instead of blocking the batch."
+    )
+    isolation = isolation_inputs() if isolated else None
+    use_daemon = st.checkbox(
+        "Run calls in the warm worker daemon",
+        disabled=isolated or not daemon_available(),
+        help="Start it with `python -m services.worker_daemon`: target modules stay imported between runs."
+    )
+
+
+def run_job(context, journal, function, isolation, use_daemon, profile):
+    """Background job of a run batch, see services.job_service."""
+    parameters = function_call_from_dict(function).parameters
+
+    def make_params(rng):
+        return generate_parameters(parameters, rng)
+
+    pool = None
+    if isolation is not None:
+        pool = IsolatedPool(RUN_WORKERS, **isolation)
+    elif use_daemon:
+        pool = DaemonPool(RUN_WORKERS)
+    try:
+        results_saved = run_batch(
+            function["full_name"], make_params, journal.folder, journal,
+            progress=context.progress, pool=pool, profile=profile,
+        )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return {**journal.progress(), "saved": len(results_saved), "folder": journal.folder}
+
+
+def budget_job(context, calls, budget_seconds, folder, workers, executor_kind, isolation, profile):
+    """Background job of a time-budgeted batch, see services.budget_service."""
+    summary = run_budget(
+        calls, budget_seconds, folder, workers=workers, executor_kind=executor_kind,
+        isolation=isolation, profile=profile, progress=context.progress,
+    )
+    return {"folder": folder, "functions": summary}
+
+
+def submit_run(journal):
+    st.session_state["run_job_id"] = get_job_manager().submit(
+        "run", f"Run {selected_function['name']} ({journal.batch_id})",
+        run_job, journal, selected_function, isolation, use_daemon, profile,
+        target=journal.batch_id,
+    )
+
+
+if mode == "Time budget":
+    if st.button("Run Within Budget", disabled=not budget_calls):
+        if isolated:
+            executor_kind = "isolated"
+        elif use_daemon:
+            executor_kind = "daemon"
+        else:
+            executor_kind = "thread" if budget_workers > 1 else "serial"
+        st.session_state["budget_job_id"] = get_job_manager().submit(
+            "run", f"Run {', '.join(call.name for call in budget_calls)} for {budget_minutes:g} min",
+            budget_job, budget_calls, budget_minutes * 60, results_folder_input, int(budget_workers),
+            executor_kind, isolation, profile,
+        )
+elif st.button("Run Function"):
+    journal = BatchJournal.create(
+        base_path, "run", planned=int(num_runs), full_name=selected_function["full_name"]
+    )
+    submit_run(journal)
+
+budget_job_id = st.session_state.get("budget_job_id")
+if budget_job_id:
+    st.subheader("Time-budgeted batch")
+    job = job_status(budget_job_id)
+    if job.get("status") == DONE:
+        summary = job["summary"]
+        st.success(f"Budget used, runs saved to data/results/{summary['folder']}")
+        st.table({
+            name: {"Runs": counts["runs"], "Failed": counts["failed"], "Seconds": round(counts["seconds"], 1)}
+            for name, counts in summary["functions"].items()
+        })
+    elif job.get("status") == FAILED:
+        st.error(job["error"])
+    elif job.get("status") in (CANCELLED, INTERRUPTED):
+        st.warning(f"{job['title']} {job['status']}.")
+
+job_id = st.session_state.get("run_job_id")
+if job_id:
+    st.subheader("Current batch")
+    st.caption("The batch runs in the background: you can leave this page and follow it in Jobs.")
+    job = job_status(job_id)
+    summary = job.get("summary")
+    if job.get("status") == DONE:
+        if summary["failed"]:
+            st.warning(f"Batch {summary['batch_id']}: {summary['failed']} run(s) failed, resume the batch to retry them.")
+        else:
+            st.success(f"Function runs completed! Batch {summary['batch_id']}")
+        st.write(f"{summary['saved']} file(s) saved to {summary['folder']}")
+    elif job.get("status") == FAILED:
+        st.error(job["error"])
+    elif job.get("status") in (CANCELLED, INTERRUPTED):
+        st.warning(f"{job['title']} {job['status']}, resume the batch to finish it.")
 
-if st.button("Run Function"):
-    results_saved = []
-    for i in range(num_runs):
-        params = {}
-        for param in selected_function.get("parameters", []):
-            params[param["name"]] = generate_random_value(param)
-
-        full_name = selected_function["full_name"]
-        if '.' not in full_name:
-            st.error("Invalid full_name format. Expected a full name with module path (e.g., 'module.submodule.function').")
-            st.stop()
-        module_path, func_name = full_name.rsplit(".", 1)
-        mod = importlib.import_module(module_path)
-        func = getattr(mod, func_name)
-
-        start_time = time.time()
-        try:
-            result = func(**params)
-        except TypeError as te:
-            msg = str(te)
-            if "takes no keyword arguments" in msg or "positional-only" in msg:
-                sig = inspect.signature(func)
-                pos_args = []
-                kw_args = {}
-                for name, param in sig.parameters.items():
-                    if param.kind == inspect.Parameter.POSITIONAL_ONLY:
-                        pos_args.append(params[name])
-                    else:
-                        kw_args[name] = params[name]
-                result = func(*pos_args, **kw_args)
-            else:
-                raise
-        except Exception as e:
-            result = f"Function call error: {e}"
-        elapsed = time.time() - start_time
-        run_timestamp = datetime.now()
-        timestamp_str = run_timestamp.strftime("%Y%m%d%H%M%S%f")
-        
-        result_dict = {
-            "result": result,
-            "parameters": params,
-            "timestamp": run_timestamp.isoformat(),
-            "time": elapsed
-        }
-        
-        base_path = os.path.join(os.getcwd(), "data", "results", results_folder_input, selected_function["name"])
-        os.makedirs(base_path, exist_ok=True)
-        file_name = f"run_{timestamp_str}.pkl"
-        file_path = os.path.join(base_path, file_name)
-        
-        with open(file_path, "wb") as f:
-            pickle.dump(result_dict, f)
-        results_saved.append(file_path)
-    
-    st.success("Function runs completed!")
-    st.write("Saved files:")
-    for path in results_saved:
-        st.write(path)
+running = get_job_manager().active_targets("run")
+incomplete = [j for j in list_batches(base_path, kind="run", incomplete_only=True) if j.batch_id not in running]
+if incomplete:
+    st.subheader("Resume a batch")
+    batches = {
+        f"{p['batch_id']} ({p['done']} / {p['planned']} done, {p['failed']} failed)": journal
+        for journal in incomplete
+        for p in [journal.progress()]
+    }
+    selected_batch = st.selectbox("Unfinished batches in this folder", list(batches.keys()))
+    if st.button("Resume Batch"):
+        submit_run(batches[selected_batch])
+        st.rerun()
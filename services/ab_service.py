@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import queue
+import pickle
+import statistics
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from models.function_call import FunctionCall
+from services.ab_worker import read_frame, write_frame
+from services.compare_service import compare_run_data, is_mismatch
+from services.generation_service import generate_parameters
+from services.search_service import AdaptiveSampler, shrink
+
+# A/B sessions write their mismatches and summary to data/ab/<function name>/<timestamp>/
+AB_PATH = os.path.join("data", "ab")
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ab_worker.py")
+
+
+@dataclass
+class Environment:
+    """One side of an A/B comparison: an interpreter and the source root it imports from."""
+    python: str = sys.executable
+    source_root: str = "."
+
+
+class ABWorker:
+    """
+    A warm worker process of one environment, with the target function already imported.
+    """
+
+    def __init__(self, env: Environment, full_name: str, log_path: str):
+        source_root = os.path.abspath(env.source_root)
+        self._log = open(log_path, "ab")
+        self.process = subprocess.Popen(
+            [env.python, WORKER_SCRIPT, source_root, full_name],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self._log,
+            cwd=source_root,
+        )
+        kind, payload = self._receive()
+        if kind != "ready":
+            self.close()
+            raise RuntimeError(f"Worker for {source_root} failed to start: {payload}")
+
+    def _receive(self):
+        reply = read_frame(self.process.stdout)
+        if reply is None:
+            raise RuntimeError(f"Worker exited with code {self.process.wait()}, see {self._log.name}")
+        return reply
+
+    def call(self, params: dict) -> dict:
+        write_frame(self.process.stdin, ("call", params))
+        _, run = self._receive()
+        return run
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            try:
+                write_frame(self.process.stdin, ("stop",))
+                self.process.wait(timeout=5)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+        self._log.close()
+
+
+def _time_stats(times: List[float]) -> dict:
+    if not times:
+        return {}
+    return {
+        "mean": statistics.fmean(times),
+        "median": statistics.median(times),
+        "max": max(times),
+        "total": sum(times),
+    }
+
+
+def run_ab(
+        call: FunctionCall,
+        env_a: Environment,
+        env_b: Environment,
+        num_runs: int,
+        out_dir: str,
+        workers: int = 1,
+        progress: Optional[Callable[[int, int, int], None]] = None,
+        adaptive: bool = False,
+        explore: float = 0.3,
+        shrink_calls: int = 0) -> dict:
+    """
+    Runs call.full_name in both environments on the same generated parameter
+    sets and compares the results in memory as they arrive.
+    Only the mismatching runs (mismatch_NNNNNN.pkl, with both results) and
+    summary.json are written to out_dir.
+
+    With adaptive, parameter sets are drawn by an AdaptiveSampler: once a
+    mismatch is found, most runs explore its neighbourhood. With
+    shrink_calls, the first mismatching parameter set is then delta-minimized
+    with at most shrink_calls more calls in each environment; the minimal
+    set is stored in the summary ("shrunk") and as shrunk.pkl.
+    Returns the summary.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    started = datetime.now()
+    pairs: queue.Queue = queue.Queue()
+    all_workers = []
+    try:
+        for n in range(workers):
+            worker_a = ABWorker(env_a, call.full_name, os.path.join(out_dir, f"worker_a_{n}.log"))
+            all_workers.append(worker_a)
+            worker_b = ABWorker(env_b, call.full_name, os.path.join(out_dir, f"worker_b_{n}.log"))
+            all_workers.append(worker_b)
+            pairs.put((worker_a, worker_b))
+
+        def run_one(idx: int, params: dict):
+            worker_a, worker_b = pairs.get()
+            try:
+                return idx, worker_a.call(params), worker_b.call(params)
+            finally:
+                pairs.put((worker_a, worker_b))
+
+        mismatches = []
+        times_a, times_b = [], []
+        sampler = AdaptiveSampler(call.parameters, explore) if adaptive else None
+        drawn = {}
+
+        def handle(idx: int, run_a: dict, run_b: dict):
+            times_a.append(run_a["time"])
+            times_b.append(run_b["time"])
+            name = f"mismatch_{idx:06d}.pkl"
+            record = compare_run_data(name, run_a, run_b, call.key_columns)
+            if sampler is not None:
+                sampler.record(run_a["parameters"], is_mismatch(record), drawn.pop(idx))
+            if is_mismatch(record):
+                mismatches.append(record)
+                with open(os.path.join(out_dir, name), "wb") as f:
+                    pickle.dump({
+                        "parameters": run_a["parameters"],
+                        "result_before": run_a["result"],
+                        "result_after": run_b["result"],
+                        "record": record,
+                    }, f)
+            if progress:
+                progress(len(times_a), num_runs, len(mismatches))
+
+        # results are dropped once compared, only 2 * workers pairs are held at a time
+        in_flight: deque = deque()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for idx in range(num_runs):
+                if sampler is not None:
+                    params, drawn[idx] = sampler.next()
+                else:
+                    params = generate_parameters(call.parameters)
+                in_flight.append(pool.submit(run_one, idx, params))
+                if len(in_flight) >= 2 * workers:
+                    handle(*in_flight.popleft().result())
+            while in_flight:
+                handle(*in_flight.popleft().result())
+
+        shrunk = None
+        if shrink_calls and mismatches:
+            original = pickle.load(open(os.path.join(out_dir, mismatches[0]["File"]), "rb"))["parameters"]
+
+            def is_failing(params: dict) -> bool:
+                _, run_a, run_b = run_one(-1, params)
+                return is_mismatch(compare_run_data("shrink", run_a, run_b, call.key_columns))
+
+            minimal, calls = shrink(original, call.parameters, is_failing, shrink_calls)
+            _, run_a, run_b = run_one(-1, minimal)
+            shrunk = {"from": mismatches[0]["File"], "parameters": minimal, "calls": calls}
+            with open(os.path.join(out_dir, "shrunk.pkl"), "wb") as f:
+                pickle.dump({
+                    "parameters": minimal,
+                    "original_parameters": original,
+                    "result_before": run_a["result"],
+                    "result_after": run_b["result"],
+                }, f)
+    finally:
+        for worker in all_workers:
+            worker.close()
+
+    summary = {
+        "function": call.full_name,
+        "env_a": vars(env_a),
+        "env_b": vars(env_b),
+        "runs": num_runs,
+        "mismatches": len(mismatches),
+        "mismatch_files": [record["File"] for record in mismatches],
+        "sampling": sampler.stats() if sampler is not None else None,
+        "shrunk": shrunk,
+        "time_a": _time_stats(times_a),
+        "time_b": _time_stats(times_b),
+        "started": started.isoformat(),
+        "elapsed": (datetime.now() - started).total_seconds(),
+    }
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=4, default=str)
+    return summary
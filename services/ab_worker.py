@@ -0,0 +1,72 @@
+"""
+Warm worker process for the live A/B mode.
+
+Started by services.ab_service with the interpreter and source root of one
+side of the comparison:
+
+    <python> services/ab_worker.py <source_root> <module.path.function>
+
+It imports the target function once, then answers pickled requests framed as
+<8-byte big-endian length><payload> on stdin with framed replies on stdout.
+Only the standard library is imported before the target module, so the
+worker runs in any environment that can import the target function.
+"""
+import os
+import sys
+import pickle
+import struct
+import importlib.util
+
+HEADER = struct.Struct(">Q")
+
+
+def read_frame(stream):
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    (size,) = HEADER.unpack(header)
+    return pickle.loads(stream.read(size))
+
+
+def write_frame(stream, obj) -> None:
+    payload = pickle.dumps(obj, protocol=4)
+    stream.write(HEADER.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def _load_execution_service():
+    # loaded by path under a private name: the source root may have its own "services" package
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "execution_service.py")
+    spec = importlib.util.spec_from_file_location("_ab_execution_service", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.use_standalone_helpers()
+    return module
+
+
+def main(source_root: str, full_name: str) -> None:
+    # replies go through a private copy of stdout, prints of the target land on stderr
+    channel_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    channel_in = sys.stdin.buffer
+    sys.stdout = sys.stderr
+
+    sys.path[0] = os.path.abspath(source_root)
+    execution_service = _load_execution_service()
+    try:
+        execution_service.load_callable(full_name)
+    except Exception as e:
+        write_frame(channel_out, ("error", f"{type(e).__name__}: {e}"))
+        return
+    write_frame(channel_out, ("ready", sys.version))
+
+    while True:
+        request = read_frame(channel_in)
+        if request is None or request[0] == "stop":
+            return
+        _, params = request
+        write_frame(channel_out, ("result", execution_service.execute(full_name, params)))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
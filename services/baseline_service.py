@@ -0,0 +1,83 @@
+"""
+Fingerprint baselines: results folders whose run files keep the parameters,
+timing and status of each run but replace the result by a ResultFingerprint
+(see utils.fingerprint). They are compared like any other folder and cost a
+few bytes per row instead of the full output.
+
+    python -m services.baseline_service <function name> <from folder> <to folder>
+"""
+import os
+import pickle
+import argparse
+from typing import Callable, List, Optional
+
+from services.execution_service import write_run_bytes
+from services.results_service import RESULTS_PATH, list_run_files, load_run
+from services.storage_service import load_function_calls
+from utils.chunked import CHUNKS_DIR, ChunkedResult
+from utils.lazy import lazy_import
+
+fingerprints = lazy_import("utils.fingerprint")
+
+
+def fingerprint_run(run: dict, key_columns: Optional[List[str]] = None) -> dict:
+    """The run dict with its result replaced by its fingerprint."""
+    return {**run, "result": fingerprints.fingerprint_result(run.get("result"), key_columns)}
+
+
+def fingerprint_folder(
+        abs_from: str,
+        abs_to: str,
+        key_columns: Optional[List[str]] = None,
+        progress: Optional[Callable[[int, int], None]] = None) -> dict:
+    """
+    Writes a fingerprint baseline of the run files of abs_from to abs_to,
+    under the same file names. abs_from is left untouched.
+    Returns {"files", "bytes_before", "bytes_after"}.
+    """
+    files = sorted(list_run_files(abs_from))
+    bytes_before = bytes_after = 0
+    for n, fname in enumerate(files, start=1):
+        path = os.path.join(abs_from, fname)
+        run = load_run(path)
+        bytes_before += os.path.getsize(path)
+        if isinstance(run.get("result"), ChunkedResult):
+            bytes_before += run["result"].nbytes
+        payload = pickle.dumps(fingerprint_run(run, key_columns))
+        write_run_bytes(os.path.join(abs_to, fname), payload)
+        bytes_after += len(payload)
+        if progress:
+            progress(n, len(files))
+    return {"files": len(files), "bytes_before": bytes_before, "bytes_after": bytes_after}
+
+
+def drop_chunk_file(run: dict, folder: str) -> None:
+    """Removes the chunk file of a chunked result of folder, once fingerprinted."""
+    result = run.get("result")
+    if isinstance(result, ChunkedResult):
+        path = os.path.join(folder, CHUNKS_DIR, result.file_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Converts a results folder to a fingerprint baseline.")
+    parser.add_argument("function", help="identifier (name) of a saved function call")
+    parser.add_argument("source", help="results folder to fingerprint, e.g. prd/pre")
+    parser.add_argument("target", help="folder of the fingerprint baseline, e.g. prd/pre_fp")
+    parser.add_argument("--results", default=RESULTS_PATH, help="results root")
+    args = parser.parse_args()
+
+    calls = {call.name: call for call in load_function_calls()}
+    if args.function not in calls:
+        parser.error(f"unknown function call {args.function!r}")
+    call = calls[args.function]
+    summary = fingerprint_folder(
+        os.path.join(os.path.abspath(args.results), args.source, call.name),
+        os.path.join(os.path.abspath(args.results), args.target, call.name),
+        call.key_columns,
+    )
+    print(
+        f"{summary['files']} run file(s): {summary['bytes_before'] / 1024 ** 2:.1f} MB "
+        f"-> {summary['bytes_after'] / 1024 ** 2:.1f} MB"
+    )
@@ -0,0 +1,154 @@
+"""
+Time-budgeted runs: as many runs of one or more function calls as fit in a
+time budget, on a pool of workers.
+
+Each free worker goes to the function that used the least time so far, so
+the budget is shared evenly between functions, and time a function cannot
+use (its next run would end after the deadline) goes to the others.
+Durations are predicted with the function's CostModel, calibrated on the
+runs of the current batch.
+
+    python -m services.budget_service <minutes> <folder> <function name>... [--workers N] [--executor KIND]
+"""
+import os
+import time
+import pickle
+import random
+import argparse
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional
+
+from models.function_call import FunctionCall
+from services.estimate_service import fit_cost_model, timing_history
+from services.execution_service import ensure_loadable, execute_batch, write_run_bytes
+from services.generation_service import generate_parameters
+from services.rerun_service import EXECUTOR_KINDS, make_executor
+from services.results_service import RESULTS_PATH
+from services.run_service import run_file_name
+from services.storage_service import load_function_calls
+from services.tracing_service import export_metrics, inc, span
+
+
+class _FunctionState:
+    """Scheduling state of one function of a budgeted batch."""
+
+    def __init__(self, call: FunctionCall, results_path: str, rng: random.Random):
+        self.call = call
+        self.rng = rng
+        self.model = fit_cost_model(timing_history(call.name, results_path), call.parameters)
+        self.next_params = generate_parameters(call.parameters, rng)
+        self.runs = self.failed = 0
+        self.used = 0.0          # wall-clock seconds of finished runs
+        self.pending = 0.0       # predicted seconds of runs in flight
+        self.predicted = 0.0     # predicted seconds of finished runs, for calibration
+
+    def raw_prediction(self, params: dict) -> float:
+        return self.model.predict(params) if self.model else 1.0
+
+    def predict_next(self) -> float:
+        """
+        Seconds the next run should take: the model prediction scaled by the
+        ratio of actual to predicted time of the finished runs. 0 for a
+        function without history that has not finished a run yet.
+        """
+        raw = self.raw_prediction(self.next_params)
+        if self.runs and self.predicted > 0:
+            return raw * self.used / self.predicted
+        return raw if self.model else 0.0
+
+
+def run_budget(
+        calls: List[FunctionCall],
+        budget_seconds: float,
+        folder: str,
+        workers: int = 1,
+        executor_kind: str = "serial",
+        isolation: Optional[dict] = None,
+        profile: bool = False,
+        results_path: str = RESULTS_PATH,
+        progress: Optional[Callable[[int, int], None]] = None,
+        seed: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Runs calls for budget_seconds of wall-clock time, writing run files to
+    <results_path>/<folder>/<name>/ as usual. A run is only started when it
+    is predicted to finish before the deadline; runs already started are
+    waited for. progress gets (elapsed, budget) in whole seconds.
+    Parameters are drawn from a random.Random seeded with seed (random by
+    default), never from the global random state.
+    Returns {name: {"runs", "failed", "seconds"}}.
+    """
+    if not calls:
+        raise ValueError("no function calls selected")
+    executor = make_executor(executor_kind, workers, isolation)
+    try:
+        for call in calls:
+            ensure_loadable(call.full_name, executor)
+    except BaseException:
+        executor.shutdown()
+        raise
+    rng = random.Random(seed)
+    states = [_FunctionState(call, results_path, rng) for call in calls]
+    started = time.time()
+    deadline = started + budget_seconds
+    in_flight = {}
+
+    def pick(now: float) -> Optional[_FunctionState]:
+        fitting = [s for s in states if now + s.predict_next() <= deadline]
+        return min(fitting, key=lambda s: s.used + s.pending) if fitting else None
+
+    with span("run_budget", functions=len(calls), budget=budget_seconds, workers=workers):
+        try:
+            while True:
+                while len(in_flight) < workers:
+                    state = pick(time.time())
+                    if state is None:
+                        break
+                    expected = state.predict_next()
+                    params, state.next_params = state.next_params, generate_parameters(state.call.parameters, state.rng)
+                    abs_folder = os.path.join(os.path.abspath(results_path), folder, state.call.name)
+                    submitted = time.time()
+                    future = executor.submit(execute_batch, state.call.full_name, [params], profile, abs_folder)
+                    in_flight[future] = (state, abs_folder, expected, state.raw_prediction(params), submitted)
+                    state.pending += expected
+                if not in_flight:
+                    break
+                done, _ = wait(list(in_flight), timeout=1.0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    state, abs_folder, expected, predicted, submitted = in_flight.pop(future)
+                    status, payload = future.result()[0]
+                    write_run_bytes(os.path.join(abs_folder, run_file_name(pickle.loads(payload))), payload)
+                    inc("fchk_calls_total", function=state.call.full_name, status=status)
+                    state.pending -= expected
+                    state.predicted += predicted
+                    state.used += time.time() - submitted
+                    state.runs += 1
+                    state.failed += status != "ok"
+                if progress:
+                    progress(min(int(time.time() - started), int(budget_seconds)), int(budget_seconds))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    export_metrics()
+    return {s.call.name: {"runs": s.runs, "failed": s.failed, "seconds": s.used} for s in states}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs saved function calls for a time budget.")
+    parser.add_argument("minutes", type=float, help="time budget")
+    parser.add_argument("folder", help="results folder, e.g. prd/pre")
+    parser.add_argument("functions", nargs="+", help="identifiers (names) of saved function calls")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--executor", choices=EXECUTOR_KINDS, default="serial")
+    parser.add_argument("--results", default=RESULTS_PATH, help="results root")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the parameter draws")
+    args = parser.parse_args()
+
+    saved = {call.name: call for call in load_function_calls()}
+    unknown = [name for name in args.functions if name not in saved]
+    if unknown:
+        parser.error(f"unknown function call(s): {', '.join(unknown)}")
+    summary = run_budget(
+        [saved[name] for name in args.functions], args.minutes * 60, args.folder,
+        workers=args.workers, executor_kind=args.executor, results_path=args.results, seed=args.seed,
+    )
+    for name, counts in summary.items():
+        print(f"{name}: {counts['runs']} run(s), {counts['failed']} failed, {counts['seconds']:.1f} s")
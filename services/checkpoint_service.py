@@ -0,0 +1,171 @@
+import os
+import json
+import uuid
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.results_service import ensure_results_folder
+
+# Journals live next to the run files: <function results folder>/.batches/<batch id>.jsonl
+BATCHES_DIR = ".batches"
+
+# Parsed journals by path: {"size", "mtime_ns", "offset", "header", "outcomes"}
+_parsed: Dict[str, dict] = {}
+_parsed_lock = threading.Lock()
+
+
+class BatchJournal:
+    """
+    Append-only checkpoint journal of a run or rerun batch.
+
+    The first line is the batch header (kind, planned items, settings); every
+    following line records the outcome of one item ("done" or "failed").
+    Lines are flushed and fsynced as they are written, so after a crash the
+    journal tells exactly which items can be skipped on resume. The files of
+    a rerun batch are kept next to the journal (<batch id>.files.json) to
+    keep the header line small.
+
+    Reading the journal parses it once per process: only the lines appended
+    since the previous read are parsed again.
+    """
+
+    def __init__(self, folder: str, batch_id: str):
+        self.folder = folder
+        self.batch_id = batch_id
+        self.path = os.path.join(folder, BATCHES_DIR, f"{batch_id}.jsonl")
+
+    @property
+    def files_path(self) -> str:
+        return os.path.join(self.folder, BATCHES_DIR, f"{self.batch_id}.files.json")
+
+    @classmethod
+    def create(cls, folder: str, kind: str, files: Optional[List[str]] = None, **header) -> "BatchJournal":
+        batch_id = f"{kind}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        return cls.open(folder, batch_id, kind, files, **header)
+
+    @classmethod
+    def open(
+            cls,
+            folder: str,
+            batch_id: str,
+            kind: str,
+            files: Optional[List[str]] = None,
+            **header) -> "BatchJournal":
+        """
+        The journal of batch_id, written with its header (and files) if it
+        does not exist yet: for batches whose id is chosen by the caller,
+        like the work items of a sweep (see services.queue_service).
+        """
+        journal = cls(folder, batch_id)
+        if os.path.exists(journal.path):
+            return journal
+        ensure_results_folder(folder)
+        os.makedirs(os.path.dirname(journal.path), exist_ok=True)
+        if files is not None:
+            tmp_path = journal.files_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(list(files), f)
+            os.replace(tmp_path, journal.files_path)
+        journal._append({
+            "type": "batch", "batch_id": batch_id, "kind": kind,
+            "created": datetime.now().isoformat(), **header
+        })
+        return journal
+
+    def _append(self, entry: dict) -> None:
+        line = (json.dumps(entry, default=str) + "\n").encode()
+        with open(self.path, "ab+") as f:
+            if f.seek(0, os.SEEK_END):
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    # torn last line of a crashed process: the entry gets a line of its own
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _parsed(self) -> dict:
+        """The parsed journal, read again (from where the last read stopped) when the file changed."""
+        stat = os.stat(self.path)
+        with _parsed_lock:
+            parsed = _parsed.get(self.path)
+            if parsed is not None and (parsed["size"], parsed["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                return parsed
+            if parsed is None or stat.st_size < parsed["offset"]:
+                parsed = {"offset": 0, "header": None, "outcomes": {}}
+            else:
+                parsed = dict(parsed, outcomes=dict(parsed["outcomes"]))
+            with open(self.path, "rb") as f:
+                f.seek(parsed["offset"])
+                data = f.read()
+            # a line still being written is left for the next read
+            complete = data.rfind(b"\n") + 1
+            for line in data[:complete].splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # torn line of a crashed process, ended by the next append
+                    continue
+                if parsed["header"] is None:
+                    parsed["header"] = entry
+                elif entry.get("type") == "item":
+                    parsed["outcomes"][entry["item"]] = entry
+            parsed.update(offset=parsed["offset"] + complete, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            _parsed[self.path] = parsed
+            return parsed
+
+    @property
+    def header(self) -> dict:
+        return self._parsed()["header"]
+
+    def files(self) -> Optional[List[str]]:
+        """Files of a rerun batch, None for other batches."""
+        if not os.path.exists(self.files_path):
+            return None
+        with open(self.files_path) as f:
+            return json.load(f)
+
+    def record(self, item, status: str, **details) -> None:
+        self._append({"type": "item", "item": item, "status": status, **details})
+
+    def outcomes(self) -> dict:
+        """Latest status of every item recorded so far."""
+        return dict(self._parsed()["outcomes"])
+
+    def completed(self) -> set:
+        return {item for item, e in self.outcomes().items() if e["status"] == "done"}
+
+    def progress(self) -> dict:
+        parsed = self._parsed()
+        header, outcomes = parsed["header"], parsed["outcomes"]
+        done = sum(e["status"] == "done" for e in outcomes.values())
+        return {
+            "batch_id": self.batch_id,
+            "kind": header["kind"],
+            "created": header["created"],
+            "planned": header.get("planned"),
+            "done": done,
+            "failed": len(outcomes) - done,
+        }
+
+
+def list_batches(folder: str, kind: Optional[str] = None, incomplete_only: bool = False) -> List[BatchJournal]:
+    """
+    Returns the journals of a function results folder, newest first.
+    """
+    batches_dir = os.path.join(folder, BATCHES_DIR)
+    if not os.path.isdir(batches_dir):
+        return []
+    journals = []
+    for filename in sorted(os.listdir(batches_dir), reverse=True):
+        if not filename.endswith(".jsonl"):
+            continue
+        journal = BatchJournal(folder, filename[:-len(".jsonl")])
+        progress = journal.progress()
+        if kind and progress["kind"] != kind:
+            continue
+        if incomplete_only and progress["planned"] is not None and progress["done"] >= progress["planned"]:
+            continue
+        journals.append(journal)
+    return journals
@@ -0,0 +1,61 @@
+import os
+import pickle
+import hashlib
+from typing import List
+
+# Compare reports are persisted per (path before, path after, function)
+COMPARE_CACHE_PATH = os.path.join("data", "cache", "compare")
+
+# Bump whenever the shape of a cached record changes
+CACHE_VERSION = 4
+
+
+def _cache_file(path_before: str, path_after: str, fn_name: str) -> str:
+    digest = hashlib.sha1(f"{path_before}\0{path_after}".encode()).hexdigest()
+    return os.path.join(COMPARE_CACHE_PATH, fn_name, f"{digest}.pkl")
+
+
+def load_compare_cache(path_before: str, path_after: str, fn_name: str, key_columns: List[str]) -> dict:
+    """
+    Returns the cached entries {file name: {"fingerprint": ..., "record": ...}}
+    of the last compare of the same folders and function.
+    Returns an empty dict if there is no usable cache (missing, corrupt,
+    older version or different key columns).
+    """
+    path = _cache_file(path_before, path_after, fn_name)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "rb") as f:
+            raw = pickle.load(f)
+    except (pickle.UnpicklingError, EOFError, OSError):
+        return {}
+    if raw.get("version") != CACHE_VERSION or raw.get("key_columns") != list(key_columns):
+        return {}
+    return raw.get("entries", {})
+
+
+def save_compare_cache(
+        path_before: str, path_after: str, fn_name: str, key_columns: List[str], entries: dict) -> None:
+    """
+    Overwrites the cached compare report atomically.
+    """
+    path = _cache_file(path_before, path_after, fn_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({
+            "version": CACHE_VERSION,
+            "path_before": path_before,
+            "path_after": path_after,
+            "function": fn_name,
+            "key_columns": list(key_columns),
+            "entries": entries,
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def clear_compare_cache(path_before: str, path_after: str, fn_name: str) -> None:
+    path = _cache_file(path_before, path_after, fn_name)
+    if os.path.exists(path):
+        os.remove(path)
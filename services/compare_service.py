@@ -0,0 +1,413 @@
+import os
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.results_service import list_run_files, load_run, file_fingerprint
+from services.compare_cache_service import load_compare_cache, save_compare_cache
+from services.sampling_service import sample_frame_rows, estimate_mismatch_rate, stratum_counts, stratum_key
+from services.tracing_service import export_metrics, inc, span
+from utils.chunked import frame_columns, frames_equal, is_dataframe, is_frame, materialize
+from utils.lazy import lazy_import, loaded
+from utils.resources import ResourceMeter
+
+pd = lazy_import("pandas")
+frame_diff = lazy_import("utils.compare_dfs")
+fingerprints = lazy_import("utils.fingerprint")
+
+
+def is_fingerprint(result) -> bool:
+    """Results of a fingerprint baseline, without importing utils.fingerprint in a process that never did."""
+    module = loaded("utils.fingerprint")
+    return module is not None and isinstance(result, module.ResultFingerprint)
+
+
+def resource_columns(data_before: dict, data_after: dict) -> dict:
+    """
+    Peak allocations of both runs (MB) and their relative change, for pairs
+    where both runs were profiled. Empty otherwise.
+    """
+    resources_before = data_before.get("resources")
+    resources_after = data_after.get("resources")
+    if not (resources_before and resources_after):
+        return {}
+    peak_before = resources_before["peak_alloc"]
+    peak_after = resources_after["peak_alloc"]
+    return {
+        "Peak MB Before": round(peak_before / 1024 ** 2, 3),
+        "Peak MB After": round(peak_after / 1024 ** 2, 3),
+        "Peak Change": (peak_after - peak_before) / peak_before if peak_before else None,
+        "CPU Time Change": resources_after["cpu_time"] - resources_before["cpu_time"],
+    }
+
+
+def memory_regressions(records: List[dict], threshold: float = 0.2) -> List[dict]:
+    """
+    Records whose peak allocations grew by more than threshold (0.2 = +20%).
+    """
+    return [
+        record for record in records
+        if record.get("Peak Change") is not None and record["Peak Change"] > threshold
+    ]
+
+
+def compare_run_data(
+        fname: str,
+        data_before: dict,
+        data_after: dict,
+        key_columns: Optional[List[str]] = None,
+        max_rows: Optional[int] = None,
+        measure_memory: bool = False) -> dict:
+    """
+    Builds the comparison record of one pair of run files.
+    With max_rows, DataFrame results are compared on a key-consistent
+    sample of about max_rows rows instead of in full. Chunked results
+    (see utils.chunked) are compared in full, chunk by chunk.
+    When either side is a fingerprint baseline, the other result is
+    fingerprinted too and the checks compare fingerprints (see
+    fingerprint_checks).
+    Runs that carry their duration get Time Before/After/Delta (seconds),
+    profiled runs also get the resource_columns of the pair.
+    With measure_memory, "Compare Peak MB" holds the peak allocations of the
+    checks (traced with tracemalloc, which slows them down).
+    Raises ValueError if the parameters of both runs differ.
+    """
+    if measure_memory:
+        with ResourceMeter() as meter:
+            record = compare_run_data(fname, data_before, data_after, key_columns, max_rows)
+        record["Compare Peak MB"] = round(meter.usage["peak_alloc"] / 1024 ** 2, 3)
+        return record
+
+    params_before = data_before.get("parameters", {})
+    params_after = data_after.get("parameters", {})
+    record = {"File": fname}
+    all_params = set(list(params_before.keys()) + list(params_after.keys()))
+    for key in all_params:
+        if params_before.get(key, "N/A") != params_after.get(key, "N/A"):
+            raise ValueError(f"Parameter '{key}' differs between before and after for file {fname}")
+        record[f"{key}"] = params_before.get(key, "N/A")
+
+    result_before = data_before.get("result")
+    result_after = data_after.get("result")
+    if is_fingerprint(result_before) or is_fingerprint(result_after):
+        record.update(fingerprint_checks(result_before, result_after, key_columns))
+        _add_run_columns(record, data_before, data_after)
+        return record
+
+    is_df_before = is_frame(result_before)
+    is_df_after = is_frame(result_after)
+    data_frame_before_check = "✅" if is_df_before else "❌"
+    data_frame_after_check = "✅" if is_df_after else "❌"
+    record["DataFrame Check"] = data_frame_before_check + " " + data_frame_after_check
+
+    record["Columns Check"] = "-"
+    record["Values Check"] = "-"
+    if is_df_before and is_df_after:
+        in_memory = is_dataframe(result_before) and is_dataframe(result_after)
+        if max_rows is not None and in_memory:
+            result_before, result_after = sample_frame_rows(result_before, result_after, key_columns or [], max_rows)
+        equal = frames_equal(result_before, result_after)
+        record["Values Check"] = "✅" if equal else "❌"
+        if equal:
+            record["Columns Check"] = "✅"
+        elif in_memory:
+            # schema diff and per-column hashes: which columns actually changed
+            keys = key_columns if key_columns and all(
+                k in df.columns for df in (result_before, result_after) for k in key_columns
+            ) else None
+            changes = fingerprints.column_changes(result_before, result_after, keys)
+            record["Columns Check"] = "❌" if _schema_changed(changes) else "✅"
+            record["Changed Columns"] = fingerprints.describe_column_changes(changes)
+        else:
+            same_columns = set(frame_columns(result_before)) == set(frame_columns(result_after))
+            record["Columns Check"] = "✅" if same_columns else "❌"
+    _add_run_columns(record, data_before, data_after)
+    return record
+
+
+def _schema_changed(diff: dict) -> bool:
+    return any(diff[k] for k in ("added_columns", "removed_columns", "renamed_columns", "dtype_changes"))
+
+
+def _add_run_columns(record: dict, data_before: dict, data_after: dict) -> None:
+    if "time" in data_before and "time" in data_after:
+        record["Time Before"] = data_before["time"]
+        record["Time After"] = data_after["time"]
+        record["Time Delta"] = data_after["time"] - data_before["time"]
+    record.update(resource_columns(data_before, data_after))
+
+
+def fingerprint_checks(result_before, result_after, key_columns: Optional[List[str]] = None) -> dict:
+    """
+    The DataFrame/Columns/Values checks of a pair compared through
+    fingerprints. The Columns Check fails on any schema change (see
+    schema_diff). Mismatching frames also get Changed Columns (see
+    describe_column_changes) and Changed Rows.
+    """
+    fp_before = fingerprints.fingerprint_result(result_before, key_columns)
+    fp_after = fingerprints.fingerprint_result(result_after, key_columns)
+    checks = {
+        "DataFrame Check": ("✅" if fp_before.is_frame else "❌") + " " + ("✅" if fp_after.is_frame else "❌"),
+        "Columns Check": "-",
+        "Values Check": "-",
+    }
+    if fp_before.is_frame and fp_after.is_frame:
+        checks["Columns Check"] = "✅"
+        checks["Values Check"] = "✅" if fp_before.digest == fp_after.digest else "❌"
+        if fp_before.digest != fp_after.digest:
+            diff = fingerprints.diff_fingerprints(fp_before, fp_after)
+            checks["Columns Check"] = "❌" if _schema_changed(diff) else "✅"
+            checks["Changed Columns"] = fingerprints.describe_column_changes(diff)
+            checks["Changed Rows"] = diff["changed_rows"]
+    return checks
+
+
+def fingerprint_detail(result_before, result_after, key_columns: Optional[List[str]] = None) -> "pd.DataFrame":
+    """Per-column change and summary statistics of a pair with a fingerprint side."""
+    fp_before = fingerprints.fingerprint_result(result_before, key_columns)
+    fp_after = fingerprints.fingerprint_result(result_after, key_columns)
+    if not (fp_before.is_frame and fp_after.is_frame):
+        return pd.DataFrame({"before": [repr(fp_before)], "after": [repr(fp_after)]})
+    diff = fingerprints.diff_fingerprints(fp_before, fp_after)
+    changes = {
+        **{c: "changed" for c in diff["changed_columns"]},
+        **{c: "added" for c in diff["added_columns"]},
+        **{c: "removed" for c in diff["removed_columns"]},
+        **{old: f"renamed to {new}" for old, new in diff["renamed_columns"]},
+        **{new: f"renamed from {old}" for old, new in diff["renamed_columns"]},
+        **{c: f"dtype {before} → {after}" for c, before, after in diff["dtype_changes"]},
+    }
+    columns = fp_after.columns + [c for c in fp_before.columns if c not in fp_after.columns]
+    return pd.DataFrame([
+        {
+            "Column": str(column),
+            "Change": changes.get(column, "-"),
+            "Before": str(fp_before.stats.get(column, "")),
+            "After": str(fp_after.stats.get(column, "")),
+        }
+        for column in columns
+    ])
+
+
+def is_mismatch(record: dict) -> bool:
+    """
+    A pair mismatches if only one side is a DataFrame or any DataFrame check failed.
+    """
+    df_before, df_after = record["DataFrame Check"].split(" ")
+    return df_before != df_after or "❌" in (record["Columns Check"], record["Values Check"])
+
+
+class MismatchBudget:
+    """
+    Fail-fast threshold: exceeded once more than max_mismatches pairs mismatch,
+    or once the mismatch rate goes above max_rate after at least min_compared pairs.
+    """
+
+    def __init__(self, max_mismatches: Optional[int] = None, max_rate: Optional[float] = None, min_compared: int = 20):
+        self.max_mismatches = max_mismatches
+        self.max_rate = max_rate
+        self.min_compared = min_compared
+        self.compared = 0
+        self.mismatches = 0
+
+    def add(self, mismatch: bool) -> None:
+        self.compared += 1
+        self.mismatches += mismatch
+
+    @property
+    def exceeded(self) -> bool:
+        if self.max_mismatches is not None and self.mismatches > self.max_mismatches:
+            return True
+        return (
+            self.max_rate is not None
+            and self.compared >= self.min_compared
+            and self.mismatches / self.compared > self.max_rate
+        )
+
+    def describe(self) -> str:
+        return f"{self.mismatches} mismatch(es) in {self.compared} compared pair(s)"
+
+
+def iter_compare_pairs(
+        abs_before: str,
+        abs_after: str,
+        files: Iterable[str],
+        key_columns: Optional[List[str]] = None,
+        max_rows: Optional[int] = None,
+        measure_memory: bool = False) -> Iterator[Tuple[str, dict]]:
+    """
+    Yields (file name, record) for each given run file present in both folders.
+    """
+    for fname in files:
+        with span("load_pair", file=fname):
+            data_before = load_run(os.path.join(abs_before, fname))
+            data_after = load_run(os.path.join(abs_after, fname))
+        with span("compare_pair", file=fname):
+            record = compare_run_data(fname, data_before, data_after, key_columns, max_rows, measure_memory)
+        inc("fchk_compare_pairs_total", outcome="mismatch" if is_mismatch(record) else "match")
+        yield fname, record
+
+
+def common_run_files(abs_before: str, abs_after: str) -> List[str]:
+    with span("list_run_files"):
+        return sorted(list_run_files(abs_before).intersection(list_run_files(abs_after)))
+
+
+def compare_folders(
+        abs_before: str,
+        abs_after: str,
+        path_before: str,
+        path_after: str,
+        fn_name: str,
+        key_columns: List[str],
+        use_cache: bool = True,
+        budget: Optional[MismatchBudget] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        measure_memory: bool = False) -> Tuple[List[dict], dict]:
+    """
+    Compares every run file present in both folders.
+
+    When use_cache is set, verdicts of pairs whose files are unchanged since
+    the last compare of the same folders are taken from the persisted report,
+    and only new or changed pairs are loaded and compared.
+    With a budget, comparing stops as soon as it is exceeded (cached verdicts
+    count too) and only the pairs compared so far are returned.
+    progress(done, total) is called after each pair actually compared.
+    With measure_memory, cached verdicts without a compare peak are compared again.
+    Returns the records (sorted by file name) and
+    {"total", "cached", "compared", "stopped_early"}.
+    """
+    files = common_run_files(abs_before, abs_after)
+    cached = load_compare_cache(path_before, path_after, fn_name, key_columns) if use_cache else {}
+
+    entries = {}
+    to_compare = []
+    for fname in files:
+        fingerprint = (
+            file_fingerprint(os.path.join(abs_before, fname)),
+            file_fingerprint(os.path.join(abs_after, fname)),
+        )
+        hit = cached.get(fname)
+        if hit is not None and hit["fingerprint"] == fingerprint and (
+                not measure_memory or "Compare Peak MB" in hit["record"]):
+            entries[fname] = hit
+        else:
+            entries[fname] = {"fingerprint": fingerprint, "record": None}
+            to_compare.append(fname)
+
+    stopped_early = False
+    if budget is not None:
+        for entry in entries.values():
+            if entry["record"] is not None:
+                budget.add(is_mismatch(entry["record"]))
+        stopped_early = budget.exceeded
+
+    compared = 0
+    if not stopped_early:
+        with span("compare_folders", function=fn_name, pairs=len(to_compare)):
+            for fname, record in iter_compare_pairs(
+                    abs_before, abs_after, to_compare, key_columns, measure_memory=measure_memory):
+                entries[fname]["record"] = record
+                compared += 1
+                if progress:
+                    progress(compared, len(to_compare))
+                if budget is not None:
+                    budget.add(is_mismatch(record))
+                    if budget.exceeded:
+                        stopped_early = True
+                        break
+        export_metrics()
+
+    entries = {fname: entry for fname, entry in entries.items() if entry["record"] is not None}
+    if use_cache:
+        save_compare_cache(path_before, path_after, fn_name, key_columns, entries)
+
+    records = [entries[fname]["record"] for fname in files if fname in entries]
+    stats = {
+        "total": len(files),
+        "cached": len(files) - len(to_compare),
+        "compared": compared,
+        "stopped_early": stopped_early,
+    }
+    return records, stats
+
+
+def compare_sample(
+        abs_before: str,
+        abs_after: str,
+        files: List[str],
+        population: int,
+        key_columns: List[str],
+        max_rows: Optional[int] = None,
+        confidence: float = 0.95,
+        progress: Optional[Callable[[int, int], None]] = None,
+        measure_memory: bool = False,
+        strata: Optional[Dict[str, tuple]] = None) -> Tuple[List[dict], dict]:
+    """
+    Compares a sample of the common run files (optionally sampling rows of
+    each frame too) and estimates the mismatch rate of the whole population.
+    strata ({file name: stratum key} of every common file) is given for a
+    stratified sample, whose estimate weights each stratum by its size.
+    Sampled verdicts are never cached. progress(done, total) is called
+    after each pair.
+    Returns the records and the estimate from estimate_mismatch_rate.
+    """
+    records = []
+    outcomes = {}
+    with span("compare_sample", pairs=len(files)):
+        for fname, record in iter_compare_pairs(abs_before, abs_after, files, key_columns, max_rows, measure_memory):
+            records.append(record)
+            outcomes[fname] = is_mismatch(record)
+            if progress:
+                progress(len(records), len(files))
+    export_metrics()
+    mismatches = sum(outcomes.values())
+    counts = stratum_counts(strata, outcomes) if strata else None
+    return records, estimate_mismatch_rate(mismatches, len(records), population, confidence, counts)
+
+
+def run_strata(
+        abs_folder: str,
+        files: List[str],
+        param_defs: list,
+        path_before: str,
+        path_after: str,
+        fn_name: str,
+        key_columns: List[str]) -> dict:
+    """
+    Returns {file name: stratum key} for stratified sampling. Parameters are
+    taken from the cached compare report when available and only loaded from
+    the run files otherwise.
+    """
+    cached = load_compare_cache(path_before, path_after, fn_name, key_columns)
+    strata = {}
+    for fname in files:
+        hit = cached.get(fname)
+        if hit is not None:
+            parameters = hit["record"]
+        else:
+            parameters = load_run(os.path.join(abs_folder, fname)).get("parameters", {})
+        strata[fname] = stratum_key(parameters, param_defs)
+    return strata
+
+
+def build_detail(
+        abs_before: str,
+        abs_after: str,
+        fname: str,
+        key_columns: List[str],
+        path_before: Optional[str] = None,
+        path_after: Optional[str] = None,
+        load: Callable[[str], dict] = load_run):
+    """
+    Loads one pair of run files (through load, e.g. a RunCache) and returns
+    the before/after detail view: a highlighted Styler for two DataFrames,
+    otherwise a two-column DataFrame. Chunked results are loaded in full.
+    Pairs with a fingerprint baseline side get the fingerprint_detail.
+    """
+    result_before = load(os.path.join(abs_before, fname)).get("result")
+    result_after = load(os.path.join(abs_after, fname)).get("result")
+    if is_fingerprint(result_before) or is_fingerprint(result_after):
+        return fingerprint_detail(result_before, result_after, key_columns)
+    result_before, result_after = materialize(result_before), materialize(result_after)
+    if is_dataframe(result_before) and is_dataframe(result_after):
+        return frame_diff.compare_dfs(result_before, result_after, key_columns, path_before, path_after)
+    return pd.DataFrame({"before": [str(result_before)], "after": [str(result_after)]})
@@ -0,0 +1,276 @@
+"""
+Runtime cost estimation from the recorded `time` of past runs.
+
+A CostModel predicts the duration of one call from the magnitudes of its
+parameters (numbers, list lengths, string lengths), fitted by least squares
+on the past runs of the function in every results folder. A batch is
+estimated by predicting a sample of freshly generated parameter sets.
+"""
+import os
+import math
+import time
+import pickle
+import random
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.function_call import FunctionCall
+from models.parameter_definition import ParameterDefinition
+from services.generation_service import generate_parameters
+from services.results_service import RESULTS_PATH, file_fingerprint, find_result_folders, list_run_files
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Timings read from run files, per function: {path: {"fingerprint", "time", "parameters", "status"}}
+TIMINGS_CACHE_PATH = os.path.join("data", "cache", "timings")
+
+# Newest run files read per function
+HISTORY_LIMIT = 2000
+
+# Past runs needed per fitted coefficient; with fewer, the mean time is used
+MIN_RUNS_PER_FEATURE = 5
+
+# Seconds a history read by TimingHistories is used before it is read again
+HISTORY_MAX_AGE = 30
+
+
+def _load_timings(fn_name: str) -> dict:
+    path = os.path.join(TIMINGS_CACHE_PATH, f"{fn_name}.pkl")
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+
+
+def _save_timings(fn_name: str, timings: dict) -> None:
+    path = os.path.join(TIMINGS_CACHE_PATH, f"{fn_name}.pkl")
+    os.makedirs(TIMINGS_CACHE_PATH, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(timings, f)
+    os.replace(tmp_path, path)
+
+
+def _read_timings(fn_name: str, results_path: str, limit: int) -> Dict[str, dict]:
+    """Cached timings of the newest run files of fn_name, by path, see timing_history."""
+    paths = [
+        os.path.join(results_path, folder, fn_name, fname)
+        for folder in find_result_folders(results_path, fn_name)
+        for fname in list_run_files(os.path.join(results_path, folder, fn_name))
+    ]
+    # run file names carry their timestamp
+    paths = sorted(paths, key=os.path.basename, reverse=True)[:limit]
+
+    cached = _load_timings(fn_name)
+    timings = {}
+    for path in paths:
+        try:
+            fingerprint = file_fingerprint(path)
+        except OSError:
+            continue
+        entry = cached.get(path)
+        if entry is None or entry["fingerprint"] != fingerprint:
+            try:
+                with open(path, "rb") as f:
+                    run = pickle.load(f)
+            except Exception:
+                continue
+            entry = {
+                "fingerprint": fingerprint,
+                "time": run.get("time"),
+                "parameters": run.get("parameters") or {},
+                "status": run.get("status", "ok"),
+            }
+        timings[path] = entry
+    if timings.keys() != cached.keys() or any(cached[p] is not timings[p] for p in timings):
+        _save_timings(fn_name, timings)
+    return timings
+
+
+def _history(timings: Dict[str, dict]) -> List[dict]:
+    return [
+        {"time": entry["time"], "parameters": entry["parameters"]}
+        for entry in timings.values()
+        if entry["status"] == "ok" and isinstance(entry["time"], (int, float))
+    ]
+
+
+def timing_history(fn_name: str, results_path: str = RESULTS_PATH, limit: int = HISTORY_LIMIT) -> List[dict]:
+    """
+    The {"time", "parameters"} of the newest successful runs of fn_name in
+    every results folder, at most limit of them. Run files are only
+    unpickled the first time they are seen (or after they change): their
+    timings are cached under TIMINGS_CACHE_PATH.
+    """
+    return _history(_read_timings(fn_name, results_path, limit))
+
+
+class TimingHistories:
+    """
+    timing_history of each function, read in a background thread so that a
+    page never waits for run files to be listed or unpickled. get() returns
+    the last history read with a stamp that changes with the run files it
+    comes from, and starts a new read once it is older than max_age seconds.
+    """
+
+    def __init__(self, results_path: str = RESULTS_PATH, max_age: float = HISTORY_MAX_AGE):
+        self.results_path = results_path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._histories: Dict[str, Tuple[float, str, List[dict]]] = {}
+        self._reading = set()
+
+    def get(self, fn_name: str) -> Optional[Tuple[str, List[dict]]]:
+        """(stamp, history) of fn_name, None until its first read is done."""
+        with self._lock:
+            entry = self._histories.get(fn_name)
+            if (entry is None or time.monotonic() - entry[0] > self.max_age) and fn_name not in self._reading:
+                self._reading.add(fn_name)
+                threading.Thread(target=self._read, args=(fn_name,), name=f"timings-{fn_name}", daemon=True).start()
+        return (entry[1], entry[2]) if entry else None
+
+    def _read(self, fn_name: str) -> None:
+        try:
+            timings = _read_timings(fn_name, self.results_path, HISTORY_LIMIT)
+            stamp = hashlib.sha1(repr(sorted((p, e["fingerprint"]) for p, e in timings.items())).encode()).hexdigest()
+            with self._lock:
+                self._histories[fn_name] = (time.monotonic(), stamp, _history(timings))
+        finally:
+            with self._lock:
+                self._reading.discard(fn_name)
+
+    def wait(self, fn_name: str, timeout: float = 10.0) -> Optional[Tuple[str, List[dict]]]:
+        """get(), waiting up to timeout seconds for a read in progress (for scripts)."""
+        deadline = time.monotonic() + timeout
+        entry = self.get(fn_name)
+        while time.monotonic() < deadline:
+            with self._lock:
+                if fn_name not in self._reading:
+                    break
+            time.sleep(0.01)
+        return self.get(fn_name) or entry
+
+
+def magnitude(value) -> float:
+    """Size of a parameter value: a list's length, a number's absolute value, a string's length."""
+    if isinstance(value, (list, tuple, set, dict)):
+        return float(len(value))
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return abs(float(value)) if math.isfinite(value) else 0.0
+    if isinstance(value, str):
+        return float(len(value))
+    return 0.0
+
+
+@dataclass
+class CostModel:
+    """
+    Predicted seconds of one call: intercept plus one coefficient per
+    parameter magnitude (no coefficients: the mean time of past runs).
+    residual_std is the spread of the past times around the predictions.
+    """
+    samples: int
+    intercept: float
+    coefficients: Dict[str, float] = field(default_factory=dict)
+    residual_std: float = 0.0
+
+    def predict(self, params: dict) -> float:
+        seconds = self.intercept + sum(c * magnitude(params.get(name)) for name, c in self.coefficients.items())
+        return max(seconds, 0.0)
+
+
+def fit_cost_model(history: List[dict], param_defs: List[ParameterDefinition]) -> Optional[CostModel]:
+    """
+    Fits a CostModel on timing_history entries. Parameters whose magnitude
+    never varies are left out; with fewer than MIN_RUNS_PER_FEATURE past
+    runs per coefficient the model is the mean time.
+    Returns None without history.
+    """
+    if not history:
+        return None
+    times = np.array([h["time"] for h in history], dtype=float)
+    names = [p.name for p in param_defs]
+    features = np.array([[magnitude(h["parameters"].get(name)) for name in names] for h in history], dtype=float)
+    varying = [i for i in range(len(names)) if len(history) > 1 and np.ptp(features[:, i]) > 0]
+
+    if not varying or len(history) < MIN_RUNS_PER_FEATURE * (len(varying) + 1):
+        return CostModel(len(history), float(times.mean()), {}, float(times.std()))
+
+    design = np.column_stack([np.ones(len(history)), features[:, varying]])
+    solution, *_ = np.linalg.lstsq(design, times, rcond=None)
+    residuals = times - np.clip(design @ solution, 0.0, None)
+    return CostModel(
+        len(history),
+        float(solution[0]),
+        {names[i]: float(c) for i, c in zip(varying, solution[1:])},
+        float(residuals.std()),
+    )
+
+
+def estimate_runs(
+        model: CostModel,
+        make_params: Callable[[random.Random], dict],
+        runs: int,
+        workers: int = 1,
+        draws: int = 200,
+        seed: int = 0) -> dict:
+    """
+    Estimated wall-clock seconds of runs calls spread over workers, predicted
+    on draws parameter sets from make_params(rng), the generator the runs
+    use. rng is a random.Random of its own, so the global random state (and
+    any run drawing from it) is left alone. low and high bound the total at
+    about two standard deviations.
+    """
+    rng = random.Random(seed)
+    predictions = np.array([model.predict(make_params(rng)) for _ in range(draws)])
+    per_run = float(predictions.mean())
+    spread = math.sqrt(runs * (model.residual_std ** 2 + float(predictions.var())))
+    seconds = runs * per_run
+    workers = max(1, min(workers, runs))
+    return {
+        "runs": runs,
+        "workers": workers,
+        "samples": model.samples,
+        "per_run": per_run,
+        "seconds": seconds / workers,
+        "low": max(seconds - 2 * spread, 0.0) / workers,
+        "high": (seconds + 2 * spread) / workers,
+    }
+
+
+def estimate_call(
+        call: FunctionCall,
+        runs: int,
+        workers: int = 1,
+        history: Optional[List[dict]] = None,
+        make_params: Optional[Callable[[random.Random], dict]] = None,
+        results_path: str = RESULTS_PATH) -> Optional[dict]:
+    """
+    estimate_runs for a saved function call, None if it never ran. history
+    defaults to timing_history (see TimingHistories to read it off the
+    page), make_params to generation_service.generate_parameters.
+    """
+    if history is None:
+        history = timing_history(call.name, results_path)
+    model = fit_cost_model(history, call.parameters)
+    if model is None:
+        return None
+    if make_params is None:
+        make_params = lambda rng: generate_parameters(call.parameters, rng)
+    return estimate_runs(model, make_params, runs, workers)
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
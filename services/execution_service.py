@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import pickle
+import inspect
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Callables already imported in this process, by full name
+_CALLABLES: Dict[str, Callable] = {}
+
+# Only the standard library is imported with this module: services.ab_worker
+# loads it by path inside another source tree, where "services" and "utils"
+# are missing or are packages of that tree. The app's helpers are imported
+# on first use instead, or replaced by the stand-ins of use_standalone_helpers.
+_HELPERS = {
+    "span": ("services.tracing_service", "span"),
+    "inc": ("services.tracing_service", "inc"),
+    "take_metrics": ("services.tracing_service", "take_metrics"),
+    "ensure_results_folder": ("services.results_service", "ensure_results_folder"),
+    "is_stream": ("utils.chunked", "is_stream"),
+    "collect_chunks": ("utils.chunked", "collect_chunks"),
+    "write_chunks": ("utils.chunked", "write_chunks"),
+    "ResourceMeter": ("utils.resources", "ResourceMeter"),
+    "result_size": ("utils.resources", "result_size"),
+}
+_helpers: Dict[str, Any] = {}
+_standalone = False
+
+
+def _helper(name: str) -> Any:
+    if name not in _helpers:
+        if _standalone:
+            raise RuntimeError(f"{name} is not available outside the app's source tree")
+        module, attribute = _HELPERS[name]
+        _helpers[name] = getattr(import_module(module), attribute)
+    return _helpers[name]
+
+
+@contextmanager
+def _no_span(name: str, **attrs):
+    yield {}
+
+
+def _collect_standalone(stream) -> Any:
+    chunks = list(stream)
+    pd = sys.modules.get("pandas")
+    if chunks and pd is not None and all(isinstance(chunk, pd.DataFrame) for chunk in chunks):
+        return pd.concat(chunks)
+    return chunks
+
+
+def use_standalone_helpers() -> None:
+    """
+    Replaces the app's helpers with standard library stand-ins, for a copy
+    of this module running in another source tree (see services.ab_worker):
+    no tracing, and chunked results collected in memory. Profiling and
+    writing run files are not available there.
+    """
+    global _standalone
+    _standalone = True
+    _helpers.clear()
+    _helpers.update({
+        "span": _no_span,
+        "inc": lambda name, value=1.0, **labels: None,
+        "is_stream": lambda result: isinstance(result, Iterator),
+        "collect_chunks": _collect_standalone,
+    })
+
+
+def span(name: str, **attrs):
+    return _helper("span")(name, **attrs)
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    _helper("inc")(name, value, **labels)
+
+
+def load_callable(full_name: str) -> Callable:
+    """
+    Imports module.path.function once per process and returns the function.
+    Raises ValueError if full_name has no module path.
+    """
+    if full_name not in _CALLABLES:
+        if '.' not in full_name:
+            raise ValueError(
+                "Invalid full_name format. Expected a full name with module path (e.g., 'module.submodule.function')."
+            )
+        module_path, func_name = full_name.rsplit(".", 1)
+        with span("import", function=full_name):
+            mod = import_module(module_path)
+        _CALLABLES[full_name] = getattr(mod, func_name)
+    return _CALLABLES[full_name]
+
+
+def import_error(full_name: str) -> Optional[str]:
+    """None if load_callable(full_name) succeeds, otherwise why it fails."""
+    try:
+        load_callable(full_name)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def ensure_loadable(full_name: str, executor: Any = None) -> None:
+    """
+    Fails fast on import errors before a batch starts. An executor running
+    calls in worker processes of its own (IsolatedPool, DaemonPool) is asked
+    to import full_name there with check_callable, so the target is never
+    imported in this process; otherwise it is loaded here.
+    Raises ValueError if a worker cannot load full_name.
+    """
+    check_callable = getattr(executor, "check_callable", None)
+    if check_callable is None:
+        load_callable(full_name)
+        return
+    error = check_callable(full_name)
+    if error:
+        raise ValueError(f"The workers cannot load {full_name}: {error}")
+
+
+def call_function(func: Callable, params: dict) -> Any:
+    """
+    Calls func with params as keyword arguments, falling back to positional
+    arguments for positional-only parameters.
+    """
+    try:
+        return func(**params)
+    except TypeError as te:
+        msg = str(te)
+        if "takes no keyword arguments" in msg or "positional-only" in msg:
+            sig = inspect.signature(func)
+            pos_args = []
+            kw_args = {}
+            for name, param in sig.parameters.items():
+                if param.kind == inspect.Parameter.POSITIONAL_ONLY:
+                    pos_args.append(params[name])
+                else:
+                    kw_args[name] = params[name]
+            return func(*pos_args, **kw_args)
+        raise
+
+
+def _produce(func: Callable, params: dict, chunk_dir: Optional[str]) -> Any:
+    result = call_function(func, params)
+    if _helper("is_stream")(result):
+        result = _helper("write_chunks")(result, chunk_dir) if chunk_dir else _helper("collect_chunks")(result)
+    return result
+
+
+def execute(full_name: str, params: dict, profile: bool = False, chunk_dir: Optional[str] = None) -> dict:
+    """
+    Runs one call and returns the run dict stored in run_*.pkl files.
+    A failing call stores the error message as its result and "error" as its status.
+    With profile, the run dict also gets a "resources" entry with the peak
+    Python allocations, RSS delta, CPU time, GC collections and result size.
+    A call returning an iterator has its chunks written one by one to a
+    chunk file of chunk_dir (the results folder of the run), see
+    utils.chunked; without chunk_dir they are collected in memory.
+    The time of such calls includes consuming the iterator.
+    """
+    func = load_callable(full_name)
+    meter = _helper("ResourceMeter")() if profile else None
+    start_time = time.time()
+    status = "ok"
+    try:
+        with span("call", function=full_name):
+            if meter:
+                with meter:
+                    result = _produce(func, params, chunk_dir)
+            else:
+                result = _produce(func, params, chunk_dir)
+    except Exception as e:
+        result = f"Function call error: {e}"
+        status = "error"
+    elapsed = time.time() - start_time
+    run = {
+        "result": result,
+        "parameters": params,
+        "timestamp": datetime.now().isoformat(),
+        "time": elapsed,
+        "status": status
+    }
+    if meter:
+        run["resources"] = {**meter.usage, "result_size": _helper("result_size")(result)}
+    return run
+
+
+def execute_batch(
+        full_name: str,
+        batch: List[dict],
+        profile: bool = False,
+        chunk_dir: Optional[str] = None) -> List[Tuple[str, bytes]]:
+    """
+    Runs a batch of parameter sets and returns (status, pickled run dict) pairs,
+    so results cross process boundaries and hit the disk serialized once.
+    """
+    results = []
+    for params in batch:
+        run = execute(full_name, params, profile, chunk_dir)
+        with span("serialize", function=full_name):
+            results.append((run["status"], pickle.dumps(run)))
+    return results
+
+
+def execute_batch_in_worker(
+        full_name: str,
+        batch: List[dict],
+        profile: bool = False,
+        chunk_dir: Optional[str] = None) -> Tuple[List[Tuple[str, bytes]], dict]:
+    """
+    execute_batch in a worker process, plus the metrics it recorded there
+    (see tracing_service.take_metrics), for the process that exports them.
+    """
+    return execute_batch(full_name, batch, profile, chunk_dir), _helper("take_metrics")()
+
+
+def write_run_bytes(path: str, payload: bytes) -> None:
+    """
+    Writes a run file atomically: the payload goes to a hidden temporary file
+    that is renamed over path, so a crash never leaves a partial run_*.pkl.
+    """
+    folder, filename = os.path.split(path)
+    with span("write_run", bytes=len(payload)):
+        _helper("ensure_results_folder")(folder)
+        tmp_path = os.path.join(folder, f".{filename}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    inc("fchk_run_files_written_total")
+    inc("fchk_run_bytes_written_total", len(payload))
+
+
+def save_run(path: str, run: dict) -> None:
+    with span("serialize"):
+        payload = pickle.dumps(run)
+    write_run_bytes(path, payload)
+
@@ -9,30 +9,40 @@ def _to_date(val):
         return date.today()
     raise ValueError(val)
 
-def generate_value(param: ParameterDefinition):
-    # pick a single value
+def generate_value(param: ParameterDefinition, rng=random):
+    # pick a single value, drawn from rng (the global random state by default)
     def pick_one():
         if param.specific_values:
-            return random.choice(param.specific_values)
+            return rng.choice(param.specific_values)
         if param.range:
             low, high = param.range
             if param.type == "int":
-                return random.randint(int(low), int(high))
+                return rng.randint(int(low), int(high))
             if param.type == "float":
-                return random.uniform(float(low), float(high))
+                return rng.uniform(float(low), float(high))
             if param.type == "date":
                 d0, d1 = _to_date(low), _to_date(high)
                 span = (d1 - d0).days
-                return d0 + timedelta(days=random.randint(0, span))
-        # fallback
+                return d0 + timedelta(days=rng.randint(0, span))
+        # fallback, without specific values or range
+        if param.type == "int":
+            return rng.randint(0, 1)
+        if param.type == "float":
+            return rng.uniform(0.0, 1.0)
+        if param.type == "str":
+            return "sample"
+        if param.type == "boolean":
+            return rng.choice([True, False])
+        if param.type == "date":
+            return date.today()
         return None
 
     if param.is_list:
         ln = param.list_length
-        count = ln if isinstance(ln, int) else random.randint(*ln)
+        count = ln if isinstance(ln, int) else rng.randint(*ln)
         return [pick_one() for _ in range(count)]
     else:
         return pick_one()
 
-def generate_parameters(params: list[ParameterDefinition]) -> dict:
-    return {p.name: generate_value(p) for p in params}
+def generate_parameters(params: list[ParameterDefinition], rng=random) -> dict:
+    return {p.name: generate_value(p, rng) for p in params}
@@ -0,0 +1,128 @@
+"""
+Bulk import of function call definitions from JSON or YAML files.
+
+A file holds one definition (an object in the function_calls.json format)
+or a list of them; a directory is searched for *.json, *.yaml and *.yml
+files. Every definition is validated before anything is saved, and the
+definitions file is rewritten once.
+
+    python -m services.import_service <file or directory> [--update]
+"""
+import os
+import json
+import argparse
+from typing import List, Tuple
+
+from services.storage_service import function_call_from_dict, load_function_calls, save_function_calls
+from services.validation_service import validate_function_calls
+
+DEFINITION_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+class DefinitionErrors(ValueError):
+    """Raised by import_definitions with every problem found, in errors."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__(f"{len(errors)} problem(s) in the definitions:\n" + "\n".join(errors))
+        self.errors = errors
+
+
+def parse_definitions(text: str, source: str) -> List[Tuple[str, dict]]:
+    """
+    Parses the content of one definitions file, in YAML if source ends with
+    .yaml/.yml and JSON otherwise. Returns (label, definition) pairs, the
+    label locating each definition for error messages.
+    Raises DefinitionErrors if the file cannot be parsed.
+    """
+    try:
+        if source.lower().endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise DefinitionErrors([f"{source}: reading YAML needs PyYAML (pip install pyyaml)"])
+            content = yaml.safe_load(text)
+        else:
+            content = json.loads(text)
+    except DefinitionErrors:
+        raise
+    except Exception as e:
+        raise DefinitionErrors([f"{source}: cannot be parsed: {e}"])
+    if isinstance(content, dict):
+        return [(source, content)]
+    if isinstance(content, list):
+        return [(f"{source}[{i}]", item) for i, item in enumerate(content)]
+    raise DefinitionErrors([f"{source}: expected a definition or a list of definitions"])
+
+
+def read_definitions(path: str) -> List[Tuple[str, dict]]:
+    """
+    Reads a definitions file, or every definitions file under a directory
+    (in name order). Parse errors of all files are reported together.
+    """
+    if os.path.isdir(path):
+        files = sorted(
+            os.path.join(root, filename)
+            for root, _, filenames in os.walk(path)
+            for filename in filenames
+            if filename.lower().endswith(DEFINITION_EXTENSIONS)
+        )
+    elif os.path.exists(path):
+        files = [path]
+    else:
+        raise DefinitionErrors([f"{path}: no such file or directory"])
+
+    entries, errors = [], []
+    for file_path in files:
+        with open(file_path, encoding="utf-8") as f:
+            text = f.read()
+        try:
+            entries.extend(parse_definitions(text, os.path.relpath(file_path, path) if file_path != path else path))
+        except DefinitionErrors as e:
+            errors.extend(e.errors)
+    if errors:
+        raise DefinitionErrors(errors)
+    return entries
+
+
+def import_definitions(entries: List[Tuple[str, dict]], update_existing: bool = False) -> dict:
+    """
+    Validates all (label, definition) entries in one pass, then saves them
+    with a single write of the definitions file. Names must be unique in the
+    batch; saved calls with the same name are replaced with update_existing,
+    and an error otherwise. Nothing is saved if any definition is invalid.
+    Returns {"added", "updated", "total"}. Raises DefinitionErrors.
+    """
+    calls, sources, errors = [], [], []
+    for source, item in entries:
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("not an object")
+            calls.append(function_call_from_dict(item))
+            sources.append(source)
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            detail = f"missing {e}" if isinstance(e, KeyError) else str(e)
+            errors.append(f"{source}: malformed definition ({detail})")
+
+    existing = load_function_calls()
+    existing_names = {call.name for call in existing}
+    errors.extend(validate_function_calls(calls, set() if update_existing else existing_names, sources))
+    if errors:
+        raise DefinitionErrors(errors)
+
+    imported = {call.name: call for call in calls}
+    merged = [imported.pop(call.name, call) for call in existing]
+    save_function_calls(merged + list(imported.values()))
+    updated = len(existing_names & {call.name for call in calls})
+    return {"added": len(calls) - updated, "updated": updated, "total": len(merged) + len(imported)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Imports function call definitions from JSON/YAML files.")
+    parser.add_argument("path", help="definitions file or directory")
+    parser.add_argument("--update", action="store_true", help="replace saved calls with the same name")
+    args = parser.parse_args()
+    try:
+        summary = import_definitions(read_definitions(args.path), args.update)
+    except DefinitionErrors as e:
+        parser.exit(1, f"{e}\n")
+    print(f"{summary['added']} added, {summary['updated']} updated, {summary['total']} function call(s) saved")
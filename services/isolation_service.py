@@ -0,0 +1,205 @@
+import os
+import time
+import queue
+import pickle
+import multiprocessing
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from services.execution_service import execute, execute_batch, import_error
+from services.tracing_service import merge_metrics, take_metrics
+from utils.resources import rss_bytes
+
+# Statuses recorded in the run dict when the call could not complete normally
+TIMEOUT, CRASHED, MEMORY_LIMIT = "timeout", "crashed", "memory_limit"
+
+_POLL_INTERVAL = 0.05
+
+
+def _worker_main(conn) -> None:
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        # replies carry the metrics recorded since the previous one, added to those of the pool's process
+        if request[0] == "check":
+            conn.send_bytes(pickle.dumps((import_error(request[1]), take_metrics())))
+            continue
+        _, full_name, params, profile, chunk_dir = request
+        run = execute(full_name, params, profile, chunk_dir)
+        conn.send_bytes(pickle.dumps((run["status"], pickle.dumps(run), take_metrics())))
+
+
+def failed_run(params: dict, status: str, message: str, elapsed: float) -> dict:
+    return {
+        "result": f"Function call {status}: {message}",
+        "parameters": params,
+        "timestamp": datetime.now().isoformat(),
+        "time": elapsed,
+        "status": status,
+        "error": message,
+    }
+
+
+class _SupervisedWorker:
+    """One worker process, started lazily and replaced after a kill or max_calls calls."""
+
+    def __init__(self, context):
+        self._context = context
+        self.process = None
+        self.conn = None
+        self.calls = 0
+
+    def ensure_started(self) -> None:
+        if self.process is None or not self.process.is_alive():
+            parent_conn, child_conn = self._context.Pipe()
+            self.process = self._context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+            self.process.start()
+            child_conn.close()
+            self.conn = parent_conn
+            self.calls = 0
+
+    def kill(self) -> None:
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+        self.process = None
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(timeout=5)
+        self.kill()
+
+
+class IsolatedPool(Executor):
+    """
+    Runs calls in supervised worker processes.
+
+    Each call gets a wall-clock timeout and an RSS limit checked while it
+    runs; a worker that exceeds either, or dies, is killed and replaced, and
+    the call is recorded as a structured outcome ("timeout", "memory_limit",
+    "crashed") instead of failing the batch. Workers are recycled after
+    max_calls_per_worker calls to contain leaks.
+
+    submit() accepts execute_batch tasks only, so the pool can be used in
+    place of the rerun pipeline executors.
+    """
+
+    def __init__(
+            self,
+            workers: int = 1,
+            timeout: Optional[float] = None,
+            max_rss_mb: Optional[float] = None,
+            max_calls_per_worker: Optional[int] = None):
+        context = multiprocessing.get_context("spawn")
+        self.timeout = timeout
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.max_calls_per_worker = max_calls_per_worker
+        self._idle: queue.Queue = queue.Queue()
+        self._workers = [_SupervisedWorker(context) for _ in range(workers)]
+        for worker in self._workers:
+            self._idle.put(worker)
+        self._supervisors = ThreadPoolExecutor(max_workers=workers)
+
+    def _call(
+            self,
+            worker: _SupervisedWorker,
+            full_name: str,
+            params: dict,
+            profile: bool,
+            chunk_dir: Optional[str]) -> Tuple[str, bytes]:
+        worker.ensure_started()
+        start_time = time.time()
+        try:
+            worker.conn.send(("call", full_name, params, profile, chunk_dir))
+        except OSError as e:
+            worker.kill()
+            return CRASHED, pickle.dumps(failed_run(params, CRASHED, str(e), 0.0))
+
+        while True:
+            if worker.conn.poll(_POLL_INTERVAL):
+                try:
+                    status, payload, metrics = pickle.loads(worker.conn.recv_bytes())
+                except (EOFError, OSError):
+                    break
+                merge_metrics(metrics)
+                worker.calls += 1
+                if self.max_calls_per_worker and worker.calls >= self.max_calls_per_worker:
+                    worker.stop()
+                return status, payload
+            elapsed = time.time() - start_time
+            if not worker.process.is_alive():
+                break
+            if self.timeout is not None and elapsed > self.timeout:
+                worker.kill()
+                message = f"no result after {self.timeout}s"
+                return TIMEOUT, pickle.dumps(failed_run(params, TIMEOUT, message, elapsed))
+            rss = rss_bytes(worker.process.pid) if self.max_rss else None
+            if rss is not None and rss > self.max_rss:
+                worker.kill()
+                message = f"worker RSS {rss / 1024 ** 2:.0f} MB above {self.max_rss / 1024 ** 2:.0f} MB"
+                return MEMORY_LIMIT, pickle.dumps(failed_run(params, MEMORY_LIMIT, message, elapsed))
+
+        exitcode = worker.process.exitcode if worker.process is not None else None
+        worker.kill()
+        message = f"worker exited with code {exitcode}"
+        return CRASHED, pickle.dumps(failed_run(params, CRASHED, message, time.time() - start_time))
+
+    def _run_batch(
+            self,
+            full_name: str,
+            batch: List[dict],
+            profile: bool = False,
+            chunk_dir: Optional[str] = None) -> List[Tuple[str, bytes]]:
+        worker = self._idle.get()
+        try:
+            return [self._call(worker, full_name, params, profile, chunk_dir) for params in batch]
+        finally:
+            self._idle.put(worker)
+
+    def check_callable(self, full_name: str) -> Optional[str]:
+        """
+        Imports full_name in a worker (which keeps it for the calls that
+        follow): None if it loads, otherwise why it does not.
+        """
+        worker = self._idle.get()
+        try:
+            worker.ensure_started()
+            try:
+                worker.conn.send(("check", full_name))
+                if self.timeout is not None and not worker.conn.poll(self.timeout):
+                    worker.kill()
+                    return f"no import after {self.timeout}s"
+                error, metrics = pickle.loads(worker.conn.recv_bytes())
+                merge_metrics(metrics)
+                return error
+            except (EOFError, OSError):
+                exitcode = worker.process.exitcode if worker.process is not None else None
+                worker.kill()
+                return f"worker exited with code {exitcode} while importing"
+        finally:
+            self._idle.put(worker)
+
+    def run_call(self, full_name: str, params: dict, profile: bool = False, chunk_dir: Optional[str] = None) -> dict:
+        """Runs one call in a worker, blocking, and returns its run dict."""
+        _, payload = self._run_batch(full_name, [params], profile, chunk_dir)[0]
+        return pickle.loads(payload)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        if fn is not execute_batch:
+            raise ValueError("IsolatedPool only runs execute_batch tasks")
+        return self._supervisors.submit(self._run_batch, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._supervisors.shutdown(wait=wait, cancel_futures=cancel_futures)
+        for worker in self._workers:
+            worker.stop()
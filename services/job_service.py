@@ -0,0 +1,240 @@
+import os
+import json
+import uuid
+import time
+import threading
+import traceback
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+# Every job is persisted as data/jobs/<job id>/job.json, with its log next to it in log.txt
+JOBS_PATH = os.path.join("data", "jobs")
+
+# Jobs running at the same time in this app process; more are queued
+MAX_CONCURRENT_JOBS = int(os.environ.get("FCHK_MAX_JOBS", "2"))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, INTERRUPTED = (
+    "queued", "running", "done", "failed", "cancelled", "interrupted"
+)
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Values kept by jobs (JobContext.keep) and not read yet; the oldest are dropped beyond this
+MAX_KEPT_RESULTS = int(os.environ.get("FCHK_MAX_KEPT_RESULTS", "8"))
+
+# job.json is rewritten at most this often for progress updates
+_PERSIST_INTERVAL = 0.5
+
+
+class JobCancelled(Exception):
+    """Raised from JobContext.progress once the job was asked to stop."""
+
+
+class JobContext:
+    """
+    Handed to the job function: reports progress, writes to the job log and
+    tells whether the job was cancelled. progress() raises JobCancelled after
+    a cancel request, so pipelines that report progress stop at their next step.
+    """
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self._manager = manager
+        self.job_id = job_id
+        self.cancel_requested = threading.Event()
+
+    def progress(self, done: int, total: int) -> None:
+        self._manager._update(self.job_id, progress={"done": done, "total": total})
+        if self.cancel_requested.is_set():
+            raise JobCancelled()
+
+    def log(self, message: str) -> None:
+        self._manager._log(self.job_id, message)
+
+    def keep(self, value: Any) -> None:
+        """
+        Keeps a value too large or rich for the job summary (e.g. compare
+        records) in memory, until JobManager.result hands it over.
+        """
+        self._manager._keep(self.job_id, value)
+
+
+class JobManager:
+    """
+    Runs long operations (runs, reruns, compares) in background threads of
+    the app process, so they survive page reruns and several can run at
+    once, up to max_concurrent. The job table is persisted under jobs_path;
+    jobs still queued or running when the app stopped are marked interrupted
+    on the next start (their batch journals allow resuming them).
+
+    job.json holds a JSON summary only; richer outcomes are kept in memory
+    (JobContext.keep) for the page that submitted the job, which reads them
+    once with result(). At most max_kept of them wait to be read.
+    """
+
+    def __init__(
+            self,
+            jobs_path: str = JOBS_PATH,
+            max_concurrent: int = MAX_CONCURRENT_JOBS,
+            max_kept: int = MAX_KEPT_RESULTS):
+        self.jobs_path = jobs_path
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = {}
+        self._contexts: Dict[str, JobContext] = {}
+        self._futures: Dict[str, Future] = {}
+        self._results: "OrderedDict[str, Any]" = OrderedDict()
+        self.max_kept = max_kept
+        self._persisted_at: Dict[str, float] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="job")
+        os.makedirs(jobs_path, exist_ok=True)
+        self._load()
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.jobs_path, job_id)
+
+    def _load(self) -> None:
+        for job_id in os.listdir(self.jobs_path):
+            path = os.path.join(self._job_dir(job_id), "job.json")
+            try:
+                with open(path) as f:
+                    job = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            self._jobs[job_id] = job
+            if job["status"] in ACTIVE_STATUSES:
+                job["status"] = INTERRUPTED
+                job["finished"] = datetime.now().isoformat()
+                self._persist(job_id)
+
+    def _persist(self, job_id: str) -> None:
+        job_dir = self._job_dir(job_id)
+        tmp_path = os.path.join(job_dir, ".job.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._jobs[job_id], f, indent=4, default=str)
+        os.replace(tmp_path, os.path.join(job_dir, "job.json"))
+        self._persisted_at[job_id] = time.monotonic()
+
+    def _update(self, job_id: str, force: bool = False, **changes) -> None:
+        with self._lock:
+            self._jobs[job_id].update(changes)
+            if force or time.monotonic() - self._persisted_at.get(job_id, 0.0) >= _PERSIST_INTERVAL:
+                self._persist(job_id)
+
+    def _log(self, job_id: str, message: str) -> None:
+        with open(os.path.join(self._job_dir(job_id), "log.txt"), "a") as f:
+            f.write(f"{datetime.now().isoformat(timespec='seconds')} {message}\n")
+
+    def submit(self, kind: str, title: str, fn: Callable[..., Any], *args, target: Optional[str] = None, **kwargs) -> str:
+        """
+        Queues fn(context, *args, **kwargs) and returns the job id.
+        fn should report progress through context.progress and may return a
+        JSON-serializable dict, stored as the job summary. target names what the job works on
+        (e.g. a batch id), see active_targets.
+        """
+        job_id = f"{kind}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        os.makedirs(self._job_dir(job_id), exist_ok=True)
+        context = JobContext(self, job_id)
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "kind": kind,
+                "title": title,
+                "target": target,
+                "status": QUEUED,
+                "created": datetime.now().isoformat(),
+                "started": None,
+                "finished": None,
+                "progress": {"done": 0, "total": None},
+                "summary": None,
+                "error": None,
+            }
+            self._contexts[job_id] = context
+            self._persist(job_id)
+        self._log(job_id, f"queued: {title}")
+        self._futures[job_id] = self._pool.submit(self._run, job_id, context, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, context: JobContext, fn: Callable, args: tuple, kwargs: dict) -> None:
+        if context.cancel_requested.is_set():
+            # cancelled while the pool was starting it, too late for future.cancel()
+            self._update(job_id, force=True, status=CANCELLED, finished=datetime.now().isoformat())
+            self._log(job_id, "cancelled before start")
+            return
+        self._update(job_id, force=True, status=RUNNING, started=datetime.now().isoformat())
+        self._log(job_id, "started")
+        try:
+            result = fn(context, *args, **kwargs)
+        except JobCancelled:
+            self._update(job_id, force=True, status=CANCELLED, finished=datetime.now().isoformat())
+            self._log(job_id, "cancelled")
+            return
+        except Exception as e:
+            self._log(job_id, traceback.format_exc())
+            self._update(job_id, force=True, status=FAILED, error=str(e), finished=datetime.now().isoformat())
+            return
+        self._update(job_id, force=True, status=DONE, summary=result, finished=datetime.now().isoformat())
+        self._log(job_id, "done")
+
+    def cancel(self, job_id: str) -> None:
+        """Cancels a queued job at once, a running one at its next progress report."""
+        context = self._contexts.get(job_id)
+        if context is None:
+            return
+        context.cancel_requested.set()
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            self._update(job_id, force=True, status=CANCELLED, finished=datetime.now().isoformat())
+            self._log(job_id, "cancelled before start")
+        else:
+            self._log(job_id, "cancel requested")
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _keep(self, job_id: str, value: Any) -> None:
+        with self._lock:
+            self._results[job_id] = value
+            self._results.move_to_end(job_id)
+            while len(self._results) > self.max_kept:
+                dropped, _ = self._results.popitem(last=False)
+                self._log(dropped, "kept result dropped, never read")
+
+    def result(self, job_id: str) -> Any:
+        """
+        Value kept by a finished job of this app process, None otherwise.
+        The value is handed over once: the manager no longer holds it afterwards.
+        """
+        with self._lock:
+            return self._results.pop(job_id, None)
+
+    def list_jobs(self, kind: Optional[str] = None) -> List[dict]:
+        """Jobs of the table, newest first."""
+        with self._lock:
+            jobs = [dict(job) for job in self._jobs.values() if kind is None or job["kind"] == kind]
+        return sorted(jobs, key=lambda job: job["created"], reverse=True)
+
+    def active_targets(self, kind: Optional[str] = None) -> set:
+        """Targets of the queued and running jobs, to avoid working twice on the same batch."""
+        return {job["target"] for job in self.list_jobs(kind) if job["status"] in ACTIVE_STATUSES}
+
+    def log_tail(self, job_id: str, lines: int = 20) -> List[str]:
+        path = os.path.join(self._job_dir(job_id), "log.txt")
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return [line.rstrip("\n") for line in deque(f, maxlen=lines)]
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """The job manager of this app process, shared by every session and page."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
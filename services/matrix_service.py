@@ -0,0 +1,59 @@
+import os
+import string
+from itertools import combinations
+from typing import Callable, List, Optional, Tuple
+
+from services.results_service import list_run_files, load_run
+from utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+fingerprints = lazy_import("utils.fingerprint")
+
+
+def _class_label(idx: int) -> str:
+    letters = string.ascii_uppercase
+    return letters[idx] if idx < len(letters) else f"C{idx}"
+
+
+def compare_matrix(
+        folders: List[str],
+        labels: List[str],
+        progress: Optional[Callable[[int, int], None]] = None) -> Tuple["pd.DataFrame", "pd.DataFrame"]:
+    """
+    Compares the runs of N result folders (absolute paths of the function
+    folder, named by labels). Every run file is loaded once and reduced to a
+    digest of its result, so the I/O grows linearly with the number of folders.
+
+    Returns:
+    - one row per run file with its equivalence class in each folder
+      (folders with the same letter produced the same result, "-" if missing)
+      and the number of distinct classes
+    - the labels x labels agreement matrix: share of the runs present in both
+      folders that produced the same result
+    """
+    files_per_folder = [list_run_files(folder) for folder in folders]
+    all_files = sorted(set().union(*files_per_folder))
+
+    rows = []
+    for n, fname in enumerate(all_files):
+        classes = {}
+        row = {"File": fname}
+        for folder, label, files in zip(folders, labels, files_per_folder):
+            if fname not in files:
+                row[label] = "-"
+                continue
+            digest = fingerprints.result_digest(load_run(os.path.join(folder, fname)).get("result"))
+            classes.setdefault(digest, _class_label(len(classes)))
+            row[label] = classes[digest]
+        row["Classes"] = len(classes)
+        rows.append(row)
+        if progress:
+            progress(n + 1, len(all_files))
+
+    df_runs = pd.DataFrame(rows, columns=["File"] + list(labels) + ["Classes"])
+    agreement = pd.DataFrame(1.0, index=labels, columns=labels)
+    for a, b in combinations(labels, 2):
+        both = df_runs[(df_runs[a] != "-") & (df_runs[b] != "-")]
+        share = (both[a] == both[b]).mean() if len(both) else float("nan")
+        agreement.loc[a, b] = agreement.loc[b, a] = share
+    return df_runs, agreement
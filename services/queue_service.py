@@ -0,0 +1,492 @@
+"""
+Sharded execution of large sweeps through a work queue on shared storage.
+
+A coordinator splits a sweep (a number of runs of one function) into work
+items of consecutive seeds and writes them to a queue directory:
+
+    <queue>/<sweep id>/sweep.json               the sweep header
+    <queue>/<sweep id>/items/<item>.json        work items
+    <queue>/<sweep id>/leases/<item>.lease.<n>  claimed items, with owner and expiry
+    <queue>/<sweep id>/done/<item>.json         finished items
+    <queue>/<sweep id>/failed/<item>.json       items that could not be run
+
+Workers on any host that mounts the queue (and the results folder) claim
+items by creating a lease file exclusively (see Lease), run them with
+run_batch into the usual data/results/<folder>/<name>/ layout and renew the lease
+while they work. A lease not renewed before it expires (crashed or cut-off
+worker) is reclaimed by the next worker looking for work, which resumes the
+item from its batch journal with the same seeds.
+
+    python -m services.queue_service enqueue <function name> <runs> --folder prd/pre
+    python -m services.queue_service work [--exit-when-idle]
+    python -m services.queue_service status [<sweep id>]
+"""
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import argparse
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from models.function_call import FunctionCall
+from models.parameter_definition import ParameterDefinition
+from services.checkpoint_service import BatchJournal
+from services.generation_service import generate_parameters
+from services.results_service import RESULTS_PATH
+from services.run_service import run_batch
+from services.storage_service import load_function_calls
+from services.tracing_service import inc, span
+
+QUEUE_PATH = os.path.join("data", "queue")
+
+# A lease not renewed for this long is considered stale and can be reclaimed
+LEASE_SECONDS = 300
+
+# Attempts at an item failing with OSError (shared storage hiccups) before it is marked failed
+ITEM_ATTEMPTS = 3
+
+
+class LeaseLost(Exception):
+    """Raised in a worker whose lease expired and was reclaimed by another worker."""
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _names(folder: str, suffix: str) -> set:
+    if not os.path.isdir(folder):
+        return set()
+    return {f[:-len(suffix)] for f in os.listdir(folder) if f.endswith(suffix)}
+
+
+def enqueue_sweep(
+        call: FunctionCall,
+        folder: str,
+        runs: int,
+        runs_per_item: int = 20,
+        base_seed: Optional[int] = None,
+        queue_path: str = QUEUE_PATH) -> str:
+    """
+    Writes a sweep of runs calls of call, split into items of runs_per_item
+    seeds, to the queue. Run i generates its parameters with seed
+    base_seed + i (random base seed by default). Results go to
+    <results path>/<folder>/<call.name>/ of the workers.
+    Returns the sweep id.
+    """
+    if runs < 1 or runs_per_item < 1:
+        raise ValueError("runs and runs_per_item must be at least 1")
+    if base_seed is None:
+        base_seed = random.randrange(2 ** 31)
+    sweep_id = f"sweep_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    sweep_dir = os.path.join(queue_path, sweep_id)
+    for sub in ("items", "leases", "done", "failed"):
+        os.makedirs(os.path.join(sweep_dir, sub), exist_ok=True)
+
+    starts = range(0, runs, runs_per_item)
+    for n, start in enumerate(starts):
+        item_id = f"{n:05d}"
+        _write_json(os.path.join(sweep_dir, "items", f"{item_id}.json"), {
+            "item_id": item_id,
+            "sweep_id": sweep_id,
+            "full_name": call.full_name,
+            "name": call.name,
+            "folder": folder,
+            "parameters": [asdict(p) for p in call.parameters],
+            "seeds": [base_seed + i for i in range(start, min(start + runs_per_item, runs))],
+        })
+    # written last: workers only pick sweeps whose header exists, i.e. fully enqueued
+    _write_json(os.path.join(sweep_dir, "sweep.json"), {
+        "sweep_id": sweep_id,
+        "full_name": call.full_name,
+        "name": call.name,
+        "folder": folder,
+        "runs": runs,
+        "items": len(starts),
+        "base_seed": base_seed,
+        "created": datetime.now().isoformat(),
+    })
+    return sweep_id
+
+
+def _lease_generations(path: str) -> List[int]:
+    """Generations of the lease of path (<item>.lease), in increasing order."""
+    folder, name = os.path.split(path)
+    prefix = f"{name}."
+    try:
+        entries = os.listdir(folder)
+    except FileNotFoundError:
+        return []
+    return sorted(int(f[len(prefix):]) for f in entries if f.startswith(prefix) and f[len(prefix):].isdigit())
+
+
+def current_lease(path: str) -> Optional[dict]:
+    """Content of the latest generation of the lease of path, None if the item is not leased."""
+    generations = _lease_generations(path)
+    return _read_json(f"{path}.{generations[-1]}") if generations else None
+
+
+class Lease:
+    """
+    Exclusive claim of one work item. A lease is a series of generation
+    files <item>.lease.<n>, each written by a single worker: claiming an
+    item (or reclaiming it once the latest generation expired) creates the
+    next generation with os.link, which fails if another worker created it
+    first, and the holder is the owner of the latest generation. Renewing
+    replaces the holder's own generation file and checks that no later one
+    appeared, so a worker never overwrites the lease of another one.
+    Link and rename are atomic on local and NFS (v3+) file systems.
+    Expiry is compared across hosts, so their clocks must be roughly in sync
+    (well below the lease duration).
+    """
+
+    def __init__(self, path: str, owner: str, seconds: float):
+        self.path = path
+        self.owner = owner
+        self.seconds = seconds
+        self.generation: Optional[int] = None
+
+    @property
+    def held_path(self) -> str:
+        """Generation file of this lease, once acquired."""
+        return f"{self.path}.{self.generation}"
+
+    def _content(self) -> dict:
+        return {
+            "owner": self.owner,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "expires": time.time() + self.seconds,
+        }
+
+    def _write(self, exclusive: bool) -> None:
+        tmp_path = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._content(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        if not exclusive:
+            os.replace(tmp_path, self.held_path)
+            return
+        try:
+            os.link(tmp_path, self.held_path)
+        finally:
+            os.remove(tmp_path)
+
+    def _is_latest(self) -> bool:
+        return self.generation is not None and _lease_generations(self.path)[-1:] == [self.generation]
+
+    def acquire(self) -> bool:
+        """Claims the item, reclaiming an expired lease. False if someone else holds it."""
+        generations = _lease_generations(self.path)
+        if generations:
+            latest = _read_json(f"{self.path}.{generations[-1]}")
+            # unreadable: released by its owner in between
+            if latest is None or latest["expires"] > time.time():
+                return False
+        self.generation = generations[-1] + 1 if generations else 0
+        try:
+            self._write(exclusive=True)
+        except FileExistsError:
+            self.generation = None
+            return False
+        if not self._is_latest():
+            # a later generation by a worker that listed the lease before its release
+            os.remove(self.held_path)
+            self.generation = None
+            return False
+        for generation in generations:
+            _remove(f"{self.path}.{generation}")
+        return True
+
+    def renew(self) -> None:
+        """Pushes the expiry back. Raises LeaseLost if the lease was reclaimed."""
+        if not self._is_latest():
+            raise LeaseLost(self.path)
+        self._write(exclusive=False)
+        if not self._is_latest():
+            raise LeaseLost(self.path)
+
+    def release(self) -> None:
+        generations = _lease_generations(self.path)
+        if self.generation is not None and generations[-1:] == [self.generation]:
+            for generation in generations:
+                _remove(f"{self.path}.{generation}")
+        self.generation = None
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _Heartbeat:
+    """Renews a lease in the background, every third of its duration."""
+
+    def __init__(self, lease: Lease):
+        self.lease = lease
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.lease.seconds / 3):
+            try:
+                self.lease.renew()
+            except LeaseLost:
+                self.lost = True
+                return
+            except OSError:
+                # shared storage hiccup: the next beat tries again, well before the lease expires
+                inc("fchk_queue_renew_errors_total")
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_item(item: dict, lease: Lease, results_path: str = RESULTS_PATH, profile: bool = False) -> dict:
+    """
+    Runs the seeds of a work item not done yet according to its batch
+    journal, which lives in the results folder next to the run files.
+    Stops with LeaseLost as soon as the lease is found reclaimed.
+    Returns the journal progress of the item.
+    """
+    abs_folder = os.path.join(os.path.abspath(results_path), item["folder"], item["name"])
+    journal = BatchJournal.open(
+        abs_folder, f"{item['sweep_id']}_{item['item_id']}", "shard",
+        planned=len(item["seeds"]), full_name=item["full_name"], sweep_id=item["sweep_id"],
+    )
+
+    parameters = [
+        ParameterDefinition(**{
+            **p,
+            "range": tuple(p["range"]) if p.get("range") is not None else None,
+            "list_length": tuple(p["list_length"]) if isinstance(p.get("list_length"), list) else p.get("list_length"),
+        })
+        for p in item["parameters"]
+    ]
+
+    with _Heartbeat(lease) as heartbeat:
+        def check_lease(done: int, total: int) -> None:
+            if heartbeat.lost:
+                raise LeaseLost(lease.path)
+
+        run_batch(
+            item["full_name"], lambda rng: generate_parameters(parameters, rng), abs_folder, journal,
+            progress=check_lease, profile=profile, seeds=item["seeds"],
+        )
+    return journal.progress()
+
+
+def _run_item_attempts(
+        item: dict,
+        lease: Lease,
+        results_path: str,
+        profile: bool,
+        retry_seconds: float,
+        log: Callable[[str], None]) -> dict:
+    for attempt in range(1, ITEM_ATTEMPTS + 1):
+        try:
+            if attempt > 1:
+                # still ours after the wait: raises LeaseLost otherwise
+                lease.renew()
+            return run_item(item, lease, results_path, profile)
+        except OSError as e:
+            if attempt == ITEM_ATTEMPTS:
+                raise
+            log(f"item {item['item_id']}: {type(e).__name__}: {e}, attempt {attempt + 1} in {retry_seconds:g}s")
+            inc("fchk_queue_item_retries_total")
+            time.sleep(retry_seconds)
+            retry_seconds *= 2
+
+
+def _open_sweeps(queue_path: str) -> List[str]:
+    if not os.path.isdir(queue_path):
+        return []
+    return sorted(
+        sweep_id for sweep_id in os.listdir(queue_path)
+        if os.path.exists(os.path.join(queue_path, sweep_id, "sweep.json"))
+    )
+
+
+def claim_next(queue_path: str, owner: str, lease_seconds: float = LEASE_SECONDS):
+    """
+    Claims the first item of the oldest sweep that is neither finished, failed
+    nor validly leased. Returns (item, lease), or None if nothing is left.
+    """
+    for sweep_id in _open_sweeps(queue_path):
+        sweep_dir = os.path.join(queue_path, sweep_id)
+        closed = _names(os.path.join(sweep_dir, "done"), ".json") | _names(os.path.join(sweep_dir, "failed"), ".json")
+        for item_id in sorted(_names(os.path.join(sweep_dir, "items"), ".json") - closed):
+            lease = Lease(os.path.join(sweep_dir, "leases", f"{item_id}.lease"), owner, lease_seconds)
+            if not lease.acquire():
+                continue
+            # finished by the previous holder between the listing and the claim
+            if os.path.exists(os.path.join(sweep_dir, "done", f"{item_id}.json")):
+                lease.release()
+                continue
+            return _read_json(os.path.join(sweep_dir, "items", f"{item_id}.json")), lease
+    return None
+
+
+def work(
+        queue_path: str = QUEUE_PATH,
+        results_path: str = RESULTS_PATH,
+        lease_seconds: float = LEASE_SECONDS,
+        poll_seconds: float = 10.0,
+        exit_when_idle: bool = False,
+        profile: bool = False,
+        retry_seconds: float = 5.0,
+        log: Callable[[str], None] = print) -> int:
+    """
+    Worker loop: claims and runs items until the queue is empty (with
+    exit_when_idle) or forever, polling for new sweeps every poll_seconds.
+    An item failing with OSError (NFS timeout, stale file handle) is resumed
+    from its journal after retry_seconds, then twice as long, up to
+    ITEM_ATTEMPTS attempts; any other error fails the item at once.
+    Returns the number of items finished by this worker.
+    """
+    owner = f"{socket.gethostname()}_{os.getpid()}_{uuid.uuid4().hex[:6]}"
+    finished = 0
+    while True:
+        claimed = claim_next(queue_path, owner, lease_seconds)
+        if claimed is None:
+            if exit_when_idle:
+                return finished
+            time.sleep(poll_seconds)
+            continue
+
+        item, lease = claimed
+        sweep_dir = os.path.join(queue_path, item["sweep_id"])
+        log(f"{owner}: item {item['sweep_id']}/{item['item_id']} ({len(item['seeds'])} runs)")
+        try:
+            with span("queue_item", sweep=item["sweep_id"], item=item["item_id"]):
+                progress = _run_item_attempts(item, lease, results_path, profile, retry_seconds, log)
+        except LeaseLost:
+            log(f"{owner}: lease of item {item['item_id']} lost, leaving it to its new owner")
+            inc("fchk_queue_items_total", outcome="lost")
+            continue
+        except Exception as e:
+            # the function cannot be run at all (import error, bad definition) or the storage
+            # kept failing: left for "retry" once fixed
+            _write_json(os.path.join(sweep_dir, "failed", f"{item['item_id']}.json"), {
+                "owner": owner, "error": f"{type(e).__name__}: {e}", "finished": datetime.now().isoformat(),
+            })
+            lease.release()
+            log(f"{owner}: item {item['item_id']} failed: {e}")
+            inc("fchk_queue_items_total", outcome="failed")
+            continue
+        _write_json(os.path.join(sweep_dir, "done", f"{item['item_id']}.json"), {
+            "owner": owner, "finished": datetime.now().isoformat(), **progress,
+        })
+        lease.release()
+        inc("fchk_queue_items_total", outcome="done")
+        finished += 1
+
+
+def sweep_status(sweep_id: str, queue_path: str = QUEUE_PATH) -> dict:
+    """Item counts of a sweep: done, failed, leased (valid lease), stale (expired lease) and pending."""
+    sweep_dir = os.path.join(queue_path, sweep_id)
+    header = _read_json(os.path.join(sweep_dir, "sweep.json"))
+    if header is None:
+        raise ValueError(f"No sweep {sweep_id} in {queue_path}")
+    items = _names(os.path.join(sweep_dir, "items"), ".json")
+    done = _names(os.path.join(sweep_dir, "done"), ".json")
+    failed = _names(os.path.join(sweep_dir, "failed"), ".json")
+    leased = stale = 0
+    now = time.time()
+    leases_dir = os.path.join(sweep_dir, "leases")
+    leased_items = {f.split(".lease.")[0] for f in os.listdir(leases_dir) if ".lease." in f and not f.endswith(".tmp")}
+    for item_id in leased_items - done - failed:
+        lease = current_lease(os.path.join(leases_dir, f"{item_id}.lease"))
+        if lease is not None and lease["expires"] <= now:
+            stale += 1
+        else:
+            leased += 1
+    return {
+        **header,
+        "done": len(done),
+        "failed": len(failed),
+        "leased": leased,
+        "stale": stale,
+        "pending": len(items) - len(done) - len(failed) - leased - stale,
+    }
+
+
+def retry_failed(sweep_id: str, queue_path: str = QUEUE_PATH) -> int:
+    """Puts the failed items of a sweep back in the queue. Returns how many."""
+    failed_dir = os.path.join(queue_path, sweep_id, "failed")
+    item_ids = _names(failed_dir, ".json")
+    for item_id in item_ids:
+        os.remove(os.path.join(failed_dir, f"{item_id}.json"))
+    return len(item_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded sweeps through a work queue on shared storage.")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="queue directory, shared by every host")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="split a sweep into work items")
+    enqueue.add_argument("function", help="identifier (name) of a saved function call")
+    enqueue.add_argument("runs", type=int)
+    enqueue.add_argument("--folder", default="prd/pre", help="results folder, e.g. prd/pre")
+    enqueue.add_argument("--runs-per-item", type=int, default=20)
+    enqueue.add_argument("--seed", type=int, default=None, help="base seed of the sweep")
+
+    worker = commands.add_parser("work", help="claim and run work items")
+    worker.add_argument("--results", default=RESULTS_PATH, help="results root, shared by every host")
+    worker.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS)
+    worker.add_argument("--poll-seconds", type=float, default=10.0)
+    worker.add_argument("--exit-when-idle", action="store_true")
+    worker.add_argument("--profile", action="store_true", help="record the resource footprint of each call")
+    worker.add_argument("--retry-seconds", type=float, default=5.0, help="first wait before retrying a storage error")
+
+    status = commands.add_parser("status", help="progress of the sweeps")
+    status.add_argument("sweep", nargs="?")
+
+    retry = commands.add_parser("retry", help="requeue the failed items of a sweep")
+    retry.add_argument("sweep")
+
+    args = parser.parse_args()
+    if args.command == "enqueue":
+        calls = {call.name: call for call in load_function_calls()}
+        if args.function not in calls:
+            parser.error(f"unknown function call {args.function!r}")
+        print(enqueue_sweep(calls[args.function], args.folder, args.runs, args.runs_per_item, args.seed, args.queue))
+    elif args.command == "work":
+        finished = work(
+            args.queue, args.results, args.lease_seconds, args.poll_seconds, args.exit_when_idle, args.profile,
+            args.retry_seconds, log=lambda message: print(message, flush=True),
+        )
+        print(f"{finished} item(s) done")
+    elif args.command == "status":
+        for sweep_id in [args.sweep] if args.sweep else _open_sweeps(args.queue):
+            print(json.dumps(sweep_status(sweep_id, args.queue)))
+    else:
+        print(f"{retry_failed(args.sweep, args.queue)} item(s) requeued")
@@ -0,0 +1,191 @@
+import os
+import csv
+import html
+import json
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+
+from services.compare_service import compare_run_data, fingerprint_detail, is_fingerprint, is_mismatch
+from services.results_service import load_run
+from services.table_service import RECORD_COLUMNS
+from utils.chunked import materialize
+from utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+frame_diff = lazy_import("utils.compare_dfs")
+
+# Reports are written to data/reports/<function name>/<timestamp>/
+REPORTS_PATH = os.path.join("data", "reports")
+
+_HTML_STYLE = """
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; font-size: 0.9em; }
+th, td { border: 1px solid #ccc; padding: 0.25em 0.6em; text-align: center; }
+th { background: #f0f0f0; }
+tr.mismatch td { background: #fde2e2; }
+nav a { margin-right: 1em; }
+"""
+
+
+def _html_page(title: str, body: str) -> str:
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(title)}</title><style>{_HTML_STYLE}</style></head>"
+        f"<body>{body}</body></html>"
+    )
+
+
+class ReportWriter:
+    """
+    Streams a comparison report to disk as records arrive:
+    - summary.csv and summary.jsonl: one line per compared pair
+    - diffs.jsonl: one line per differing cell
+    - index.html and page_NNNN.html: self-contained paginated HTML summary
+    Only the current HTML page is buffered, so memory does not grow with the number of pairs.
+    The CSV and HTML columns are the same for every pair: the parameter
+    names, then every record column (see table_service.RECORD_COLUMNS), then
+    Mismatch, blank where a pair has no value.
+    """
+
+    def __init__(self, out_dir: str, title: str, parameter_names: Iterable[str] = (), page_size: int = 200):
+        self.out_dir = out_dir
+        self.title = title
+        parameter_names = list(parameter_names)
+        self.columns = parameter_names + [c for c in RECORD_COLUMNS if c not in parameter_names] + ["Mismatch"]
+        self.page_size = page_size
+        self.pairs = 0
+        self.mismatches = 0
+        self.diff_lines = 0
+        self.pages = 0
+        self._page_rows: List[dict] = []
+
+    def __enter__(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._summary_csv = open(os.path.join(self.out_dir, "summary.csv"), "w", newline="", encoding="utf-8")
+        self._summary_jsonl = open(os.path.join(self.out_dir, "summary.jsonl"), "w", encoding="utf-8")
+        self._diffs_jsonl = open(os.path.join(self.out_dir, "diffs.jsonl"), "w", encoding="utf-8")
+        self._csv_writer = csv.DictWriter(self._summary_csv, fieldnames=self.columns, extrasaction="ignore")
+        self._csv_writer.writeheader()
+        return self
+
+    def write_pair(self, record: dict, diffs: Optional["pd.DataFrame"] = None) -> None:
+        mismatch = is_mismatch(record)
+        row = dict(record, Mismatch=mismatch)
+        self._csv_writer.writerow(row)
+        self._summary_jsonl.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+
+        if diffs is not None:
+            for cell in diffs.to_dict(orient="records"):
+                cell["File"] = record["File"]
+                self._diffs_jsonl.write(json.dumps(cell, default=str, ensure_ascii=False) + "\n")
+                self.diff_lines += 1
+
+        self.pairs += 1
+        self.mismatches += mismatch
+        self._page_rows.append(row)
+        if len(self._page_rows) >= self.page_size:
+            self._flush_page()
+
+    def _page_name(self, number: int) -> str:
+        return f"page_{number:04d}.html"
+
+    def _flush_page(self) -> None:
+        if not self._page_rows:
+            return
+        self.pages += 1
+        head = "".join(f"<th>{html.escape(str(c))}</th>" for c in self.columns)
+        body = "".join(
+            f"<tr class='{'mismatch' if row['Mismatch'] else ''}'>"
+            + "".join(f"<td>{html.escape(str(row.get(c, '')))}</td>" for c in self.columns)
+            + "</tr>"
+            for row in self._page_rows
+        )
+        nav = "<nav><a href='index.html'>Index</a>"
+        if self.pages > 1:
+            nav += f"<a href='{self._page_name(self.pages - 1)}'>Previous</a>"
+        nav += f"<a href='{self._page_name(self.pages + 1)}'>Next</a></nav>"
+        with open(os.path.join(self.out_dir, self._page_name(self.pages)), "w", encoding="utf-8") as f:
+            f.write(_html_page(
+                f"{self.title} - page {self.pages}",
+                f"<h1>{html.escape(self.title)}</h1><h2>Page {self.pages}</h2>{nav}"
+                f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>{nav}"
+            ))
+        self._page_rows = []
+
+    def close(self) -> None:
+        self._flush_page()
+        if self.pages:
+            # drop the dangling "Next" link of the last page
+            last_page = os.path.join(self.out_dir, self._page_name(self.pages))
+            with open(last_page, encoding="utf-8") as f:
+                content = f.read()
+            with open(last_page, "w", encoding="utf-8") as f:
+                f.write(content.replace(f"<a href='{self._page_name(self.pages + 1)}'>Next</a>", ""))
+        self._summary_csv.close()
+        self._summary_jsonl.close()
+        self._diffs_jsonl.close()
+        links = "".join(
+            f"<li><a href='{self._page_name(n)}'>Page {n}</a></li>" for n in range(1, self.pages + 1)
+        )
+        with open(os.path.join(self.out_dir, "index.html"), "w", encoding="utf-8") as f:
+            f.write(_html_page(self.title, (
+                f"<h1>{html.escape(self.title)}</h1>"
+                f"<p>Generated {datetime.now().isoformat(timespec='seconds')}</p>"
+                f"<p>{self.pairs} pair(s) compared, {self.mismatches} mismatch(es), "
+                f"{self.diff_lines} differing cell(s).</p>"
+                "<p>Raw data: <a href='summary.csv'>summary.csv</a>, <a href='summary.jsonl'>summary.jsonl</a>, "
+                "<a href='diffs.jsonl'>diffs.jsonl</a></p>"
+                f"<ul>{links}</ul>"
+            )))
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def export_report(
+        abs_before: str,
+        abs_after: str,
+        files: Iterable[str],
+        key_columns: List[str],
+        out_dir: str,
+        title: str,
+        parameter_names: Iterable[str] = (),
+        max_diff_cells: int = 1000,
+        progress: Optional[Callable[[int], None]] = None) -> dict:
+    """
+    Compares the given run files pair by pair and streams the report to out_dir.
+    parameter_names are the first columns of the summary (see ReportWriter).
+    At most max_diff_cells differing cells are written per pair.
+    Returns {"pairs", "mismatches", "diff_lines", "pages", "out_dir"}.
+    """
+    with ReportWriter(out_dir, title, parameter_names) as writer:
+        for n, fname in enumerate(files):
+            data_before = load_run(os.path.join(abs_before, fname))
+            data_after = load_run(os.path.join(abs_after, fname))
+            record = compare_run_data(fname, data_before, data_after, key_columns)
+            diffs = None
+            if is_mismatch(record):
+                # only mismatching pairs are loaded in full, chunked results included
+                result_before, result_after = materialize(data_before.get("result")), materialize(data_after.get("result"))
+                if is_fingerprint(result_before) or is_fingerprint(result_after):
+                    # no cell values in a fingerprint baseline: one line per changed column
+                    detail = fingerprint_detail(result_before, result_after, key_columns)
+                    diffs = detail[detail["Change"] != "-"].rename(columns=str.lower)
+                elif isinstance(result_before, pd.DataFrame) and isinstance(result_after, pd.DataFrame):
+                    diffs = frame_diff.diff_cells(result_before, result_after, key_columns).head(max_diff_cells)
+                else:
+                    diffs = pd.DataFrame({
+                        "column": ["<result>"], "before": [str(result_before)], "after": [str(result_after)]
+                    })
+            writer.write_pair(record, diffs)
+            del data_before, data_after
+            if progress:
+                progress(n + 1)
+    return {
+        "pairs": writer.pairs,
+        "mismatches": writer.mismatches,
+        "diff_lines": writer.diff_lines,
+        "pages": writer.pages,
+        "out_dir": out_dir,
+    }
@@ -0,0 +1,321 @@
+import os
+import queue
+import pickle
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, Future
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from services.isolation_service import IsolatedPool
+from services.worker_daemon import DaemonPool
+from services.execution_service import ensure_loadable, execute_batch, execute_batch_in_worker, write_run_bytes
+from services.baseline_service import drop_chunk_file, fingerprint_run
+from services.checkpoint_service import BatchJournal
+from services.compare_service import MismatchBudget, compare_run_data, is_mismatch
+from services.results_service import bind_run, ensure_results_folder, list_run_files, load_run, parse_run_timestamp
+from services.tracing_service import export_metrics, inc, merge_metrics, span
+
+EXECUTOR_KINDS = ("process", "thread", "serial", "isolated", "daemon")
+
+_DONE = object()
+
+
+def list_rerun_files(abs_from: str, dt_filter: Optional[datetime] = None) -> List[str]:
+    """
+    Returns the run files of abs_from, oldest first, optionally only those
+    run at or after dt_filter. Files without a valid timestamp are skipped.
+    """
+    files = []
+    for filename in list_run_files(abs_from):
+        file_dt = parse_run_timestamp(filename)
+        if file_dt is None:
+            continue
+        if dt_filter and file_dt < dt_filter:
+            continue
+        files.append(filename)
+    return sorted(files)
+
+
+class _SerialExecutor(Executor):
+    """Runs submitted work inline, for debugging and single-core hosts."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+class _ProcessPool(Executor):
+    """
+    Spawned worker processes for execute_batch tasks. Workers send the
+    metrics of each batch back with its results, and they are added to the
+    metrics of this process.
+    """
+
+    def __init__(self, workers: int):
+        # spawn: forking the threaded Streamlit server is unsafe
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        if fn is not execute_batch:
+            raise ValueError("_ProcessPool only runs execute_batch tasks")
+        task = self._pool.submit(execute_batch_in_worker, *args, **kwargs)
+        future = Future()
+
+        def done(task: Future) -> None:
+            if task.cancelled():
+                future.cancel()
+                return
+            error = task.exception()
+            if error is None:
+                results, metrics = task.result()
+                merge_metrics(metrics)
+            # false once the caller cancelled the future
+            if future.set_running_or_notify_cancel():
+                if error is None:
+                    future.set_result(results)
+                else:
+                    future.set_exception(error)
+
+        future.add_done_callback(lambda f: f.cancelled() and task.cancel())
+        task.add_done_callback(done)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def make_executor(kind: str, workers: int, isolation: Optional[dict] = None) -> Executor:
+    """
+    isolation holds the IsolatedPool limits (timeout, max_rss_mb,
+    max_calls_per_worker) for the "isolated" kind.
+    """
+    if kind == "isolated":
+        return IsolatedPool(workers, **(isolation or {}))
+    if kind == "daemon":
+        return DaemonPool(workers)
+    if kind == "process":
+        return _ProcessPool(workers)
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers)
+    if kind == "serial":
+        return _SerialExecutor()
+    raise ValueError(f"executor kind '{kind}' not in {EXECUTOR_KINDS}")
+
+
+def _prefetch_parameters(abs_from: str, files: List[str], out: queue.Queue, stop: threading.Event) -> None:
+    """Reader stage: unpickles run files ahead of the workers."""
+    try:
+        for filename in files:
+            if stop.is_set():
+                break
+            with span("read_parameters", file=filename):
+                parameters = load_run(os.path.join(abs_from, filename)).get("parameters", {})
+            out.put((filename, parameters))
+    except BaseException as e:
+        out.put(e)
+    out.put(_DONE)
+
+
+def _write_results(
+        abs_to: str,
+        inbox: queue.Queue,
+        errors: list,
+        on_written: Callable[[str, str, bytes], None],
+        prepare: Optional[Callable[[str, bytes], bytes]] = None) -> None:
+    """
+    Writer stage: writes pickled run dicts in the order they are received,
+    then hands each one to on_written (journal and inline baseline check).
+    prepare(filename, payload) may replace a payload before it is written.
+    After a failed write the remaining items are drained without writing.
+    """
+    while True:
+        item = inbox.get()
+        if item is _DONE:
+            return
+        if errors:
+            continue
+        filename, status, payload = item
+        try:
+            if prepare is not None:
+                payload = prepare(filename, payload)
+            write_run_bytes(os.path.join(abs_to, filename), payload)
+            on_written(filename, status, payload)
+        except BaseException as e:
+            errors.append(e)
+
+
+def _batches(items: queue.Queue, chunk_size: int) -> Iterator[List[Tuple[str, dict]]]:
+    batch = []
+    while True:
+        item = items.get()
+        if item is _DONE:
+            break
+        if isinstance(item, BaseException):
+            raise item
+        batch.append(item)
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rerun_files(
+        full_name: str,
+        abs_from: str,
+        abs_to: str,
+        files: List[str],
+        workers: int = 1,
+        executor_kind: str = "process",
+        chunk_size: int = 1,
+        prefetch: int = 64,
+        progress: Optional[Callable[[int, int], None]] = None,
+        baseline_dir: Optional[str] = None,
+        key_columns: Optional[List[str]] = None,
+        budget: Optional[MismatchBudget] = None,
+        journal: Optional[BatchJournal] = None,
+        isolation: Optional[dict] = None,
+        profile: bool = False,
+        fingerprints: bool = False,
+        capture_mismatches: bool = False) -> dict:
+    """
+    Reruns full_name on the parameters of the given run files of abs_from and
+    writes the results under the same file names in abs_to.
+
+    The rerun is a pipeline: a reader thread unpickles parameters up to
+    prefetch files ahead, a pool of workers runs batches of chunk_size calls,
+    and a writer thread writes the results in input order. At most
+    2 * workers batches are in flight.
+
+    With baseline_dir, each result is compared inline with the run file of
+    the same name in baseline_dir once written. With a budget too, the rerun
+    stops as soon as the budget is exceeded: pending calls are cancelled and
+    the partial outcome is returned.
+
+    With a journal, files already recorded as done are skipped and each
+    written file is recorded as done (or failed, if the call raised).
+    With profile, each result records the resource footprint of its call.
+    With fingerprints, abs_to becomes a fingerprint baseline: results are
+    checked against the baseline (if any) and then stored as fingerprints,
+    except, with capture_mismatches, those that mismatch the baseline.
+    Returns {"files_ran", "elapsed", "compared", "mismatches", "mismatch_files", "stopped_early"}.
+    """
+    executor = make_executor(executor_kind, workers, isolation)
+    try:
+        ensure_loadable(full_name, executor)  # fail fast on import errors, before starting any stage
+    except BaseException:
+        executor.shutdown()
+        raise
+    ensure_results_folder(abs_to)
+    if journal is not None:
+        completed = journal.completed()
+        files = [filename for filename in files if filename not in completed]
+    started = datetime.now()
+
+    params_queue: queue.Queue = queue.Queue(maxsize=max(prefetch, chunk_size))
+    write_queue: queue.Queue = queue.Queue(maxsize=max(prefetch, chunk_size))
+    stop = threading.Event()
+    write_errors: list = []
+    mismatch_files: List[str] = []
+    compared = 0
+    if baseline_dir and budget is None:
+        budget = MismatchBudget()
+    fail_fast = threading.Event()
+
+    def on_written(filename: str, status: str, payload: bytes) -> None:
+        if journal is not None:
+            journal.record(filename, "done" if status == "ok" else "failed", outcome=status)
+        if baseline_dir and not fingerprints:
+            check_against_baseline(filename, bind_run(pickle.loads(payload), abs_to))
+
+    def check_against_baseline(filename: str, run: dict) -> bool:
+        nonlocal compared
+        baseline_path = os.path.join(baseline_dir, filename)
+        if not os.path.exists(baseline_path):
+            return False
+        with span("baseline_compare", file=filename):
+            record = compare_run_data(filename, load_run(baseline_path), run, key_columns)
+        compared += 1
+        mismatch = is_mismatch(record)
+        if mismatch:
+            mismatch_files.append(filename)
+        budget.add(mismatch)
+        if budget.exceeded:
+            fail_fast.set()
+        return mismatch
+
+    def to_fingerprint(filename: str, payload: bytes) -> bytes:
+        # checked before writing, while the full result is still at hand
+        run = bind_run(pickle.loads(payload), abs_to)
+        mismatch = check_against_baseline(filename, run) if baseline_dir else False
+        if mismatch and capture_mismatches:
+            return payload
+        drop_chunk_file(run, abs_to)
+        return pickle.dumps(fingerprint_run(run, key_columns))
+
+    reader = threading.Thread(target=_prefetch_parameters, args=(abs_from, files, params_queue, stop), daemon=True)
+    writer = threading.Thread(
+        target=_write_results,
+        args=(abs_to, write_queue, write_errors, on_written, to_fingerprint if fingerprints else None),
+        daemon=True,
+    )
+    reader.start()
+    writer.start()
+
+    files_ran = 0
+    in_flight: deque = deque()
+
+    def drain_one():
+        nonlocal files_ran
+        names, future = in_flight.popleft()
+        for filename, (status, payload) in zip(names, future.result()):
+            inc("fchk_calls_total", function=full_name, status=status)
+            write_queue.put((filename, status, payload))
+        files_ran += len(names)
+        if write_errors:
+            raise write_errors[0]
+        if progress:
+            progress(files_ran, len(files))
+
+    with span("rerun", function=full_name, files=len(files), executor=executor_kind):
+        try:
+            for batch in _batches(params_queue, chunk_size):
+                if fail_fast.is_set():
+                    break
+                names = [filename for filename, _ in batch]
+                in_flight.append((names, executor.submit(execute_batch, full_name, [p for _, p in batch], profile, abs_to)))
+                while in_flight and (len(in_flight) >= 2 * workers or in_flight[0][1].done()):
+                    drain_one()
+            while in_flight and not fail_fast.is_set():
+                drain_one()
+        finally:
+            stop.set()
+            for _, future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+            write_queue.put(_DONE)
+            writer.join()
+            # unblock the reader if it is waiting on a full queue
+            while reader.is_alive():
+                try:
+                    params_queue.get_nowait()
+                except queue.Empty:
+                    reader.join(0.05)
+    export_metrics()
+
+    if write_errors:
+        raise write_errors[0]
+    return {
+        "files_ran": files_ran,
+        "elapsed": (datetime.now() - started).total_seconds(),
+        "compared": compared,
+        "mismatches": len(mismatch_files),
+        "mismatch_files": mismatch_files,
+        "stopped_early": fail_fast.is_set(),
+    }
@@ -0,0 +1,135 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from services.tracing_service import span
+from utils.chunked import ChunkedResult
+from utils.resources import result_size
+
+# Root folder under which every run is stored as <folder>/<function name>/run_*.pkl
+RESULTS_PATH = os.path.join("data", "results")
+
+# Touched whenever the app creates a results folder, so cached folder listings can be invalidated
+RESULTS_STAMP_PATH = os.path.join("data", "cache", "results.stamp")
+
+
+def is_run_file(filename: str) -> bool:
+    return filename.startswith("run_") and filename.endswith(".pkl")
+
+
+def list_run_files(folder: str) -> set:
+    """
+    Returns the names of the run_*.pkl files in a function results folder.
+    Returns an empty set if the folder doesn't exist.
+    """
+    if not os.path.isdir(folder):
+        return set()
+    return {f for f in os.listdir(folder) if is_run_file(f)}
+
+
+def parse_run_timestamp(filename: str) -> Optional[datetime]:
+    """
+    Parses the timestamp encoded in run_{yyyymmddhhmmss[ffffff]}.pkl.
+    Returns None if the name doesn't carry a valid timestamp.
+    """
+    ts_str = filename[4:-4]
+    for fmt in ("%Y%m%d%H%M%S%f", "%Y%m%d%H%M%S"):
+        try:
+            return datetime.strptime(ts_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Cheap identity of a run file: size and modification time.
+    Any rewrite of the file (rerun, manual copy) changes it.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def bind_run(run: dict, folder: str) -> dict:
+    """Binds a chunked result to the chunk files of folder, the folder of its run file."""
+    result = run.get("result") if isinstance(run, dict) else None
+    if isinstance(result, ChunkedResult):
+        result.bind(folder)
+    return run
+
+
+def load_run(path: str) -> dict:
+    with open(path, "rb") as f:
+        return bind_run(pickle.load(f), os.path.dirname(path))
+
+
+def find_result_folders(base_results_path: str, fn_name: str) -> list:
+    """
+    Returns the folders (relative to base_results_path) holding results of fn_name.
+    Only directories are walked: function folders (named fn_name) and hidden
+    folders are not descended into, so run files are never listed.
+    """
+    folder_candidates = []
+    with span("find_result_folders", function=fn_name):
+        for root, dirs, _ in os.walk(base_results_path):
+            if fn_name in dirs and root != base_results_path:
+                folder_candidates.append(os.path.relpath(root, base_results_path))
+            dirs[:] = [d for d in dirs if d != fn_name and not d.startswith(".")]
+    return sorted(folder_candidates)
+
+
+def mark_results_changed() -> None:
+    os.makedirs(os.path.dirname(RESULTS_STAMP_PATH), exist_ok=True)
+    with open(RESULTS_STAMP_PATH, "a"):
+        os.utime(RESULTS_STAMP_PATH)
+
+
+def ensure_results_folder(folder: str) -> None:
+    """Creates a results folder if needed, marking the results tree as changed."""
+    if not os.path.isdir(folder):
+        os.makedirs(folder, exist_ok=True)
+        mark_results_changed()
+
+
+def results_changed_at() -> int:
+    """Time (ns) the app last created a results folder, 0 if never."""
+    try:
+        return os.stat(RESULTS_STAMP_PATH).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class RunCache:
+    """
+    Thread-safe LRU of loaded run files, keyed by path and file fingerprint
+    (a rewritten file is loaded again) and capped by the total size of the
+    cached results (see utils.resources.result_size).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path: str) -> dict:
+        key = (path, file_fingerprint(path))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        run = load_run(path)
+        size = result_size(run.get("result")) or 0
+        if size > self.max_bytes:
+            return run
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (run, size)
+                self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+        return run
@@ -0,0 +1,68 @@
+import os
+import random
+from datetime import datetime
+from typing import Callable, List, Optional, Union
+
+from services.checkpoint_service import BatchJournal
+from services.execution_service import ensure_loadable, execute, save_run
+from services.isolation_service import IsolatedPool
+from services.tracing_service import export_metrics, inc, span
+from services.worker_daemon import DaemonPool
+
+
+def run_file_name(run: dict) -> str:
+    return f"run_{datetime.fromisoformat(run['timestamp']).strftime('%Y%m%d%H%M%S%f')}.pkl"
+
+
+def run_batch(
+        full_name: str,
+        make_params: Callable[[random.Random], dict],
+        abs_folder: str,
+        journal: BatchJournal,
+        progress: Optional[Callable[[int, int], None]] = None,
+        pool: Optional[Union[IsolatedPool, DaemonPool]] = None,
+        profile: bool = False,
+        seeds: Optional[List[int]] = None) -> List[str]:
+    """
+    Runs the items of a batch that are not done yet according to its journal
+    (header "planned" items), each with freshly generated parameters.
+    The run file of a previously failed item is replaced by the new attempt.
+    With a pool (isolated workers or the warm worker daemon), calls run there
+    instead of in this process, which then never imports the target (see
+    execution_service.ensure_loadable). With profile, each run file also records
+    the resource footprint of its call. make_params draws the parameters of
+    each item from the random.Random it is given: with seeds, a generator
+    seeded with seeds[item], so an item run again (e.g. by another worker of
+    a sharded sweep) gets the same ones whatever else uses the global random
+    state meanwhile.
+    Returns the paths of the files saved by this call.
+    """
+    ensure_loadable(full_name, pool)
+    planned = journal.header["planned"]
+    outcomes = journal.outcomes()
+    todo = [i for i in range(planned) if outcomes.get(i, {}).get("status") != "done"]
+
+    saved = []
+    unseeded = random.Random()
+    with span("run_batch", function=full_name, batch=journal.batch_id, items=len(todo)):
+        for n, item in enumerate(todo, start=1):
+            previous = outcomes.get(item, {}).get("file")
+            if previous and os.path.exists(os.path.join(abs_folder, previous)):
+                os.remove(os.path.join(abs_folder, previous))
+
+            with span("generate_parameters", function=full_name):
+                params = make_params(random.Random(seeds[item]) if seeds is not None else unseeded)
+            if pool:
+                run = pool.run_call(full_name, params, profile, abs_folder)
+            else:
+                run = execute(full_name, params, profile, abs_folder)
+            inc("fchk_calls_total", function=full_name, status=run["status"])
+            file_name = run_file_name(run)
+            file_path = os.path.join(abs_folder, file_name)
+            save_run(file_path, run)
+            journal.record(item, "done" if run["status"] == "ok" else "failed", outcome=run["status"], file=file_name)
+            saved.append(file_path)
+            if progress:
+                progress(n, len(todo))
+    export_metrics()
+    return saved
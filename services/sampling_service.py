@@ -0,0 +1,180 @@
+import math
+import random
+from datetime import date
+from statistics import NormalDist
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from models.parameter_definition import ParameterDefinition
+from services.generation_service import _to_date
+from utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Numeric and date ranges are split in this many equal-width bins when stratifying
+STRATA_BINS = 4
+
+
+def _bin(value, low, high, bins: int = STRATA_BINS):
+    if high == low:
+        return 0
+    return min(int((value - low) / (high - low) * bins), bins - 1)
+
+
+def stratum_key(parameters: dict, param_defs: List[ParameterDefinition]) -> tuple:
+    """
+    Maps a parameter set to its stratum: numeric and date values are binned
+    over the defined range, lists by their length, anything else by value.
+    """
+    key = []
+    for p in param_defs:
+        value = parameters.get(p.name)
+        if p.is_list:
+            key.append(len(value) if isinstance(value, list) else None)
+            continue
+        if p.range is not None and not p.specific_values and value is not None:
+            try:
+                if p.type in ("int", "float"):
+                    key.append(_bin(float(value), float(p.range[0]), float(p.range[1])))
+                    continue
+                if p.type == "date" and isinstance(value, date):
+                    low, high = _to_date(p.range[0]), _to_date(p.range[1])
+                    key.append(_bin(value.toordinal(), low.toordinal(), high.toordinal()))
+                    continue
+            except (ValueError, TypeError):
+                pass
+        key.append(value if isinstance(value, Hashable) else repr(value))
+    return tuple(key)
+
+
+def sample_pairs(
+        files: List[str],
+        sample_size: int,
+        strata: Optional[Dict[str, tuple]] = None,
+        seed: Optional[int] = None) -> List[str]:
+    """
+    Draws sample_size run files without replacement.
+    With strata ({file name: stratum key}) the sample is allocated
+    proportionally to each stratum's size, with at least one file per stratum:
+    small strata are oversampled, so estimate the rate from such a sample
+    with the stratum_counts of its outcomes.
+    """
+    rng = random.Random(seed)
+    if sample_size >= len(files):
+        return sorted(files)
+    if not strata:
+        return sorted(rng.sample(files, sample_size))
+
+    groups: Dict[tuple, List[str]] = {}
+    for fname in files:
+        groups.setdefault(strata.get(fname, ()), []).append(fname)
+    chosen = []
+    for members in groups.values():
+        share = max(1, round(sample_size * len(members) / len(files)))
+        chosen.extend(rng.sample(members, min(share, len(members))))
+    return sorted(chosen)
+
+
+def sample_frame_rows(
+        df_before: "pd.DataFrame",
+        df_after: "pd.DataFrame",
+        key_columns: List[str],
+        max_rows: int) -> tuple:
+    """
+    Keeps about max_rows rows of both frames. Rows are selected by hashing
+    their key (the key columns, or the index if there are none), so the same
+    keys are kept on both sides and the sample is reproducible.
+    """
+    n_rows = max(len(df_before), len(df_after))
+    if n_rows <= max_rows:
+        return df_before, df_after
+    fraction = max_rows / n_rows
+
+    def keep(df: "pd.DataFrame") -> "pd.DataFrame":
+        if key_columns and all(k in df.columns for k in key_columns):
+            hashes = pd.util.hash_pandas_object(df[key_columns], index=False)
+        else:
+            hashes = pd.util.hash_pandas_object(df.index.to_frame(index=False), index=False)
+            hashes.index = df.index
+        return df[(hashes.to_numpy() % 10_000) < fraction * 10_000]
+
+    return keep(df_before), keep(df_after)
+
+
+def stratum_counts(strata: Dict[str, tuple], outcomes: Dict[str, bool]) -> Dict[tuple, Tuple[int, int, int]]:
+    """
+    {stratum key: (mismatches, sampled, population)} of a stratified sample,
+    from the strata of the whole population ({file name: stratum key}, as
+    given to sample_pairs) and the outcomes of the sampled files ({file
+    name: mismatch}).
+    """
+    counts: Dict[tuple, list] = {}
+    for key in strata.values():
+        counts.setdefault(key, [0, 0, 0])[2] += 1
+    for fname, mismatch in outcomes.items():
+        stratum = counts.setdefault(strata.get(fname, ()), [0, 0, 0])
+        stratum[0] += bool(mismatch)
+        stratum[1] += 1
+    return {key: tuple(c) for key, c in counts.items()}
+
+
+def _wilson(p: float, n: float, z: float) -> Tuple[float, float]:
+    denom = 1 + z ** 2 / n
+    center = (p + z ** 2 / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def _stratified_rate(strata: Dict[tuple, Tuple[int, int, int]]) -> Tuple[float, float]:
+    """
+    Rate and variance of a stratified sample: the stratum rates weighted by
+    their share of the population, over the strata with sampled files.
+    """
+    sampled_strata = [(m, n, size) for m, n, size in strata.values() if n]
+    total = sum(size for _, _, size in sampled_strata)
+    rate = variance = 0.0
+    for m, n, size in sampled_strata:
+        weight, p = size / total, m / n
+        rate += weight * p
+        if n > 1:
+            # unbiased stratum variance, with the finite population correction of the stratum
+            variance += weight ** 2 * (1 - n / size) * p * (1 - p) / (n - 1)
+    return rate, variance
+
+
+def estimate_mismatch_rate(
+        mismatches: int,
+        sampled: int,
+        population: int,
+        confidence: float = 0.95,
+        strata: Optional[Dict[tuple, Tuple[int, int, int]]] = None) -> dict:
+    """
+    Estimates the population mismatch rate from a sample using the Wilson
+    score interval, narrowed by the finite population correction.
+    With the stratum_counts of a stratified sample, the rate is the mean of
+    the stratum rates weighted by their population share, and the interval
+    the Wilson interval at the effective sample size of the stratified
+    variance (p(1 - p) / variance).
+    """
+    if sampled == 0:
+        return {"sampled": 0, "mismatches": 0, "population": population,
+                "rate": None, "low": 0.0, "high": 1.0, "confidence": confidence}
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = mismatches / sampled
+    fpc = math.sqrt((population - sampled) / (population - 1)) if population > 1 else 0.0
+    low, high = _wilson(p, sampled, z * fpc)
+    if strata:
+        p, variance = _stratified_rate(strata)
+        if 0 < p < 1 and variance > 0:
+            low, high = _wilson(p, p * (1 - p) / variance, z)
+        else:
+            # every sampled stratum is all mismatches or all matches (or fully sampled)
+            low, high = _wilson(p, sampled, z * fpc)
+    return {
+        "sampled": sampled,
+        "mismatches": mismatches,
+        "population": population,
+        "rate": p,
+        "low": low,
+        "high": high,
+        "confidence": confidence,
+    }
@@ -0,0 +1,199 @@
+"""
+Mismatch-focused parameter search for the live A/B mode: an adaptive
+sampler that draws new parameter sets near the ones that diverged, and a
+delta-minimizer that shrinks a diverging parameter set to a minimal one.
+"""
+import random
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from models.parameter_definition import ParameterDefinition
+from services.generation_service import _to_date, generate_parameters, generate_value
+
+# Share of the range a value is moved by when sampling near a mismatch
+NEIGHBOURHOOD = 0.1
+
+
+def _bounds(param: ParameterDefinition):
+    """Numeric (or date) bounds of a ranged parameter, None otherwise."""
+    if param.specific_values or param.range is None:
+        return None
+    try:
+        if param.type in ("int", "float"):
+            return float(param.range[0]), float(param.range[1])
+        if param.type == "date":
+            return _to_date(param.range[0]), _to_date(param.range[1])
+    except (ValueError, TypeError):
+        return None
+    return None
+
+
+def _nudge(value, param: ParameterDefinition, rng: random.Random):
+    """A value of param close to value."""
+    bounds = _bounds(param)
+    if param.specific_values:
+        # mostly keep the value, sometimes try another one
+        return value if rng.random() < 0.7 else rng.choice(param.specific_values)
+    if bounds is None:
+        return value
+    low, high = bounds
+    if param.type == "date":
+        if not isinstance(value, date):
+            return value
+        width = (high - low).days
+        days = round(rng.gauss(0, max(width * NEIGHBOURHOOD, 1)))
+        return min(max(value + timedelta(days=days), low), high)
+    if not isinstance(value, (int, float)):
+        return value
+    moved = min(max(value + rng.gauss(0, (high - low) * NEIGHBOURHOOD), low), high)
+    return round(moved) if param.type == "int" else moved
+
+
+class AdaptiveSampler:
+    """
+    Draws parameter sets, concentrating on the neighbourhood of the ones
+    that mismatched so far. Until a first mismatch, and for a share explore
+    of the draws afterwards, parameters are generated uniformly as usual.
+    Neighbours keep most values of a mismatching set and move the others a
+    little (about NEIGHBOURHOOD of their range); list lengths change by one.
+    """
+
+    def __init__(self, param_defs: List[ParameterDefinition], explore: float = 0.3, seed: Optional[int] = None):
+        self.param_defs = param_defs
+        self.explore = explore
+        self.rng = random.Random(seed)
+        self.mismatching: List[dict] = []
+        self.drawn = {"uniform": 0, "focused": 0}
+        self.found = {"uniform": 0, "focused": 0}
+
+    def next(self) -> Tuple[dict, str]:
+        """A parameter set and how it was drawn ("uniform" or "focused")."""
+        if not self.mismatching or self.rng.random() < self.explore:
+            self.drawn["uniform"] += 1
+            return generate_parameters(self.param_defs), "uniform"
+        self.drawn["focused"] += 1
+        return self.neighbour(self.rng.choice(self.mismatching)), "focused"
+
+    def neighbour(self, params: dict) -> dict:
+        moved = dict(params)
+        # move at least one parameter, about half of them on average
+        chosen = [p for p in self.param_defs if self.rng.random() < 0.5] or [self.rng.choice(self.param_defs)]
+        for p in chosen:
+            value = params.get(p.name)
+            if p.is_list and isinstance(value, list):
+                value = [_nudge(v, p, self.rng) for v in value]
+                length = len(value) + self.rng.choice((-1, 1))
+                low, high = (p.list_length, p.list_length) if isinstance(p.list_length, int) else p.list_length
+                if low <= length <= high:
+                    value = value[:length] if length < len(value) else value + [generate_value(
+                        ParameterDefinition(p.name, p.type, p.range, p.specific_values)
+                    )]
+                moved[p.name] = value
+            else:
+                moved[p.name] = _nudge(value, p, self.rng)
+        return moved
+
+    def record(self, params: dict, mismatch: bool, drawn: str) -> None:
+        if mismatch:
+            self.mismatching.append(params)
+            self.found[drawn] += 1
+
+    def stats(self) -> dict:
+        """Draws and mismatches found per kind of draw."""
+        return {kind: {"drawn": self.drawn[kind], "mismatches": self.found[kind]} for kind in self.drawn}
+
+
+def _candidates(value, param: ParameterDefinition) -> List:
+    """Simpler values to try for one scalar value, simplest first."""
+    if param.specific_values:
+        # earlier specific values count as simpler
+        if value in param.specific_values:
+            return param.specific_values[:param.specific_values.index(value)]
+        return list(param.specific_values)
+    if param.type == "boolean":
+        return [False] if value is True else []
+    bounds = _bounds(param)
+    if bounds is None:
+        return []
+    low = bounds[0]
+    if param.type == "date":
+        if not isinstance(value, date) or value <= low:
+            return []
+        # toward the lower bound: the bound itself, then ever closer halfway points
+        days = (value - low).days
+        return [low + timedelta(days=days - step) for step in _halvings(days)]
+    if not isinstance(value, (int, float)) or value <= low:
+        return []
+    target = 0 if low <= 0 <= value else low
+    distance = value - target
+    steps = _halvings(int(distance)) if param.type == "int" else [distance * 0.5 ** k for k in range(8)]
+    cast = int if param.type == "int" else float
+    return [cast(value - step) for step in steps]
+
+
+def _halvings(distance: int) -> List[int]:
+    """distance, then ever smaller steps: all of it, half, a quarter... down to 1."""
+    steps = []
+    while distance >= 1:
+        steps.append(distance)
+        distance //= 2
+    return steps
+
+
+def shrink(
+        params: dict,
+        param_defs: List[ParameterDefinition],
+        is_failing: Callable[[dict], bool],
+        max_calls: int = 100) -> Tuple[dict, int]:
+    """
+    Delta-minimizes a failing parameter set: repeatedly tries simpler
+    variants (shorter lists, values moved toward 0 or the lower bound of
+    their range, earlier specific values, False) and keeps each variant that
+    still fails, until no variant helps or max_calls calls of is_failing
+    were made. Returns the minimal parameter set found and the calls made.
+    """
+    calls = 0
+    current = dict(params)
+
+    def attempt(candidate: dict) -> bool:
+        nonlocal calls, current
+        if calls >= max_calls:
+            return False
+        calls += 1
+        if is_failing(candidate):
+            current = candidate
+            return True
+        return False
+
+    improved = True
+    while improved and calls < max_calls:
+        improved = False
+        for p in param_defs:
+            value = current.get(p.name)
+            if p.is_list and isinstance(value, list):
+                min_length = p.list_length if isinstance(p.list_length, int) else p.list_length[0]
+                # drop halves, then single elements, while above the minimum length
+                size = len(value) // 2
+                while size >= 1 and calls < max_calls:
+                    start = 0
+                    while start < len(value) and len(value) - size >= min_length and calls < max_calls:
+                        candidate = value[:start] + value[start + size:]
+                        if attempt({**current, p.name: candidate}):
+                            value = candidate
+                            improved = True
+                        else:
+                            start += size
+                    size //= 2
+                for i in range(len(value)):
+                    for simpler in _candidates(value[i], p):
+                        candidate = value[:i] + [simpler] + value[i + 1:]
+                        if attempt({**current, p.name: candidate}):
+                            value = candidate
+                            improved = True
+                            break
+            else:
+                for simpler in _candidates(value, p):
+                    if attempt({**current, p.name: simpler}):
+                        improved = True
+                        break
+    return current, calls
@@ -23,44 +23,50 @@ def load_function_calls() -> List[FunctionCall]:
         except json.JSONDecodeError:
             return []
 
-    calls: List[FunctionCall] = []
-    for item in raw:
-        params = []
-        for p in item.get("parameters", []):
-            # Normalize range (stored as list) to tuple
-            range_val = tuple(p["range"]) if p.get("range") is not None else None
-            # Normalize list_length
-            ll = p.get("list_length")
-            if isinstance(ll, list):
-                list_length_val = tuple(ll)
-            else:
-                list_length_val = ll
-
-            params.append(ParameterDefinition(
-                name=p["name"],
-                type=p["type"],
-                range=range_val,
-                specific_values=p.get("specific_values"),
-                is_list=p.get("is_list", False),
-                list_length=list_length_val
-            ))
-
-        calls.append(FunctionCall(
-            full_name=item["full_name"],
-            name=item["name"],
-            key_columns=item.get("key_columns", []),
-            parameters=params
+    return [function_call_from_dict(item) for item in raw]
+
+
+def function_call_from_dict(item: dict) -> FunctionCall:
+    """
+    Builds a FunctionCall from its JSON form.
+    Raises KeyError if full_name, name or a parameter name or type is missing.
+    """
+    params = []
+    for p in item.get("parameters", []):
+        # Normalize range (stored as list) to tuple
+        range_val = tuple(p["range"]) if p.get("range") is not None else None
+        # Normalize list_length
+        ll = p.get("list_length")
+        if isinstance(ll, list):
+            list_length_val = tuple(ll)
+        else:
+            list_length_val = ll
+
+        params.append(ParameterDefinition(
+            name=p["name"],
+            type=p["type"],
+            range=range_val,
+            specific_values=p.get("specific_values"),
+            is_list=p.get("is_list", False),
+            list_length=list_length_val
         ))
 
-    return calls
+    return FunctionCall(
+        full_name=item["full_name"],
+        name=item["name"],
+        key_columns=item.get("key_columns", []),
+        parameters=params
+    )
 
 
 def save_function_calls(calls: List[FunctionCall]) -> None:
     """
     Overwrites the JSON file with the current list of FunctionCall objects.
+    The file is replaced atomically: readers see either the old or the new list.
     """
     os.makedirs(os.path.dirname(FUNCTION_CALLS_PATH), exist_ok=True)
-    with open(FUNCTION_CALLS_PATH, "w") as f:
+    tmp_path = FUNCTION_CALLS_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
         # asdict will convert dataclasses to dicts; default=str makes dates into "YYYY-MM-DD"
         json.dump(
             [asdict(call) for call in calls],
@@ -68,6 +74,9 @@ def save_function_calls(calls: List[FunctionCall]) -> None:
             indent=4,
             default=str
         )
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, FUNCTION_CALLS_PATH)
 
 
 def add_function_call(call: FunctionCall) -> None:
@@ -0,0 +1,94 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+CHECK_COLUMNS = ["DataFrame Check", "Columns Check", "Values Check"]
+# Columns every record may carry besides the run parameters
+RECORD_COLUMNS = [
+    "File", *CHECK_COLUMNS, "Time Before", "Time After", "Time Delta",
+    "Peak MB Before", "Peak MB After", "Peak Change", "CPU Time Change", "Changed Columns", "Changed Rows",
+    "Compare Peak MB",
+]
+DERIVED_COLUMNS = ["Status", "Mismatches"]
+
+
+def records_table(records: List[dict]) -> "pd.DataFrame":
+    """
+    Columnar view of comparison records, indexed by file name, with a
+    Status ("match"/"mismatch") column and Mismatches, the number of failed
+    checks. List parameter values are turned into strings so every column
+    can be filtered and sorted.
+    """
+    table = pd.DataFrame.from_records(records)
+    table.index = pd.Index(table["File"].to_numpy())
+    dataframe_checks = table["DataFrame Check"].str.split(" ", expand=True)
+    mismatches = (dataframe_checks[0] != dataframe_checks[1]).astype(int)
+    for column in ("Columns Check", "Values Check"):
+        mismatches += (table[column] == "❌").astype(int)
+    table["Mismatches"] = mismatches
+    table["Status"] = np.where(mismatches > 0, "mismatch", "match")
+    for column in parameter_columns(table):
+        if table[column].map(lambda v: isinstance(v, (list, tuple, dict, set))).any():
+            table[column] = table[column].map(str)
+    return table
+
+
+def parameter_columns(table: "pd.DataFrame") -> List[str]:
+    return [c for c in table.columns if c not in RECORD_COLUMNS and c not in DERIVED_COLUMNS]
+
+
+@dataclass
+class RecordsQuery:
+    """Filters, sort order and page of the comparison table."""
+    status: List[str] = field(default_factory=list)
+    search: str = ""
+    parameter_values: Dict[str, list] = field(default_factory=dict)
+    parameter_ranges: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+    min_mismatches: int = 0
+    min_time_delta: Optional[float] = None
+    sort_by: Optional[str] = None
+    ascending: bool = True
+    page: int = 1
+    page_size: int = 50
+
+
+def _sorted(table: "pd.DataFrame", column: str, ascending: bool) -> "pd.DataFrame":
+    try:
+        return table.sort_values(column, ascending=ascending, kind="stable", na_position="last")
+    except TypeError:
+        # mixed types in a parameter column
+        return table.sort_values(
+            column, ascending=ascending, kind="stable", na_position="last", key=lambda s: s.astype(str)
+        )
+
+
+def query_records(table: "pd.DataFrame", query: RecordsQuery) -> Tuple["pd.DataFrame", int]:
+    """
+    Applies the filters of query to the records table, sorts what is left
+    and returns the requested page with the number of matching rows.
+    """
+    mask = np.ones(len(table), dtype=bool)
+    if query.status:
+        mask &= table["Status"].isin(query.status).to_numpy()
+    if query.search:
+        mask &= table["File"].str.contains(query.search, case=False, regex=False).to_numpy()
+    for column, values in query.parameter_values.items():
+        if values:
+            mask &= table[column].isin(values).to_numpy()
+    for column, (low, high) in query.parameter_ranges.items():
+        values = pd.to_numeric(table[column], errors="coerce")
+        mask &= values.between(low, high).to_numpy()
+    if query.min_mismatches:
+        mask &= (table["Mismatches"] >= query.min_mismatches).to_numpy()
+    if query.min_time_delta is not None and "Time Delta" in table.columns:
+        mask &= (table["Time Delta"].abs() >= query.min_time_delta).to_numpy()
+
+    filtered = table[mask]
+    if query.sort_by:
+        filtered = _sorted(filtered, query.sort_by, query.ascending)
+    start = (max(query.page, 1) - 1) * query.page_size
+    return filtered.iloc[start:start + query.page_size], len(filtered)
@@ -0,0 +1,255 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import atexit
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from utils.lazy import IMPORT_SECONDS
+
+# Spans are appended to this JSONL file when set; worker processes inherit it from the environment
+TRACE_FILE_ENV = "FCHK_TRACE_FILE"
+# Trace id shared by the app process and its workers
+TRACE_ID_ENV = "FCHK_TRACE_ID"
+# Prometheus text file, for the node-exporter textfile collector; each process
+# writes its own, with its instance name before the extension (see metrics_path)
+METRICS_FILE_ENV = "FCHK_METRICS_FILE"
+METRICS_PATH = os.path.join("data", "metrics", "function_check.prom")
+# Instance name of this process in the metrics, the name of the program by default
+METRICS_INSTANCE_ENV = "FCHK_METRICS_INSTANCE"
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+METRIC_HELP = {
+    "fchk_stage_seconds": ("histogram", "Duration of the traced stages of the run, rerun and compare pipelines."),
+    "fchk_calls_total": ("counter", "Function calls completed, by function and status."),
+    "fchk_run_bytes_written_total": ("counter", "Bytes of run files written."),
+    "fchk_run_files_written_total": ("counter", "Run files written."),
+    "fchk_compare_pairs_total": ("counter", "Run file pairs compared, by outcome."),
+    "fchk_queue_items_total": ("counter", "Work items of sharded sweeps handled by this worker, by outcome."),
+    "fchk_queue_item_retries_total": ("counter", "Work items retried after a storage error."),
+    "fchk_queue_renew_errors_total": ("counter", "Lease renewals that failed with a storage error."),
+    "fchk_import_seconds": ("gauge", "Seconds spent importing heavy modules on first use, by module."),
+}
+
+_local = threading.local()
+_lock = threading.Lock()
+_trace_handle = None
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_histograms: Dict[Tuple[str, Tuple], list] = {}
+# metrics files written by this process, removed when it exits
+_exported: Set[str] = set()
+
+
+def enable_tracing(path: str) -> None:
+    """
+    Starts appending spans to path. Set through the environment, so worker
+    processes started afterwards write to the same file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    os.environ[TRACE_FILE_ENV] = os.path.abspath(path)
+    os.environ.setdefault(TRACE_ID_ENV, uuid.uuid4().hex)
+
+
+def _write_span(entry: dict) -> None:
+    global _trace_handle
+    path = os.environ.get(TRACE_FILE_ENV)
+    line = json.dumps(entry, default=str) + "\n"
+    with _lock:
+        if _trace_handle is None or _trace_handle.name != path:
+            if _trace_handle is not None:
+                _trace_handle.close()
+            _trace_handle = open(path, "a")
+        # one write per line: appends of concurrent processes do not interleave
+        _trace_handle.write(line)
+        _trace_handle.flush()
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[dict]:
+    """
+    Times a stage. Its duration always feeds the fchk_stage_seconds
+    histogram; with tracing enabled it is also appended to the trace file
+    with its parent span, thread and process. The yielded dict can be
+    filled with attributes known only at the end of the stage.
+    """
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = stack[-1] if stack else None
+    stack.append(span_id)
+    started = time.time()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        stack.pop()
+        observe("fchk_stage_seconds", duration, stage=name)
+        if os.environ.get(TRACE_FILE_ENV):
+            _write_span({
+                "trace_id": os.environ.setdefault(TRACE_ID_ENV, uuid.uuid4().hex),
+                "span_id": span_id,
+                "parent_id": parent_id,
+                "name": name,
+                "start": started,
+                "duration": duration,
+                "pid": os.getpid(),
+                "thread": threading.current_thread().name,
+                "error": error,
+                "attrs": attrs,
+            })
+
+
+def _key(name: str, labels: dict) -> Tuple[str, Tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    """Adds value to a counter of this process."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Records one observation of a histogram of this process."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # bucket counts (last one is +Inf), sum, count
+            histogram = _histograms[key] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0]
+        histogram[0][bisect.bisect_left(DEFAULT_BUCKETS, value)] += 1
+        histogram[1] += value
+        histogram[2] += 1
+
+
+def take_metrics() -> dict:
+    """
+    The counters and histograms recorded by this process since the last
+    call, which are reset: worker processes send them back to the process
+    that exports the metrics, which adds them with merge_metrics.
+    """
+    with _lock:
+        metrics = {"counters": dict(_counters), "histograms": dict(_histograms)}
+        _counters.clear()
+        _histograms.clear()
+    return metrics
+
+
+def merge_metrics(metrics: Optional[dict]) -> None:
+    """Adds the take_metrics of a worker process to the metrics of this process."""
+    if not metrics:
+        return
+    with _lock:
+        for key, value in metrics["counters"].items():
+            _counters[key] = _counters.get(key, 0.0) + value
+        for key, (buckets, total, count) in metrics["histograms"].items():
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0]
+            histogram[0] = [a + b for a, b in zip(histogram[0], buckets)]
+            histogram[1] += total
+            histogram[2] += count
+
+
+def _labels(labels: Tuple, **extra) -> str:
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def render_prometheus(**process_labels) -> str:
+    """
+    The counters, histograms and import times of this process in Prometheus
+    text format, every series with process_labels added.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: (list(h[0]), h[1], h[2]) for key, h in _histograms.items()}
+    # import times are gauges, rendered like counters
+    counters.update({_key("fchk_import_seconds", {"module": name}): s for name, s in dict(IMPORT_SECONDS).items()})
+    lines = []
+    names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+    for name in names:
+        kind, help_text = METRIC_HELP.get(name, ("untyped", ""))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_labels(labels, **process_labels)} {value}")
+        for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(DEFAULT_BUCKETS + ("+Inf",), buckets):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_labels(labels, **process_labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels, **process_labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels, **process_labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_instance() -> str:
+    """
+    The name of this process in the metrics: $FCHK_METRICS_INSTANCE, or the
+    name of the program (streamlit for the app, queue_service for a queue
+    worker, run_service or rerun_service for CLI runs).
+    """
+    name = os.environ.get(METRICS_INSTANCE_ENV) or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    if not name or name.startswith("-"):
+        name = "python"
+    return re.sub(r"[^\w.-]", "_", name)
+
+
+def metrics_path() -> str:
+    """
+    The metrics file of this process: $FCHK_METRICS_FILE or METRICS_PATH with
+    the instance name before the extension (data/metrics/function_check.streamlit.prom),
+    so the app, its queue workers and CLI runs never overwrite each other's counters.
+    """
+    base, extension = os.path.splitext(os.environ.get(METRICS_FILE_ENV) or METRICS_PATH)
+    return f"{base}.{metrics_instance()}{extension}"
+
+
+def _remove_exported() -> None:
+    for path in _exported:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def export_metrics(path: Optional[str] = None) -> str:
+    """
+    Writes the metrics of this process to path (by default metrics_path()),
+    atomically so the textfile collector never reads a partial file. Every
+    series carries a process label (metrics_instance), so the files of
+    several processes can be collected together. The file is removed when
+    this process exits. Returns the path written.
+    """
+    path = path or metrics_path()
+    folder, filename = os.path.split(path)
+    os.makedirs(folder or ".", exist_ok=True)
+    tmp_path = os.path.join(folder, f".{filename}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus(process=metrics_instance()))
+    os.replace(tmp_path, path)
+    with _lock:
+        if not _exported:
+            atexit.register(_remove_exported)
+        _exported.add(path)
+    return path
@@ -1,6 +1,6 @@
 import re
 from datetime import date, datetime
-from typing import Any, Tuple
+from typing import Any, Iterable, List, Optional, Set
 
 from models.parameter_definition import ParameterDefinition
 from models.function_call import FunctionCall
@@ -13,6 +13,12 @@ def _to_date(val: Any) -> date:
         return val if isinstance(val, date) else val.date()
     if isinstance(val, str) and val.lower() == "today":
         return date.today()
+    if isinstance(val, str):
+        # dates are saved to function_calls.json as YYYY-MM-DD strings
+        try:
+            return date.fromisoformat(val)
+        except ValueError:
+            pass
     raise ValueError(f"Invalid date value: {val!r}")
 
 def validate_parameter_definition(param: ParameterDefinition) -> None:
@@ -94,24 +100,40 @@ def validate_parameter_definition(param: ParameterDefinition) -> None:
         raise ValueError(f"Parameter '{param.name}': " + "; ".join(errors))
 
 
-def validate_function_call(call: FunctionCall, original_name: str = None) -> None:
+def validate_function_call(
+        call: FunctionCall,
+        original_name: str = None,
+        existing_names: Optional[Set[str]] = None) -> None:
+    """
+    Raises ValueError listing every problem of call. Its name must not be in
+    existing_names (the saved calls, loaded if not given) unless it is
+    original_name, the name of the call being edited.
+    """
+    if existing_names is None:
+        existing_names = {fc.name for fc in load_function_calls()}
+    errors = function_call_errors(call)
+    if isinstance(call.name, str) and call.name in existing_names and call.name != original_name:
+        errors.insert(0, f"a function call named '{call.name}' already exists")
+    if errors:
+        raise ValueError("Invalid FunctionCall: " + "; ".join(errors))
+
+
+def function_call_errors(call: FunctionCall) -> List[str]:
+    """Problems of call on its own, uniqueness of its name aside."""
     errors = []
 
     # full_name syntax
-    if not re.match(r'^[A-Za-z_]\w*(\.[A-Za-z_]\w*)*$', call.full_name):
+    if not isinstance(call.full_name, str):
+        errors.append(f"full_name must be a string, not {type(call.full_name).__name__}")
+    elif not re.match(r'^[A-Za-z_]\w*(\.[A-Za-z_]\w*)*$', call.full_name):
         errors.append(f"full_name '{call.full_name}' is not a valid module path")
 
     # name syntax
-    if not re.match(r'^[A-Za-z_]\w*$', call.name):
+    if not isinstance(call.name, str):
+        errors.append(f"name must be a string, not {type(call.name).__name__}")
+    elif not re.match(r'^[A-Za-z_]\w*$', call.name):
         errors.append(f"name '{call.name}' is not a valid identifier")
 
-    # uniqueness
-    existing = load_function_calls()
-    for fc in existing:
-        # skip comparing to itself when editing
-        if fc.name == call.name and fc.name != original_name:
-            errors.append(f"a function call named '{call.name}' already exists")
-
     # validate key_columns
     if not isinstance(call.key_columns, list) or any(not isinstance(k, str) for k in call.key_columns):
         errors.append("key_columns must be a list of strings")
@@ -128,5 +150,35 @@ def validate_function_call(call: FunctionCall, original_name: str = None) -> Non
         except ValueError as e:
             errors.append(str(e))
 
-    if errors:
-        raise ValueError("Invalid FunctionCall: " + "; ".join(errors))
\ No newline at end of file
+    return errors
+
+
+def validate_function_calls(
+        calls: List[FunctionCall],
+        existing_names: Iterable[str] = (),
+        sources: Optional[List[str]] = None) -> List[str]:
+    """
+    Validates a batch of calls in one pass and returns all the problems found,
+    each prefixed with the source of the call (sources[i], e.g. its file).
+    Names must be unique within the batch and not in existing_names.
+    """
+    existing_names = set(existing_names)
+    sources = sources or [f"definition {i + 1}" for i in range(len(calls))]
+    seen: dict = {}
+    errors = []
+    for call, source in zip(calls, sources):
+        try:
+            problems = function_call_errors(call)
+        except (TypeError, ValueError) as e:
+            # e.g. parameter names that are not strings
+            problems = [f"malformed definition ({e})"]
+        # a name that is not a string is reported by function_call_errors, and may not even be hashable
+        if isinstance(call.name, str):
+            if call.name in existing_names:
+                problems.insert(0, f"a function call named '{call.name}' already exists")
+            if call.name in seen:
+                problems.insert(0, f"name '{call.name}' is also used by {seen[call.name]}")
+            else:
+                seen[call.name] = source
+        errors.extend(f"{source} ({call.name}): {problem}" for problem in problems)
+    return errors
\ No newline at end of file
@@ -0,0 +1,240 @@
+import os
+import sys
+import json
+import pickle
+import signal
+import socket
+import argparse
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from importlib import import_module
+from typing import List, Optional, Tuple
+
+from services.ab_worker import read_frame, write_frame
+from services.execution_service import execute, execute_batch, import_error, load_callable
+from services.storage_service import FUNCTION_CALLS_PATH
+from services.tracing_service import merge_metrics, take_metrics
+
+# Local socket of the warm worker daemon
+DAEMON_SOCKET_PATH = os.path.join("data", "worker.sock")
+
+
+def preload_targets(function_calls_path: str = FUNCTION_CALLS_PATH, extra_modules: Optional[List[str]] = None) -> List[str]:
+    """
+    Imports the target functions of every saved function call (and any extra
+    modules), so forked handlers start with them already in memory.
+    Returns the names that could be loaded; failures are reported on stderr.
+    """
+    loaded = []
+    names = []
+    if os.path.exists(function_calls_path):
+        with open(function_calls_path) as f:
+            names = [fc["full_name"] for fc in json.load(f)]
+    for full_name in names:
+        try:
+            load_callable(full_name)
+            loaded.append(full_name)
+        except Exception as e:
+            print(f"worker daemon: cannot preload {full_name}: {e}", file=sys.stderr)
+    for module in extra_modules or []:
+        try:
+            import_module(module)
+            loaded.append(module)
+        except Exception as e:
+            print(f"worker daemon: cannot preload {module}: {e}", file=sys.stderr)
+    return loaded
+
+
+def _handle_connection(conn: socket.socket, preloaded: List[str]) -> None:
+    stream = conn.makefile("rwb")
+    # the metrics of the daemon (preloading) are not the client's; replies to
+    # checks and calls carry the ones recorded since, added to the client's metrics
+    take_metrics()
+    while True:
+        request = read_frame(stream)
+        if request is None or request[0] == "stop":
+            return
+        if request[0] == "ping":
+            write_frame(stream, ("pong", preloaded))
+        elif request[0] == "shutdown":
+            os.kill(os.getppid(), signal.SIGTERM)
+            return
+        elif request[0] == "check":
+            write_frame(stream, ("checked", import_error(request[1]), take_metrics()))
+        elif request[0] == "call":
+            _, full_name, params, profile, chunk_dir = request
+            run = execute(full_name, params, profile, chunk_dir)
+            write_frame(stream, ("result", run["status"], pickle.dumps(run), take_metrics()))
+
+
+def serve(socket_path: str = DAEMON_SOCKET_PATH, extra_modules: Optional[List[str]] = None) -> None:
+    """
+    Fork-server: preloads the target modules once, then forks one handler
+    process per client connection. Handlers inherit the imported modules, so
+    a new connection can run calls within milliseconds.
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("The worker daemon needs os.fork (Linux or macOS).")
+    preloaded = preload_targets(extra_modules=extra_modules)
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(64)
+    # handlers are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    # no exception from the handler: the signal may arrive while the parent is
+    # inside os.fork; closing the socket makes the pending accept() fail instead
+    stopping = threading.Event()
+
+    def stop(*_):
+        stopping.set()
+        server.close()
+
+    signal.signal(signal.SIGTERM, stop)
+    print(f"worker daemon: listening on {socket_path}, preloaded {preloaded}", file=sys.stderr)
+
+    try:
+        while not stopping.is_set():
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                if stopping.is_set():
+                    break
+                raise
+            if os.fork() == 0:
+                server.close()
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                try:
+                    _handle_connection(conn, preloaded)
+                finally:
+                    os._exit(0)
+            conn.close()
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+class DaemonClient:
+    """One connection to the daemon, served by its own forked handler process."""
+
+    def __init__(self, socket_path: str = DAEMON_SOCKET_PATH, timeout: Optional[float] = None):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(socket_path)
+        self.stream = self.sock.makefile("rwb")
+
+    def _request(self, *request):
+        write_frame(self.stream, request)
+        reply = read_frame(self.stream)
+        if reply is None:
+            raise ConnectionError("Worker daemon closed the connection")
+        return reply
+
+    def ping(self) -> List[str]:
+        return self._request("ping")[1]
+
+    def check(self, full_name: str) -> Optional[str]:
+        """None if the daemon can load full_name, otherwise why it cannot."""
+        _, error, metrics = self._request("check", full_name)
+        merge_metrics(metrics)
+        return error
+
+    def call_bytes(
+            self, full_name: str, params: dict, profile: bool = False, chunk_dir: Optional[str] = None) -> Tuple[str, bytes]:
+        _, status, payload, metrics = self._request("call", full_name, params, profile, chunk_dir)
+        merge_metrics(metrics)
+        return status, payload
+
+    def call(self, full_name: str, params: dict, profile: bool = False, chunk_dir: Optional[str] = None) -> dict:
+        return pickle.loads(self.call_bytes(full_name, params, profile, chunk_dir)[1])
+
+    def shutdown_daemon(self) -> None:
+        write_frame(self.stream, ("shutdown",))
+
+    def close(self) -> None:
+        try:
+            write_frame(self.stream, ("stop",))
+        except OSError:
+            pass
+        self.stream.close()
+        self.sock.close()
+
+
+def daemon_available(socket_path: str = DAEMON_SOCKET_PATH) -> bool:
+    if not os.path.exists(socket_path):
+        return False
+    try:
+        client = DaemonClient(socket_path, timeout=2)
+    except OSError:
+        return False
+    try:
+        client.ping()
+        return True
+    except (OSError, ConnectionError):
+        return False
+    finally:
+        client.close()
+
+
+class DaemonPool(Executor):
+    """
+    Executor backed by the warm worker daemon: one connection, and so one
+    forked handler, per worker. submit() accepts execute_batch tasks only.
+    """
+
+    def __init__(self, workers: int = 1, socket_path: str = DAEMON_SOCKET_PATH):
+        self._local = threading.local()
+        self._clients: List[DaemonClient] = []
+        self._lock = threading.Lock()
+        self._socket_path = socket_path
+        self._threads = ThreadPoolExecutor(max_workers=workers)
+
+    def _client(self) -> DaemonClient:
+        if not hasattr(self._local, "client"):
+            self._local.client = DaemonClient(self._socket_path)
+            with self._lock:
+                self._clients.append(self._local.client)
+        return self._local.client
+
+    def _run_batch(
+            self,
+            full_name: str,
+            batch: List[dict],
+            profile: bool = False,
+            chunk_dir: Optional[str] = None) -> List[Tuple[str, bytes]]:
+        client = self._client()
+        return [client.call_bytes(full_name, params, profile, chunk_dir) for params in batch]
+
+    def check_callable(self, full_name: str) -> Optional[str]:
+        """See IsolatedPool.check_callable."""
+        return self._client().check(full_name)
+
+    def run_call(self, full_name: str, params: dict, profile: bool = False, chunk_dir: Optional[str] = None) -> dict:
+        _, payload = self._run_batch(full_name, [params], profile, chunk_dir)[0]
+        return pickle.loads(payload)
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        if fn is not execute_batch:
+            raise ValueError("DaemonPool only runs execute_batch tasks")
+        return self._threads.submit(self._run_batch, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        self._threads.shutdown(wait=wait, cancel_futures=cancel_futures)
+        for client in self._clients:
+            client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm worker daemon with preloaded target modules.")
+    parser.add_argument("--socket", default=DAEMON_SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--preload", nargs="*", default=[], help="extra modules to import up front")
+    parser.add_argument("--stop", action="store_true", help="stop a running daemon")
+    args = parser.parse_args()
+    if args.stop:
+        DaemonClient(args.socket).shutdown_daemon()
+    else:
+        serve(args.socket, args.preload)
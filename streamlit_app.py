@@ -1,6 +1,9 @@
 # streamlit_app.py
 import streamlit as st
-import pandas as pd
+
+from utils.lazy import lazy_import
+
+pd = lazy_import("pandas")
 
 st.set_page_config(page_title="Function Output Check", layout="wide")
 
@@ -0,0 +1,9 @@
+import pytest
+
+from services.tracing_service import METRICS_FILE_ENV
+
+
+@pytest.fixture(autouse=True)
+def metrics_file(tmp_path_factory, monkeypatch):
+    """Keeps the metrics exported by the pipelines under test out of data/metrics."""
+    monkeypatch.setenv(METRICS_FILE_ENV, str(tmp_path_factory.mktemp("metrics") / "function_check.prom"))
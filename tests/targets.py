@@ -0,0 +1,10 @@
+"""Target functions called by the tests through their full name (tests.targets.<name>)."""
+import pandas as pd
+
+
+def echo(**params):
+    return dict(params)
+
+
+def frame(n: int = 3, offset: float = 0.0):
+    return pd.DataFrame({"id": range(n), "v": [i + offset for i in range(n)]})
@@ -0,0 +1,28 @@
+from services.ab_service import ABWorker, Environment
+
+TARGET = '''
+def square(x):
+    return x * x
+
+
+def squares(n):
+    for i in range(n):
+        yield i * i
+'''
+
+
+def test_worker_runs_in_a_source_tree_with_its_own_packages(tmp_path):
+    root = tmp_path / "other_repo"
+    # packages named like the app's, which the worker must neither need nor shadow
+    for package in ("utils", "services"):
+        (root / package).mkdir(parents=True)
+        (root / package / "__init__.py").write_text("")
+    (root / "abtarget.py").write_text(TARGET)
+
+    for full_name, params, expected in [("abtarget.square", {"x": 3}, 9), ("abtarget.squares", {"n": 3}, [0, 1, 4])]:
+        worker = ABWorker(Environment(source_root=str(root)), full_name, str(tmp_path / "worker.log"))
+        try:
+            run = worker.call(params)
+        finally:
+            worker.close()
+        assert (run["status"], run["result"]) == ("ok", expected)
@@ -0,0 +1,31 @@
+import random
+
+from models.function_call import FunctionCall
+from models.parameter_definition import ParameterDefinition
+from services.budget_service import run_budget
+from services.generation_service import generate_parameters
+from services.results_service import list_run_files, load_run
+
+CALL = FunctionCall(
+    full_name="tests.targets.echo", name="echo",
+    parameters=[
+        ParameterDefinition(name="x", type="int", range=(0, 1000)),
+        ParameterDefinition(name="flag", type="boolean"),
+    ],
+)
+
+
+def test_budget_draws_parameters_from_its_seed_only(tmp_path):
+    results = str(tmp_path / "results")
+    random.seed(0)
+    state = random.getstate()
+    summary = run_budget([CALL], 0.2, "prd/pre", results_path=results, seed=3)
+    assert random.getstate() == state
+
+    folder = tmp_path / "results" / "prd" / "pre" / "echo"
+    drawn = [load_run(str(folder / f))["parameters"] for f in sorted(list_run_files(str(folder)))]
+    assert len(drawn) == summary["echo"]["runs"] > 0
+    rng = random.Random(3)
+    # the first draw is the next parameters of the function when the batch starts
+    assert drawn == [generate_parameters(CALL.parameters, rng) for _ in drawn]
+    assert all(isinstance(params["flag"], bool) for params in drawn)
@@ -0,0 +1,38 @@
+from services.checkpoint_service import BatchJournal, list_batches
+
+
+def test_journal_reads_appended_lines_and_skips_a_torn_one(tmp_path):
+    journal = BatchJournal.create(str(tmp_path), "run", planned=3)
+    journal.record(0, "done")
+    assert journal.progress()["done"] == 1
+
+    with open(journal.path, "a") as f:
+        f.write('{"type": "item", "item": 1, "sta')  # crashed mid-line
+    assert journal.outcomes().keys() == {0}
+    # the next record after the crash must not be merged into the torn line
+    journal.record(1, "failed")
+    assert journal.outcomes().keys() == {0, 1}
+    journal.record(2, "done")
+    assert {item: e["status"] for item, e in journal.outcomes().items()} == {0: "done", 1: "failed", 2: "done"}
+    assert BatchJournal(str(tmp_path), journal.batch_id).progress()["failed"] == 1
+
+
+def test_rerun_files_are_kept_out_of_the_header(tmp_path):
+    files = [f"run_{n}.pkl" for n in range(100)]
+    journal = BatchJournal.create(str(tmp_path), "rerun", planned=len(files), files=files, from_folder="prd/pre")
+    with open(journal.path) as f:
+        header_line = f.readline()
+    assert "run_0.pkl" not in header_line
+    assert journal.files() == files
+    assert journal.header["from_folder"] == "prd/pre"
+
+
+def test_list_batches_keeps_incomplete_journals_of_a_kind(tmp_path):
+    finished = BatchJournal.create(str(tmp_path), "run", planned=1)
+    finished.record(0, "done")
+    unfinished = BatchJournal.create(str(tmp_path), "run", planned=2)
+    unfinished.record(0, "done")
+    BatchJournal.create(str(tmp_path), "rerun", planned=1, files=["run_0.pkl"])
+
+    assert [j.batch_id for j in list_batches(str(tmp_path), kind="run", incomplete_only=True)] == [unfinished.batch_id]
+    assert len(list_batches(str(tmp_path))) == 3
@@ -0,0 +1,101 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+from utils.compare_dfs import compare_dfs, diff_cells, join_by_key_column
+
+NULLABLE_VALUES = {
+    "Int64": [1, 2, 3],
+    "Float64": [1.5, 2.5, 3.5],
+    "string": ["a", "b", "c"],
+    "string[pyarrow]": ["a", "b", "c"],
+    "boolean": [True, False, True],
+}
+
+
+def _one_sided_keys(dtype: str):
+    """Frames sharing key 2 only: key 1 is before only, key 3 after only."""
+    values = NULLABLE_VALUES[dtype]
+    before = pd.DataFrame({"id": [1, 2], "v": pd.array(values[:2], dtype=dtype)})
+    after = pd.DataFrame({"id": [2, 3], "v": pd.array(values[1:], dtype=dtype)})
+    return before, after
+
+
+def _highlighted(styler) -> dict:
+    """{(row, column position): style} of the highlighted cells of a rendered Styler."""
+    return {cell: style for cell, style in styler._compute().ctx.items() if style}
+
+
+@pytest.mark.parametrize("dtype", list(NULLABLE_VALUES))
+def test_compare_dfs_one_sided_keys(dtype):
+    before, after = _one_sided_keys(dtype)
+    styler = compare_dfs(before, after, ["id"], "before", "after")
+    assert list(styler.data.columns) == [("id", "before"), ("id", "after"), ("v", "before"), ("v", "after")]
+    # rows: keys 1, 2, 3; only the side holding a value is highlighted
+    assert set(_highlighted(styler)) == {(0, 2), (2, 3)}
+
+
+@pytest.mark.parametrize("dtype", list(NULLABLE_VALUES))
+def test_compare_dfs_without_keys(dtype):
+    before, after = _one_sided_keys(dtype)
+    after = after.set_axis([0, 5])
+    styler = compare_dfs(before, after, [], "before", "after")
+    # index 0 is on both sides with different id and v, 1 before only, 5 after only
+    assert set(_highlighted(styler)) == {(0, 0), (0, 1), (0, 2), (0, 3), (1, 0), (1, 2), (2, 1), (2, 3)}
+
+
+@pytest.mark.parametrize("dtype", list(NULLABLE_VALUES))
+def test_diff_cells_one_sided_keys(dtype):
+    before, after = _one_sided_keys(dtype)
+    diffs = diff_cells(before, after, ["id"])
+    values = NULLABLE_VALUES[dtype]
+    assert diffs["id"].tolist() == [1, 3]
+    assert diffs["column"].tolist() == ["v", "v"]
+    assert diffs["before"].iloc[0] == values[0] and pd.isna(diffs["before"].iloc[1])
+    assert pd.isna(diffs["after"].iloc[0]) and diffs["after"].iloc[1] == values[2]
+
+
+@pytest.mark.parametrize("dtype", list(NULLABLE_VALUES))
+def test_diff_cells_missing_on_both_sides_is_equal(dtype):
+    before = pd.DataFrame({"id": [1, 2], "v": pd.array([NULLABLE_VALUES[dtype][0], None], dtype=dtype)})
+    after = pd.DataFrame({"id": [2, 1], "v": pd.array([None, NULLABLE_VALUES[dtype][1]], dtype=dtype)})
+    diffs = diff_cells(before, after, ["id"])
+    assert diffs[["id", "column"]].values.tolist() == [[1, "v"]]
+
+
+def test_join_keeps_categorical_keys_with_different_categories():
+    before = pd.DataFrame({"k": pd.Categorical(["x", "y"]), "v": [1, 2]})
+    after = pd.DataFrame({"k": pd.Categorical(["y", "z"]), "v": [2, 3]})
+    aligned_before, aligned_after = join_by_key_column(before, after, ["k"])
+    for aligned in (aligned_before, aligned_after):
+        assert isinstance(aligned["k"].dtype, pd.CategoricalDtype)
+        assert aligned["k"].tolist() == ["x", "y", "z"]
+    assert aligned_before["v"].tolist()[:2] == [1, 2] and pd.isna(aligned_before["v"].iloc[2])
+
+
+@pytest.mark.parametrize("empty", ["before", "after", "both"])
+@pytest.mark.parametrize("key_columns", [["id"], []])
+def test_join_with_empty_frames(empty, key_columns):
+    frame = pd.DataFrame({"id": pd.array([1, 2], dtype="Int64"), "v": pd.array(["a", "b"], dtype="string")})
+    before = frame.iloc[:0] if empty in ("before", "both") else frame
+    after = frame.iloc[:0] if empty in ("after", "both") else frame
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        aligned_before, aligned_after = join_by_key_column(before, after, key_columns)
+        diffs = diff_cells(before, after, key_columns)
+    rows = 0 if empty == "both" else 2
+    assert len(aligned_before) == len(aligned_after) == rows
+    assert aligned_before["v"].dtype == aligned_after["v"].dtype == "string"
+    assert len(diffs) == (0 if empty == "both" else 2 * (len(frame.columns) - len(key_columns)))
+
+
+@pytest.mark.parametrize("key_columns", [["id"], []])
+def test_join_with_an_untyped_empty_frame(key_columns):
+    before = pd.DataFrame(columns=["id", "v"])
+    after = pd.DataFrame({"id": [1, 2], "v": [0.5, 1.5]})
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        aligned_before, aligned_after = join_by_key_column(before, after, key_columns)
+    assert aligned_after["v"].tolist() == [0.5, 1.5]
+    assert aligned_before["v"].isna().all() and len(aligned_before) == 2
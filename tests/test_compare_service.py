@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+
+from services.compare_service import compare_folders
+from services.execution_service import save_run
+
+
+def _save(folder: str, fname: str, result) -> None:
+    os.makedirs(folder, exist_ok=True)
+    save_run(os.path.join(folder, fname), {"result": result, "parameters": {}, "time": 0.0, "status": "ok"})
+
+
+def _compare(before: str, after: str, **kwargs):
+    return compare_folders(before, after, "prd/pre", "prd/post", "fn", ["id"], **kwargs)
+
+
+def test_compare_cache_only_compares_new_and_changed_pairs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    before, after = str(tmp_path / "pre"), str(tmp_path / "post")
+    frame = pd.DataFrame({"id": [1, 2], "v": [0.5, 1.5]})
+    for n in range(3):
+        _save(before, f"run_2024010100000{n}.pkl", frame)
+        _save(after, f"run_2024010100000{n}.pkl", frame)
+
+    records, stats = _compare(before, after)
+    assert (stats["cached"], stats["compared"]) == (0, 3)
+    records, stats = _compare(before, after)
+    assert (stats["cached"], stats["compared"]) == (3, 0)
+    assert all(record["Values Check"] == "✅" for record in records)
+
+    _save(after, "run_20240101000001.pkl", pd.DataFrame({"id": [1, 2, 3], "v": [0.5, 1.5, 2.5]}))
+    _save(before, "run_20240101000003.pkl", frame)
+    _save(after, "run_20240101000003.pkl", frame)
+    records, stats = _compare(before, after)
+    assert (stats["total"], stats["cached"], stats["compared"]) == (4, 2, 2)
+    assert [r["File"] for r in records if r["Values Check"] == "❌"] == ["run_20240101000001.pkl"]
+
+    records, stats = _compare(before, after, use_cache=False)
+    assert (stats["cached"], stats["compared"]) == (0, 4)
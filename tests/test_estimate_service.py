@@ -0,0 +1,54 @@
+import os
+import random
+
+from models.parameter_definition import ParameterDefinition
+from services.estimate_service import CostModel, TimingHistories, estimate_runs
+from services.execution_service import save_run
+from services.generation_service import generate_parameters
+
+
+def _save_runs(folder: str, times: list, start: int = 0) -> None:
+    os.makedirs(folder, exist_ok=True)
+    for n, seconds in enumerate(times, start):
+        save_run(
+            os.path.join(folder, f"run_20240101{n:06d}.pkl"),
+            {"result": None, "parameters": {"n": n}, "time": seconds, "status": "ok"},
+        )
+
+
+def test_estimate_runs_leaves_the_global_random_state_alone():
+    params = [ParameterDefinition(name="n", type="int", range=[1, 100])]
+    model = CostModel(samples=10, intercept=0.5, coefficients={"n": 0.01})
+    random.seed(7)
+    expected = [random.random() for _ in range(3)]
+
+    random.seed(7)
+    first = estimate_runs(model, lambda rng: generate_parameters(params, rng), runs=10, workers=2)
+    second = estimate_runs(model, lambda rng: generate_parameters(params, rng), runs=10, workers=2)
+    assert [random.random() for _ in range(3)] == expected
+    assert first == second
+    assert first["seconds"] == first["runs"] * first["per_run"] / 2
+
+
+def test_estimate_runs_predicts_on_the_given_generator():
+    model = CostModel(samples=10, intercept=0.0, coefficients={"n": 1.0})
+    estimate = estimate_runs(model, lambda rng: {"n": 3}, runs=4)
+    assert estimate["per_run"] == 3.0
+    assert estimate["seconds"] == 12.0
+
+
+def test_timing_histories_read_in_background_and_restamp_new_runs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    results = tmp_path / "results"
+    _save_runs(str(results / "prd" / "pre" / "fn"), [1.0, 2.0])
+    histories = TimingHistories(str(results), max_age=0)
+
+    stamp, history = histories.wait("fn")
+    assert sorted(h["time"] for h in history) == [1.0, 2.0]
+    assert histories.wait("fn") == (stamp, history)
+
+    _save_runs(str(results / "prd" / "post" / "fn"), [3.0], start=2)
+    histories.get("fn")
+    new_stamp, history = histories.wait("fn")
+    assert new_stamp != stamp
+    assert sorted(h["time"] for h in history) == [1.0, 2.0, 3.0]
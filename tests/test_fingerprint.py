@@ -0,0 +1,44 @@
+import pandas as pd
+import pytest
+
+from utils.chunked import write_chunks
+from utils.fingerprint import diff_fingerprints, fingerprint_result
+
+FRAME = pd.DataFrame({"id": [1, 2, 3, 4], "v": [0.5, 1.5, 2.5, 3.5], "s": ["a", "b", "c", "d"]})
+
+
+def _diff(before, after, key_columns=None) -> dict:
+    return diff_fingerprints(fingerprint_result(before, key_columns), fingerprint_result(after, key_columns))
+
+
+@pytest.mark.parametrize("key_columns", [None, ["id"]])
+def test_reversed_rows_change_no_column_or_row(key_columns):
+    diff = _diff(FRAME, FRAME.iloc[::-1], key_columns)
+    assert diff["changed_columns"] == []
+    assert diff["changed_rows"] == 0
+
+
+def test_reset_index_changes_no_column_or_row_with_key_columns():
+    diff = _diff(FRAME, FRAME.iloc[::-1].reset_index(drop=True), ["id"])
+    assert diff["changed_columns"] == []
+    assert diff["changed_rows"] == 0
+
+
+@pytest.mark.parametrize("key_columns", [None, ["id"]])
+def test_changed_value_is_found_whatever_the_row_order(key_columns):
+    after = FRAME.assign(v=[0.5, 1.5, 9.0, 3.5]).iloc[::-1]
+    diff = _diff(FRAME, after, key_columns)
+    assert diff["changed_columns"] == ["v"]
+    assert diff["changed_rows"] == 1
+
+
+def test_chunked_hashes_add_up_to_the_frame_hashes(tmp_path):
+    chunked = write_chunks(iter([FRAME.iloc[:2], FRAME.iloc[2:]]), str(tmp_path))
+    whole = fingerprint_result(FRAME, ["id"])
+    assert fingerprint_result(chunked, ["id"]).column_hashes == whole.column_hashes
+
+
+@pytest.mark.parametrize("key_columns", [None, ["id"]])
+def test_rows_on_one_side_only_count_as_changed(key_columns):
+    after = pd.concat([FRAME.iloc[1:], pd.DataFrame({"id": [5], "v": [4.5], "s": ["e"]}, index=[4])])
+    assert _diff(FRAME, after, key_columns)["changed_rows"] == 2
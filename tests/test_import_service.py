@@ -0,0 +1,14 @@
+import pytest
+
+from services.import_service import DefinitionErrors, import_definitions
+
+
+@pytest.mark.parametrize("name", [["x"], {"x": 1}, 3])
+def test_name_that_is_not_a_string_is_a_validation_error(name, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(DefinitionErrors) as raised:
+        import_definitions([
+            ("a.json", {"full_name": "m.f", "name": name, "parameters": []}),
+            ("b.json", {"full_name": "m.g", "name": "g", "parameters": []}),
+        ])
+    assert raised.value.errors == [f"a.json ({name}): name must be a string, not {type(name).__name__}"]
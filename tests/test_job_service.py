@@ -0,0 +1,44 @@
+import threading
+
+from services.job_service import CANCELLED, DONE, JobManager
+
+
+def _keep(context, value):
+    context.keep(value)
+    return {"kept": True}
+
+
+def _finish(manager: JobManager, job_id: str) -> None:
+    manager._futures[job_id].result()
+    assert manager.get(job_id)["status"] == DONE
+
+
+def test_kept_result_is_handed_over_once(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs"))
+    job_id = manager.submit("compare", "keep", _keep, [1, 2, 3])
+    _finish(manager, job_id)
+    assert manager.result(job_id) == [1, 2, 3]
+    assert manager.result(job_id) is None
+
+
+def test_unread_results_beyond_max_kept_are_dropped(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs"), max_concurrent=1, max_kept=2)
+    job_ids = [manager.submit("compare", f"keep {n}", _keep, n) for n in range(3)]
+    for job_id in job_ids:
+        _finish(manager, job_id)
+    assert [manager.result(job_id) for job_id in job_ids] == [None, 1, 2]
+    assert any("dropped" in line for line in manager.log_tail(job_ids[0]))
+
+
+def test_job_cancelled_as_it_starts_is_marked_cancelled(tmp_path):
+    manager = JobManager(str(tmp_path / "jobs"), max_concurrent=1)
+    release = threading.Event()
+    blocking_id = manager.submit("run", "blocking", lambda context: release.wait())
+    job_id = manager.submit("run", "cancelled", _keep, 1, target="batch_1")
+    # cancel() set the flag but lost the race with the pool starting the job
+    manager._contexts[job_id].cancel_requested.set()
+    release.set()
+    _finish(manager, blocking_id)
+    manager._futures[job_id].result()
+    assert manager.get(job_id)["status"] == CANCELLED
+    assert "batch_1" not in manager.active_targets()
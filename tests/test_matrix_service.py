@@ -0,0 +1,28 @@
+import os
+
+import pandas as pd
+
+from services.baseline_service import fingerprint_folder
+from services.execution_service import save_run
+from services.matrix_service import compare_matrix
+
+
+def _write_runs(folder: str, results: dict) -> None:
+    os.makedirs(folder, exist_ok=True)
+    for fname, result in results.items():
+        save_run(os.path.join(folder, fname), {"result": result, "parameters": {}, "time": 0.0, "status": "ok"})
+
+
+def test_fingerprint_baseline_agrees_with_full_results(tmp_path):
+    frame = pd.DataFrame({"id": [1, 2, 3], "v": [0.5, 1.5, 2.5]})
+    full = str(tmp_path / "full")
+    changed = str(tmp_path / "changed")
+    baseline = str(tmp_path / "baseline")
+    _write_runs(full, {"run_20240101000000.pkl": frame, "run_20240101000001.pkl": 42})
+    _write_runs(changed, {"run_20240101000000.pkl": frame.assign(v=0.0), "run_20240101000001.pkl": 42})
+    fingerprint_folder(full, baseline, ["id"])
+
+    runs, agreement = compare_matrix([full, baseline, changed], ["full", "baseline", "changed"])
+    assert agreement.loc["full", "baseline"] == 1.0
+    assert agreement.loc["baseline", "changed"] == 0.5
+    assert runs["Classes"].tolist() == [2, 1]
@@ -0,0 +1,104 @@
+import os
+import time
+import random
+import threading
+
+import pytest
+
+from models.function_call import FunctionCall
+from models.parameter_definition import ParameterDefinition
+from services.results_service import load_run
+from services.generation_service import generate_parameters
+from services import queue_service
+from services.queue_service import Lease, LeaseLost, claim_next, current_lease, enqueue_sweep, sweep_status, work
+
+CALL = FunctionCall(
+    full_name="tests.targets.echo", name="echo",
+    parameters=[ParameterDefinition(name="x", type="int", range=(0, 1000))],
+)
+
+
+def test_expired_lease_is_reclaimed_and_its_holder_loses_it(tmp_path):
+    queue = str(tmp_path / "queue")
+    sweep_id = enqueue_sweep(CALL, "prd/pre", runs=4, runs_per_item=2, base_seed=0, queue_path=queue)
+
+    first_item, first_lease = claim_next(queue, "a", lease_seconds=0.2)
+    second_item, _ = claim_next(queue, "b", lease_seconds=60)
+    assert (first_item["item_id"], second_item["item_id"]) == ("00000", "00001")
+    assert claim_next(queue, "c", lease_seconds=60) is None
+    assert sweep_status(sweep_id, queue)["leased"] == 2
+
+    time.sleep(0.3)
+    assert sweep_status(sweep_id, queue)["stale"] == 1
+    reclaimed_item, reclaimed_lease = claim_next(queue, "c", lease_seconds=60)
+    assert reclaimed_item == first_item
+    with pytest.raises(LeaseLost):
+        first_lease.renew()
+    first_lease.release()
+    assert os.path.exists(reclaimed_lease.held_path)
+    assert current_lease(reclaimed_lease.path)["owner"] == "c"
+
+
+def test_worker_resumes_a_reclaimed_item_with_the_same_seeds(tmp_path):
+    queue, results = str(tmp_path / "queue"), str(tmp_path / "results")
+    sweep_id = enqueue_sweep(CALL, "prd/pre", runs=3, runs_per_item=3, base_seed=5, queue_path=queue)
+    # a worker that claimed the item and stopped without renewing its lease
+    claim_next(queue, "crashed", lease_seconds=0.01)
+    time.sleep(0.05)
+
+    assert work(queue, results, exit_when_idle=True, log=lambda message: None) == 1
+    assert sweep_status(sweep_id, queue)["done"] == 1
+    folder = os.path.join(results, "prd", "pre", "echo")
+    params = sorted(load_run(os.path.join(folder, f))["parameters"]["x"] for f in os.listdir(folder) if f.endswith(".pkl"))
+    assert params == sorted(generate_parameters(CALL.parameters, random.Random(seed))["x"] for seed in (5, 6, 7))
+
+
+def test_only_one_worker_reclaims_an_expired_lease(tmp_path):
+    path = str(tmp_path / "00000.lease")
+    assert Lease(path, "crashed", 0.01).acquire()
+    time.sleep(0.05)
+    reclaimers = [Lease(path, f"w{n}", 60) for n in range(8)]
+    won = []
+    threads = [threading.Thread(target=lambda lease=lease: won.append(lease.acquire())) for lease in reclaimers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert won.count(True) == 1
+    holder = next(lease for lease in reclaimers if lease.generation is not None)
+    assert current_lease(path)["owner"] == holder.owner
+    holder.renew()
+
+
+def test_worker_retries_an_item_after_a_storage_error(tmp_path, monkeypatch):
+    queue, results = str(tmp_path / "queue"), str(tmp_path / "results")
+    sweep_id = enqueue_sweep(CALL, "prd/pre", runs=2, runs_per_item=2, base_seed=0, queue_path=queue)
+    run_item = queue_service.run_item
+    calls = []
+
+    def flaky_run_item(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError(116, "Stale file handle")
+        return run_item(*args)
+
+    monkeypatch.setattr(queue_service, "run_item", flaky_run_item)
+    assert work(queue, results, exit_when_idle=True, retry_seconds=0, log=lambda message: None) == 1
+    assert len(calls) == 2
+    assert sweep_status(sweep_id, queue)["done"] == 1
+
+
+def test_item_failing_with_storage_errors_is_marked_failed_after_its_attempts(tmp_path, monkeypatch):
+    queue, results = str(tmp_path / "queue"), str(tmp_path / "results")
+    sweep_id = enqueue_sweep(CALL, "prd/pre", runs=2, runs_per_item=2, base_seed=0, queue_path=queue)
+    calls = []
+
+    def broken_run_item(*args):
+        calls.append(args)
+        raise PermissionError(13, "Permission denied")
+
+    monkeypatch.setattr(queue_service, "run_item", broken_run_item)
+    assert work(queue, results, exit_when_idle=True, retry_seconds=0, log=lambda message: None) == 0
+    assert len(calls) == queue_service.ITEM_ATTEMPTS
+    status = sweep_status(sweep_id, queue)
+    assert (status["failed"], status["leased"], status["pending"]) == (1, 0, 0)
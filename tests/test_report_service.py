@@ -0,0 +1,39 @@
+import csv
+import json
+import os
+
+from services.report_service import ReportWriter
+from services.table_service import RECORD_COLUMNS
+
+
+def _record(fname: str, n: int, mismatch: bool) -> dict:
+    record = {"File": fname, "n": n, "DataFrame Check": "✅ ✅", "Columns Check": "✅",
+              "Values Check": "❌" if mismatch else "✅"}
+    if mismatch:
+        record.update({"Changed Columns": "v, +extra", "Changed Rows": 3, "Peak MB Before": 1.0})
+    return record
+
+
+def test_columns_do_not_depend_on_the_first_pair(tmp_path):
+    out_dir = str(tmp_path / "report")
+    with ReportWriter(out_dir, "report", ["n"], page_size=2) as writer:
+        writer.write_pair(_record("run_1.pkl", 1, mismatch=False))
+        writer.write_pair(_record("run_2.pkl", 2, mismatch=True))
+        writer.write_pair(_record("run_3.pkl", 3, mismatch=True))
+
+    with open(os.path.join(out_dir, "summary.csv"), encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == ["n"] + RECORD_COLUMNS + ["Mismatch"]
+    assert rows[0]["Changed Columns"] == ""
+    assert rows[1]["Changed Columns"] == "v, +extra"
+    assert rows[2]["Changed Rows"] == "3" and rows[2]["Peak MB Before"] == "1.0"
+    assert [row["Mismatch"] for row in rows] == ["False", "True", "True"]
+
+    with open(os.path.join(out_dir, "summary.jsonl"), encoding="utf-8") as f:
+        assert json.loads(f.readlines()[1])["Changed Columns"] == "v, +extra"
+
+    for page in ("page_0001.html", "page_0002.html"):
+        with open(os.path.join(out_dir, page), encoding="utf-8") as f:
+            assert "<th>Changed Columns</th>" in f.read()
+    with open(os.path.join(out_dir, "page_0002.html"), encoding="utf-8") as f:
+        assert "<td>v, +extra</td>" in f.read()
@@ -0,0 +1,33 @@
+import tracemalloc
+
+from utils.resources import ResourceMeter
+
+MB = 1024 * 1024
+
+
+def _allocate(size: int) -> None:
+    buffer = bytearray(size)
+    del buffer
+
+
+def test_a_meter_keeps_its_peak_when_another_starts_and_stops():
+    outer = ResourceMeter().__enter__()
+    _allocate(20 * MB)
+    with ResourceMeter() as inner:
+        pass
+    outer.__exit__(None, None, None)
+    assert outer.usage["peak_alloc"] >= 20 * MB
+    assert inner.usage["peak_alloc"] < MB
+    assert not tracemalloc.is_tracing()
+
+
+def test_overlapping_meters_exiting_out_of_order():
+    first = ResourceMeter().__enter__()
+    second = ResourceMeter().__enter__()
+    first.__exit__(None, None, None)
+    assert tracemalloc.is_tracing()
+    _allocate(30 * MB)
+    second.__exit__(None, None, None)
+    assert second.usage["peak_alloc"] >= 30 * MB
+    assert first.usage["peak_alloc"] < MB
+    assert not tracemalloc.is_tracing()
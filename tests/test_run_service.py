@@ -0,0 +1,102 @@
+import os
+import sys
+import pickle
+import random
+import threading
+
+import pytest
+
+from services.checkpoint_service import BatchJournal
+from services.isolation_service import IsolatedPool
+from services.results_service import load_run
+from services.run_service import run_batch
+
+
+def _make_params(rng: random.Random) -> dict:
+    # another user of the global random state draws between and during items
+    random.random()
+    return {"x": rng.randint(0, 10 ** 9), "y": rng.random()}
+
+
+def _parameters(folder: str) -> list:
+    runs = []
+    for fname in sorted(f for f in os.listdir(folder) if f.endswith(".pkl")):
+        with open(os.path.join(folder, fname), "rb") as f:
+            runs.append(pickle.load(f)["parameters"])
+    return runs
+
+
+def _run(folder: str, seeds: list) -> list:
+    journal = BatchJournal.create(folder, "run", planned=len(seeds))
+    run_batch("tests.targets.echo", _make_params, folder, journal, seeds=seeds)
+    return _parameters(folder)
+
+
+def test_seeds_reproduce_parameters_whatever_the_global_random_state(tmp_path):
+    seeds = [11, 12, 13, 14]
+    random.seed(1)
+    first = _run(str(tmp_path / "first"), seeds)
+
+    stop = threading.Event()
+
+    def disturb():
+        while not stop.is_set():
+            random.seed(random.random())
+
+    thread = threading.Thread(target=disturb)
+    thread.start()
+    try:
+        second = _run(str(tmp_path / "second"), seeds)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert first == second
+    assert first == [_make_params(random.Random(seed)) for seed in seeds]
+
+
+def test_without_seeds_items_get_different_parameters(tmp_path):
+    journal = BatchJournal.create(str(tmp_path / "unseeded"), "run", planned=3)
+    run_batch("tests.targets.echo", _make_params, journal.folder, journal)
+    params = _parameters(journal.folder)
+    assert len(params) == 3 and len({p["x"] for p in params}) == 3
+
+
+def test_pool_imports_the_target_in_its_workers_only(tmp_path, monkeypatch):
+    (tmp_path / "pool_only_target.py").write_text("def double(x):\n    return 2 * x\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    journal = BatchJournal.create(str(tmp_path / "runs"), "run", planned=2)
+    pool = IsolatedPool(1)
+    try:
+        saved = run_batch("pool_only_target.double", lambda rng: {"x": 21}, journal.folder, journal, pool=pool)
+    finally:
+        pool.shutdown()
+    assert "pool_only_target" not in sys.modules
+    assert [run["result"] for run in map(load_run, saved)] == [42, 42]
+
+
+def test_pool_reports_a_target_its_workers_cannot_load(tmp_path):
+    journal = BatchJournal.create(str(tmp_path / "runs"), "run", planned=1)
+    pool = IsolatedPool(1)
+    try:
+        with pytest.raises(ValueError, match="ModuleNotFoundError"):
+            run_batch("no_such_module.f", lambda rng: {}, journal.folder, journal, pool=pool)
+    finally:
+        pool.shutdown()
+    assert journal.progress()["done"] == 0
+
+
+def test_resumed_batch_runs_only_the_items_not_done(tmp_path):
+    journal = BatchJournal.create(str(tmp_path / "runs"), "run", planned=3)
+    run_batch("tests.targets.echo", _make_params, journal.folder, journal, seeds=[1, 2, 3])
+    outcomes = journal.outcomes()
+    # the second item failed in a previous attempt: its run file is replaced
+    journal.record(1, "failed", outcome="error", file=outcomes[1]["file"])
+
+    resumed = BatchJournal(journal.folder, journal.batch_id)
+    saved = run_batch("tests.targets.echo", _make_params, resumed.folder, resumed, seeds=[1, 2, 3])
+    assert len(saved) == 1
+    assert resumed.progress()["done"] == 3
+    # the run file of the failed attempt is gone, the item ran again with its own seed
+    expected = [_make_params(random.Random(seed)) for seed in [1, 2, 3]]
+    assert sorted(_parameters(journal.folder), key=lambda p: p["x"]) == sorted(expected, key=lambda p: p["x"])
@@ -0,0 +1,35 @@
+import pytest
+
+from services.sampling_service import estimate_mismatch_rate, sample_pairs, stratum_counts
+
+
+def _population(small: int):
+    # a large stratum without mismatches and a small one where every pair mismatches
+    strata = {f"run_{n:03d}.pkl": ("large",) for n in range(100 - small)}
+    strata.update({f"run_{n:03d}.pkl": ("small",) for n in range(100 - small, 100)})
+    return strata
+
+
+def test_stratified_estimate_weights_strata_by_population_share():
+    strata = _population(small=2)
+    sampled = sample_pairs(sorted(strata), 10, strata, seed=1)
+    outcomes = {fname: strata[fname] == ("small",) for fname in sampled}
+    # the small stratum is oversampled: its share of the sample is not its share of the population
+    assert sum(outcomes.values()) / len(sampled) > 0.05
+
+    estimate = estimate_mismatch_rate(
+        sum(outcomes.values()), len(sampled), len(strata), strata=stratum_counts(strata, outcomes),
+    )
+    assert estimate["rate"] == pytest.approx(0.02)
+    assert estimate["low"] <= 0.02 <= estimate["high"]
+
+
+def test_proportional_stratified_sample_gives_the_plain_rate():
+    strata = _population(small=10)
+    # 9 and 1 files: the sample shares of the strata are their population shares
+    outcomes = {f"run_{n:03d}.pkl": n % 27 == 0 for n in range(0, 81, 9)}
+    outcomes["run_095.pkl"] = True
+    mismatches, sampled = sum(outcomes.values()), len(outcomes)
+    stratified = estimate_mismatch_rate(mismatches, sampled, len(strata), strata=stratum_counts(strata, outcomes))
+    assert stratified["rate"] == pytest.approx(mismatches / sampled)
+    assert stratified["low"] < stratified["rate"] < stratified["high"]
@@ -0,0 +1,45 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from services.execution_service import execute_batch
+from services.isolation_service import IsolatedPool
+from services.rerun_service import make_executor
+from services.tracing_service import METRICS_FILE_ENV, METRICS_INSTANCE_ENV, export_metrics, inc, take_metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CALL_STAGE = ("fchk_stage_seconds", (("stage", "call"),))
+
+
+def test_each_instance_exports_one_metrics_file_removed_at_exit(tmp_path, monkeypatch):
+    monkeypatch.setenv(METRICS_FILE_ENV, str(tmp_path / "function_check.prom"))
+    monkeypatch.setenv(METRICS_INSTANCE_ENV, "app")
+    inc("fchk_calls_total", function="tests.targets.echo", status="ok")
+    path = export_metrics()
+    assert path == str(tmp_path / "function_check.app.prom")
+    with open(path) as f:
+        assert 'fchk_calls_total{function="tests.targets.echo",status="ok",process="app"}' in f.read()
+
+    other = subprocess.run(
+        [sys.executable, "-c", "from services.tracing_service import export_metrics, inc; "
+                               "inc('fchk_calls_total', function='f', status='ok'); "
+                               "print(export_metrics(), export_metrics())"],
+        cwd=ROOT, env={**os.environ, METRICS_INSTANCE_ENV: "worker-1"}, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    assert other == [str(tmp_path / "function_check.worker-1.prom")] * 2
+    # written twice by the worker, removed when it exited
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+
+
+@pytest.mark.parametrize("make_pool", [lambda: make_executor("process", 1), lambda: IsolatedPool(1)])
+def test_worker_processes_send_their_metrics_back(make_pool):
+    pool = make_pool()
+    take_metrics()
+    try:
+        results = pool.submit(execute_batch, "tests.targets.echo", [{"x": 1}, {"x": 2}]).result()
+    finally:
+        pool.shutdown()
+    assert [status for status, _ in results] == ["ok", "ok"]
+    assert take_metrics()["histograms"][CALL_STAGE][2] == 2
@@ -0,0 +1,181 @@
+"""
+Chunked results of target functions that return an iterator (e.g. a
+generator yielding DataFrame chunks) instead of one object.
+
+With a chunk folder, chunks are pickled one after the other to a chunk file
+as they are produced, so only one chunk is in memory at a time, and the run
+dict stores a small ChunkedResult pointing to that file. Compares then walk
+both results chunk by chunk.
+"""
+import os
+import uuid
+import pickle
+from typing import Any, Iterator, List, Optional
+
+from utils.lazy import lazy_import, loaded
+
+pd = lazy_import("pandas")
+
+# Chunk files live next to the run files: <function results folder>/.chunks/<id>.chunks
+CHUNKS_DIR = ".chunks"
+
+
+class ChunkedResult:
+    """
+    Result stored as a sequence of pickled chunks in a chunk file. Only the
+    file name, chunk offsets and summary are pickled with the run dict;
+    results_service.load_run binds the result to the folder of its run file.
+    rows and columns are set when every chunk is a DataFrame.
+    """
+
+    def __init__(
+            self,
+            file_name: str,
+            offsets: List[int],
+            nbytes: int,
+            rows: Optional[int] = None,
+            columns: Optional[list] = None):
+        self.file_name = file_name
+        self.offsets = offsets
+        self.nbytes = nbytes
+        self.rows = rows
+        self.columns = columns
+        self.folder: Optional[str] = None
+
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "folder": None}
+
+    def __repr__(self) -> str:
+        rows = f", {self.rows} rows" if self.rows is not None else ""
+        return f"ChunkedResult({len(self.offsets)} chunks{rows}, {self.nbytes} bytes)"
+
+    @property
+    def is_frame(self) -> bool:
+        return self.columns is not None
+
+    def bind(self, folder: str) -> "ChunkedResult":
+        self.folder = folder
+        return self
+
+    @property
+    def path(self) -> str:
+        if self.folder is None:
+            raise ValueError(f"{self!r} is not bound to a results folder")
+        return os.path.join(self.folder, CHUNKS_DIR, self.file_name)
+
+    def iter_chunks(self) -> Iterator[Any]:
+        with open(self.path, "rb") as f:
+            for offset in self.offsets:
+                f.seek(offset)
+                yield pickle.load(f)
+
+    def materialize(self) -> Any:
+        """The whole result in memory: one DataFrame, or the list of chunks."""
+        chunks = list(self.iter_chunks())
+        return pd.concat(chunks) if self.is_frame else chunks
+
+
+def is_stream(result: Any) -> bool:
+    return isinstance(result, Iterator)
+
+
+def write_chunks(stream: Iterator[Any], folder: str) -> ChunkedResult:
+    """
+    Consumes stream, pickling each chunk to a new chunk file of folder as it
+    arrives. The file is written under a temporary name and renamed once
+    complete, so a failing generator leaves no partial chunk file.
+    """
+    chunks_dir = os.path.join(folder, CHUNKS_DIR)
+    os.makedirs(chunks_dir, exist_ok=True)
+    file_name = f"{uuid.uuid4().hex}.chunks"
+    tmp_path = os.path.join(chunks_dir, f".{file_name}.tmp")
+    offsets = []
+    rows = 0
+    columns = None
+    frames = True
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in stream:
+                offsets.append(f.tell())
+                pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                if is_dataframe(chunk):
+                    rows += len(chunk)
+                    columns = list(chunk.columns) if columns is None else columns
+                else:
+                    frames = False
+            nbytes = f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, os.path.join(chunks_dir, file_name))
+    if not (frames and offsets):
+        rows = columns = None
+    return ChunkedResult(file_name, offsets, nbytes, rows, columns).bind(folder)
+
+
+def collect_chunks(stream: Iterator[Any]) -> Any:
+    """In-memory fallback of write_chunks: one DataFrame if every chunk is one, else the list of chunks."""
+    chunks = list(stream)
+    if chunks and all(is_dataframe(chunk) for chunk in chunks):
+        return pd.concat(chunks)
+    return chunks
+
+
+def materialize(result: Any) -> Any:
+    return result.materialize() if isinstance(result, ChunkedResult) else result
+
+
+def is_dataframe(result: Any) -> bool:
+    """isinstance(result, pd.DataFrame), without importing pandas in a process that never did."""
+    pandas = loaded("pandas")
+    return pandas is not None and isinstance(result, pandas.DataFrame)
+
+
+def is_frame(result: Any) -> bool:
+    """DataFrame results, in memory or chunked."""
+    return is_dataframe(result) or (isinstance(result, ChunkedResult) and result.is_frame)
+
+
+def frame_columns(result: Any) -> list:
+    return list(result.columns)
+
+
+def frame_rows(result: Any) -> int:
+    return len(result) if is_dataframe(result) else result.rows
+
+
+def iter_frames(result: Any) -> Iterator["pd.DataFrame"]:
+    if is_dataframe(result):
+        yield result
+    else:
+        yield from result.iter_chunks()
+
+
+def frames_equal(before: Any, after: Any) -> bool:
+    """
+    DataFrame.equals of two frame results, in memory or chunked. Chunked
+    results are compared slice by slice as their chunks are read, whatever
+    the chunk boundaries of each side, so at most one chunk of each side is
+    in memory.
+    """
+    if is_dataframe(before) and is_dataframe(after):
+        return before.equals(after)
+    if frame_columns(before) != frame_columns(after) or frame_rows(before) != frame_rows(after):
+        return False
+    chunks_before = (chunk for chunk in iter_frames(before) if len(chunk))
+    chunks_after = (chunk for chunk in iter_frames(after) if len(chunk))
+    left = right = None
+    while True:
+        if left is None:
+            left = next(chunks_before, None)
+        if right is None:
+            right = next(chunks_after, None)
+        if left is None or right is None:
+            return left is None and right is None
+        n = min(len(left), len(right))
+        if not left.iloc[:n].equals(right.iloc[:n]):
+            return False
+        left = left.iloc[n:] if n < len(left) else None
+        right = right.iloc[n:] if n < len(right) else None
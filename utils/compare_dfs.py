@@ -1,12 +1,23 @@
 import pandas as pd
 import numpy as np
+from pandas.api.types import union_categoricals
+
+from utils.fingerprint import column_changes
 
 def compare_dfs(df_before, df_after, key_columns, path_before=None, path_after=None):
-    df_before, df_after = join_by_key_column(df_before, df_after, key_columns)
-    df_mask = df_before.compare(df_after, keep_shape=True).notnull().astype('int')
-    if "index_key" in df_mask.columns:
-        df_mask = df_mask.drop(columns=["index_key"])
+    # only the key columns and the common columns whose content hashes differ are aligned and shown
+    changed = column_changes(df_before, df_after, key_columns)["changed_columns"]
+    df_before, df_after = join_by_key_column(
+        _select(df_before, key_columns, changed), _select(df_after, key_columns, changed), key_columns
+    )
     df_compare = df_before.compare(df_after, keep_shape=True, keep_equal=True)
+    # highlight the cells DataFrame.compare would keep without keep_equal, instead of comparing twice
+    changed = {col: _changed(df_before[col], df_after[col]) for col in df_compare.columns.get_level_values(0).unique()}
+    df_mask = pd.DataFrame({
+        (col, side): (changed[col] & (df_before if side == 'self' else df_after)[col].notna().to_numpy()).astype(int)
+        for col, side in df_compare.columns
+        if col != "index_key"
+    }, index=df_before.index)
     
     def highlight_changes(_):
         styles = np.where(df_mask,
@@ -24,19 +35,164 @@ def compare_dfs(df_before, df_after, key_columns, path_before=None, path_after=N
     return df_compare.style.apply(highlight_changes, axis=None)
 
 
+def _select(df: pd.DataFrame, key_columns: list[str], columns: list) -> pd.DataFrame:
+    """The key columns and the given columns of df (all of df if that is every column)."""
+    selected = list(key_columns) + [c for c in columns if c not in key_columns]
+    return df if len(selected) == df.shape[1] else df[selected]
+
+
+def _key_codes(key_arrays: list) -> np.ndarray:
+    """
+    One integer code per row for a composite key, equal codes for equal keys
+    (NaN equal to NaN), numbered in order of first appearance.
+    """
+    combined = np.zeros(len(key_arrays[0]), dtype=np.int64)
+    for values in key_arrays:
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        combined, _ = pd.factorize(combined * (len(uniques) + 1) + codes)
+    return combined
+
+
+def _occurrences(codes: np.ndarray) -> np.ndarray:
+    """Rank of each row among the rows with the same code: 0, 1, ..."""
+    return pd.Series(codes).groupby(codes).cumcount().to_numpy()
+
+
+def _concat_keys(before: pd.Series, after: pd.Series) -> pd.Series:
+    """
+    The key values of both sides, before first. Categoricals with different
+    categories stay categorical, on the union of their categories.
+    """
+    if not len(after) or not len(before):
+        # concatenating an empty side would change the dtype (and warns)
+        return (after if len(after) else before).reset_index(drop=True)
+    if isinstance(before.dtype, pd.CategoricalDtype) and isinstance(after.dtype, pd.CategoricalDtype):
+        try:
+            return pd.Series(union_categoricals([before.array, after.array]), copy=False)
+        except TypeError:
+            # ordered with different categories, or categories of different types
+            pass
+    return pd.concat([before, after], ignore_index=True)
+
+
+def _frame(columns: list, arrays: list) -> pd.DataFrame:
+    """A frame of the given arrays, without copying them."""
+    out = pd.DataFrame(dict(enumerate(arrays)), copy=False)
+    out.columns = pd.Index(columns, tupleize_cols=False)
+    return out
+
+
 def join_by_key_column(
         df_before: pd.DataFrame, df_after: pd.DataFrame, key_columns: list[str]) -> tuple[pd.DataFrame, pd.DataFrame]:
-    if not key_columns:
-        df_before = df_before.reset_index().rename(columns={'index': 'index_key'})
-        df_after  = df_after.reset_index().rename(columns={'index': 'index_key'})
-        key_columns = ['index_key']
-    key_column_values = set([tuple(v) for v in list(df_before[key_columns].values)])
-    key_column_values.update(set([tuple(v) for v in list(df_after[key_columns].values)]))
-    key_column_df = pd.DataFrame(list(key_column_values), columns=key_columns)
-    df_before = key_column_df.merge(df_before, on=key_columns, how='left', suffixes=('', '_before'))
-    df_after = key_column_df.merge(df_after, on=key_columns, how='left', suffixes=('', '_after'))
+    """
+    Aligns both frames on the union of their keys (the key columns, or the
+    index as an 'index_key' column if there are none): both results have one
+    row per key, in order of first appearance, with the key columns first and
+    missing values where a side has no row for the key. Rows with a repeated
+    key are paired in order of appearance.
+    Keys are factorized to integer codes instead of being built as tuples,
+    and columns are taken through their arrays, so categoricals and
+    Arrow-backed strings keep their dtype and no full copy is made besides
+    the aligned frames.
+    """
+    if key_columns:
+        keys = key_columns
+        keys_before = [df_before[k] for k in keys]
+        keys_after = [df_after[k] for k in keys]
+        values_before = df_before.drop(columns=keys)
+        values_after = df_after.drop(columns=keys)
+    else:
+        keys = ['index_key']
+        keys_before = [pd.Series(df_before.index.array, copy=False)]
+        keys_after = [pd.Series(df_after.index.array, copy=False)]
+        values_before, values_after = df_before, df_after
+
+    all_keys = [_concat_keys(b, a) for b, a in zip(keys_before, keys_after)]
+    codes = _key_codes(all_keys)
+    n_before = len(df_before)
+    if len(np.unique(codes[:n_before])) < n_before or len(np.unique(codes[n_before:])) < len(df_after):
+        occurrences = np.concatenate([_occurrences(codes[:n_before]), _occurrences(codes[n_before:])])
+        codes = _key_codes([codes, occurrences])
+
+    n_keys = int(codes.max()) + 1 if len(codes) else 0
+    first = np.empty(n_keys, dtype=np.int64)
+    first[codes[::-1]] = np.arange(len(codes))[::-1]
+    at_before = np.full(n_keys, -1, dtype=np.int64)
+    at_before[codes[:n_before]] = np.arange(n_before)
+    at_after = np.full(n_keys, -1, dtype=np.int64)
+    at_after[codes[n_before:]] = np.arange(len(df_after))
+
+    # taking through the arrays keeps categorical and Arrow dtypes; -1 gives missing values
+    key_arrays = [values.array.take(first) for values in all_keys]
+    df_before = _frame(keys + list(values_before.columns), key_arrays + [
+        values_before.iloc[:, i].array.take(at_before, allow_fill=True) for i in range(values_before.shape[1])
+    ])
+    df_after = _frame(keys + list(values_after.columns), key_arrays + [
+        values_after.iloc[:, i].array.take(at_after, allow_fill=True) for i in range(values_after.shape[1])
+    ])
     return df_before, df_after
-    
+
+
+def _values_equal(before: pd.Series, after: pd.Series) -> pd.Series:
+    try:
+        return before == after
+    except TypeError:
+        pass
+    if isinstance(before.dtype, pd.CategoricalDtype) and isinstance(after.dtype, pd.CategoricalDtype):
+        # categoricals with different categories: compare codes over the union of the categories
+        categories = before.cat.categories.union(after.cat.categories)
+        try:
+            return before.cat.set_categories(categories) == after.cat.set_categories(categories)
+        except TypeError:
+            pass
+    return before.astype(object) == after.astype(object)
+
+
+def _changed(before: pd.Series, after: pd.Series) -> np.ndarray:
+    """
+    Cells that differ, as a plain bool array: NaN on both sides counts as
+    equal, a missing value against a value as a change (nullable and Arrow
+    dtypes compare to NA there).
+    """
+    equal = _values_equal(before, after).to_numpy(dtype=bool, na_value=False)
+    return ~(equal | (before.isna().to_numpy() & after.isna().to_numpy()))
+
+
+def diff_cells(df_before: pd.DataFrame, df_after: pd.DataFrame, key_columns: list[str]) -> pd.DataFrame:
+    """
+    Long-format list of the cells that differ once both frames are aligned by key:
+    one row per (key, column) with the value before and after.
+    NaN on both sides counts as equal.
+    Per-column content hashes are compared first: only the columns whose
+    hash differs, and the columns of one side only, are aligned and diffed.
+    """
+    changes = column_changes(df_before, df_after, key_columns)
+    to_diff = changes["changed_columns"] + [c for c in df_before.columns if c not in df_after.columns]
+    to_diff += [c for c in df_after.columns if c not in df_before.columns]
+    df_before, df_after = join_by_key_column(
+        _select(df_before, key_columns, [c for c in to_diff if c in df_before.columns]),
+        _select(df_after, key_columns, [c for c in to_diff if c in df_after.columns]),
+        key_columns,
+    )
+    keys = key_columns or ['index_key']
+    value_columns = [c for c in df_before.columns.union(df_after.columns, sort=False) if c not in keys]
+    # a column on one side only is compared with missing values, without reindexing whole frames
+    missing = pd.Series(np.nan, index=df_before.index)
+    parts = []
+    for col in value_columns:
+        before = df_before[col] if col in df_before.columns else missing
+        after = df_after[col] if col in df_after.columns else missing
+        changed = _changed(before, after)
+        if changed.any():
+            part = df_before.loc[changed, keys].copy()
+            part["column"] = col
+            part["before"] = before[changed].to_numpy()
+            part["after"] = after[changed].to_numpy()
+            parts.append(part)
+    if not parts:
+        return pd.DataFrame(columns=keys + ["column", "before", "after"])
+    return pd.concat(parts, ignore_index=True)
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,341 @@
+import hashlib
+import pickle
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.chunked import ChunkedResult, is_frame, iter_frames
+
+
+def result_digest(result) -> str:
+    """
+    Content hash of a run result. Two DataFrames get the same digest when they
+    have the same columns, dtypes, index and values (NaN equal to NaN, as in
+    DataFrame.equals); other results are hashed through their pickle.
+    Chunked DataFrame results are hashed chunk by chunk and get the digest
+    of the same rows in one DataFrame. A ResultFingerprint (a fingerprint
+    baseline run) gives the digest of the result it was made from.
+    """
+    if isinstance(result, ResultFingerprint):
+        return result.digest
+    h = hashlib.sha1()
+    if isinstance(result, ChunkedResult) and result.is_frame:
+        first = next(result.iter_chunks())
+        h.update(b"frame")
+        h.update(repr(list(first.columns)).encode())
+        h.update(repr([str(t) for t in first.dtypes]).encode())
+        for chunk in result.iter_chunks():
+            h.update(pd.util.hash_pandas_object(chunk.index, index=False).to_numpy().tobytes())
+        if first.shape[1]:
+            for chunk in result.iter_chunks():
+                h.update(pd.util.hash_pandas_object(chunk, index=False).to_numpy().tobytes())
+    elif isinstance(result, ChunkedResult):
+        h.update(b"object")
+        h.update(pickle.dumps(result.materialize(), protocol=4))
+    elif isinstance(result, pd.DataFrame):
+        h.update(b"frame")
+        h.update(repr(list(result.columns)).encode())
+        h.update(repr([str(t) for t in result.dtypes]).encode())
+        h.update(pd.util.hash_pandas_object(result.index, index=False).to_numpy().tobytes())
+        if result.shape[1]:
+            h.update(pd.util.hash_pandas_object(result, index=False).to_numpy().tobytes())
+    else:
+        h.update(b"object")
+        h.update(pickle.dumps(result, protocol=4))
+    return h.hexdigest()
+
+
+@dataclass
+class ResultFingerprint:
+    """
+    Compact stand-in for a run result in fingerprint baselines: the
+    result_digest plus, for DataFrames, the columns and dtypes, the key of
+    each row (hash of its key_columns, or of its index when key_columns is
+    None), one hash per row (its values, in row order), the
+    keyed_column_hashes of the frame and per-column summary statistics.
+    About 16 bytes per row instead of the values.
+    """
+    digest: str
+    is_frame: bool
+    rows: Optional[int] = None
+    columns: Optional[list] = None
+    dtypes: Optional[List[str]] = None
+    column_hashes: Optional[Dict[Any, str]] = None
+    row_hashes: Optional[np.ndarray] = None
+    key_hashes: Optional[np.ndarray] = None
+    stats: Optional[Dict[Any, dict]] = None
+    key_columns: Optional[List[str]] = None
+
+    def __repr__(self) -> str:
+        if self.is_frame:
+            return f"ResultFingerprint({self.rows} rows x {len(self.columns)} columns, {self.digest[:12]})"
+        return f"ResultFingerprint({self.digest[:12]})"
+
+
+def _python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _merge_stats(stats: Optional[dict], column: pd.Series) -> dict:
+    chunk = {"count": int(column.count()), "nulls": int(column.isna().sum())}
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column) and chunk["count"]:
+        chunk.update(min=_python(column.min()), max=_python(column.max()), sum=_python(column.sum()))
+    if stats is None:
+        return chunk
+    merged = {"count": stats["count"] + chunk["count"], "nulls": stats["nulls"] + chunk["nulls"]}
+    if "sum" in stats and "sum" in chunk:
+        merged.update(
+            min=min(stats["min"], chunk["min"]), max=max(stats["max"], chunk["max"]), sum=stats["sum"] + chunk["sum"]
+        )
+    else:
+        merged.update({k: v for k, v in {**stats, **chunk}.items() if k in ("min", "max", "sum")})
+    return merged
+
+
+def _add_hashes(total: Any, value: Any) -> Any:
+    # keyed column hashes are sums mod 2**64, so chunks add up; unhashable columns stay unhashable
+    if isinstance(total, int) and isinstance(value, int):
+        return (total + value) & 0xFFFFFFFFFFFFFFFF
+    return value if isinstance(total, int) else total
+
+
+def fingerprint_result(result, key_columns: Optional[List[str]] = None) -> ResultFingerprint:
+    """
+    Fingerprints a run result (DataFrame, chunked or any other object).
+    Chunked results are read chunk by chunk. Rows are keyed by key_columns
+    when every key column is in the result, by their index otherwise.
+    """
+    if isinstance(result, ResultFingerprint):
+        return result
+    digest = result_digest(result)
+    if not is_frame(result):
+        return ResultFingerprint(digest, is_frame=False)
+
+    columns = dtypes = keys = None
+    column_hashes: Dict[Any, Any] = {}
+    stats: Dict[Any, dict] = {}
+    row_hashes, key_hashes = [], []
+    rows = 0
+    for chunk in iter_frames(result):
+        if columns is None:
+            columns = list(chunk.columns)
+            dtypes = [str(t) for t in chunk.dtypes]
+            keyed = bool(key_columns) and all(k in chunk.columns for k in key_columns)
+            keys = list(key_columns) if keyed else None
+        rows += len(chunk)
+        chunk_keys = row_keys(chunk, keys)
+        key_hashes.append(chunk_keys)
+        if chunk.shape[1]:
+            row_hashes.append(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+        else:
+            row_hashes.append(np.zeros(len(chunk), dtype=np.uint64))
+        for column, value in keyed_column_hashes(chunk, keys, chunk_keys).items():
+            column_hashes[column] = _add_hashes(column_hashes.get(column, 0), value)
+        for position, column in enumerate(columns):
+            stats[column] = _merge_stats(stats.get(column), chunk.iloc[:, position])
+    for column in columns:
+        if "sum" in stats[column]:
+            stats[column]["mean"] = stats[column]["sum"] / stats[column]["count"]
+    return ResultFingerprint(
+        digest,
+        is_frame=True,
+        rows=rows,
+        columns=columns,
+        dtypes=dtypes,
+        column_hashes=column_hashes,
+        row_hashes=np.concatenate(row_hashes) if row_hashes else np.empty(0, dtype=np.uint64),
+        key_hashes=np.concatenate(key_hashes) if key_hashes else np.empty(0, dtype=np.uint64),
+        stats=stats,
+        key_columns=keys,
+    )
+
+
+# odd multipliers of the splitmix64 finalizer, used to hash (key, value) pairs
+_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+
+def _pair_hash_sum(keys: np.ndarray, values: np.ndarray, buffer: np.ndarray, scratch: np.ndarray) -> int:
+    """
+    Sum of the hashes of the (key, value) pairs of one column, values being
+    uint64 (bits of numbers or hashes of other values). Works in place in
+    buffer and scratch, preallocated uint64 arrays as long as the column.
+    """
+    np.multiply(values, _MIX[0], out=buffer, casting="unsafe")
+    buffer += keys
+    for shift, factor in ((30, _MIX[1]), (27, _MIX[2])):
+        np.right_shift(buffer, np.uint64(shift), out=scratch)
+        buffer ^= scratch
+        buffer *= factor
+    np.right_shift(buffer, np.uint64(31), out=scratch)
+    buffer ^= scratch
+    return int(buffer.sum(dtype=np.uint64))
+
+
+def row_keys(df: pd.DataFrame, key_columns: Optional[List[str]] = None) -> np.ndarray:
+    """The key of each row of df: hash of its key columns or, without key columns, of its index."""
+    if key_columns:
+        return pd.util.hash_pandas_object(df[key_columns], index=False).to_numpy()
+    return pd.util.hash_pandas_object(df.index, index=False).to_numpy()
+
+
+def keyed_column_hashes(
+        df: pd.DataFrame,
+        key_columns: Optional[List[str]] = None,
+        keys: Optional[np.ndarray] = None) -> Dict[Any, Any]:
+    """
+    One content hash per non-key column of df, independent of the row order:
+    the sum of the hashes of the (key, value) pairs of its rows, the key
+    being the key columns or, without key columns, the index (see row_keys;
+    keys are the row_keys when already computed). Two frames get the same
+    hash for a column when it holds the same value for each key, whatever
+    the order of their rows. Hashes are ints, sums mod 2**64, so the hashes
+    of the chunks of a frame add up to the hashes of the frame.
+    Numeric columns are hashed from their bits, in place, so a wide frame
+    costs a few passes over its values and no copy.
+    """
+    if keys is None:
+        keys = row_keys(df, key_columns)
+    buffer = np.empty(len(df), dtype=np.uint64)
+    scratch = np.empty(len(df), dtype=np.uint64)
+
+    hashes = {}
+    with np.errstate(over="ignore"):
+        for position, (column, dtype) in enumerate(zip(df.columns, df.dtypes)):
+            if key_columns and column in key_columns:
+                continue
+            if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+                values = df.iloc[:, position].to_numpy()
+                values = values.view(f"u{dtype.itemsize}")
+            else:
+                try:
+                    values = pd.util.hash_pandas_object(df.iloc[:, position], index=False).to_numpy()
+                except TypeError:
+                    # unhashable values (e.g. lists): never equal to anything, so always diffed
+                    hashes[column] = object()
+                    continue
+            hashes[column] = _pair_hash_sum(keys, values, buffer, scratch)
+    return hashes
+
+
+def schema_diff(
+        columns_before: list,
+        dtypes_before: List[str],
+        columns_after: list,
+        dtypes_after: List[str],
+        hashes_before: Optional[Dict[Any, Any]] = None,
+        hashes_after: Optional[Dict[Any, Any]] = None) -> dict:
+    """
+    Schema changes between two frames:
+    - added_columns and removed_columns
+    - renamed_columns: (before, after) pairs of a removed and an added column
+      with the same dtype and content hash, when hashes are given
+    - dtype_changes: (column, dtype before, dtype after) of common columns
+    """
+    dtypes_before = dict(zip(columns_before, dtypes_before))
+    dtypes_after = dict(zip(columns_after, dtypes_after))
+    added = [c for c in columns_after if c not in dtypes_before]
+    removed = [c for c in columns_before if c not in dtypes_after]
+    renamed = []
+    if hashes_before and hashes_after:
+        for old in list(removed):
+            new = next((
+                c for c in added
+                if dtypes_after[c] == dtypes_before[old] and hashes_after.get(c) == hashes_before.get(old)
+            ), None)
+            if new is not None:
+                renamed.append((old, new))
+                removed.remove(old)
+                added.remove(new)
+    return {
+        "added_columns": added,
+        "removed_columns": removed,
+        "renamed_columns": renamed,
+        "dtype_changes": [
+            (c, dtypes_before[c], dtypes_after[c])
+            for c in columns_after if c in dtypes_before and dtypes_before[c] != dtypes_after[c]
+        ],
+    }
+
+
+def column_changes(df_before: pd.DataFrame, df_after: pd.DataFrame, key_columns: Optional[List[str]] = None) -> dict:
+    """
+    schema_diff of two frames, plus changed_columns: the common non-key
+    columns whose keyed_column_hashes differ (values or dtype), i.e. the
+    only columns a row-aligned value diff needs to look at.
+    """
+    hashes_before = keyed_column_hashes(df_before, key_columns)
+    hashes_after = keyed_column_hashes(df_after, key_columns)
+    diff = schema_diff(
+        list(df_before.columns), [str(t) for t in df_before.dtypes],
+        list(df_after.columns), [str(t) for t in df_after.dtypes],
+        hashes_before, hashes_after,
+    )
+    diff["changed_columns"] = [
+        c for c in hashes_after if c in hashes_before and hashes_before[c] != hashes_after[c]
+    ]
+    return diff
+
+
+def describe_column_changes(diff: dict) -> str:
+    """
+    The "Changed Columns" cell of a record: changed columns, then added ones
+    prefixed with "+", removed ones with "-" and renamed ones as before→after.
+    """
+    return ", ".join(
+        [str(c) for c in diff["changed_columns"]]
+        + [f"+{c}" for c in diff["added_columns"]]
+        + [f"-{c}" for c in diff["removed_columns"]]
+        + [f"{old}→{new}" for old, new in diff["renamed_columns"]]
+    )
+
+
+def _matched_by_key(before: ResultFingerprint, after: ResultFingerprint) -> bool:
+    return (
+        before.key_columns == after.key_columns
+        and before.key_hashes is not None and after.key_hashes is not None
+        and len(np.unique(before.key_hashes)) == len(before.key_hashes)
+        and len(np.unique(after.key_hashes)) == len(after.key_hashes)
+    )
+
+
+def diff_fingerprints(before: ResultFingerprint, after: ResultFingerprint) -> dict:
+    """
+    Where two frame fingerprints differ:
+    - the schema_diff of both frames, renamed columns found by content hash
+    - changed_columns: common columns with a different dtype or values
+    - changed_rows: number of rows that differ. Rows are matched by key
+      (key columns, or index) when both sides have the same key columns and
+      unique keys, by position otherwise; rows present on one side only
+      count as changed
+    """
+    columns_before, columns_after = before.columns or [], after.columns or []
+    schema = schema_diff(
+        columns_before, before.dtypes or [], columns_after, after.dtypes or [],
+        before.column_hashes, after.column_hashes,
+    )
+    dtypes_before = dict(zip(columns_before, before.dtypes or []))
+    dtypes_after = dict(zip(columns_after, after.dtypes or []))
+    changed_columns = [
+        column for column in columns_after
+        if column in dtypes_before and (
+            dtypes_before[column] != dtypes_after[column]
+            or before.column_hashes.get(column) != after.column_hashes.get(column)
+        )
+    ]
+
+    if _matched_by_key(before, after):
+        _, at_before, at_after = np.intersect1d(before.key_hashes, after.key_hashes, return_indices=True)
+        differing = int(np.count_nonzero(before.row_hashes[at_before] != after.row_hashes[at_after]))
+        # rows of either side without a match
+        one_sided = len(before.key_hashes) + len(after.key_hashes) - 2 * len(at_after)
+    else:
+        common = min(len(before.row_hashes), len(after.row_hashes))
+        differing = int(np.count_nonzero(before.row_hashes[:common] != after.row_hashes[:common]))
+        one_sided = len(before.row_hashes) + len(after.row_hashes) - 2 * common
+    return {
+        **schema,
+        "changed_columns": changed_columns,
+        "changed_rows": differing + one_sided,
+    }
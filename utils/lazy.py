@@ -0,0 +1,67 @@
+"""
+Deferred imports of heavy modules (pandas, numpy and the modules built on
+them), so that the app, its pages and the run workers only pay for them
+on the code paths that use them:
+
+    pd = lazy_import("pandas")
+
+binds a stand-in that imports pandas on the first attribute access
+(pd.DataFrame, pd.concat...) and behaves like the module afterwards.
+Names used at module level (annotations, constants) would import it right
+away: annotations of lazily imported types are written as strings.
+"""
+import sys
+import time
+import importlib
+from types import ModuleType
+from typing import Dict, Optional
+
+# Seconds spent importing each lazily imported module, in this process
+IMPORT_SECONDS: Dict[str, float] = {}
+
+
+class LazyModule(ModuleType):
+    """Stand-in for a module, imported on the first attribute access."""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            name = self.__name__
+            imported = name in sys.modules
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            if not imported:
+                IMPORT_SECONDS[name] = time.perf_counter() - start
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        value = getattr(self._load(), attr)
+        # later accesses are plain attribute lookups
+        self.__dict__[attr] = value
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name: str) -> ModuleType:
+    """The module if it is already imported, a LazyModule otherwise."""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def loaded(name: str) -> Optional[ModuleType]:
+    """
+    The module if some code already imported it, None otherwise: an object
+    cannot be an instance of a class of a module that was never imported,
+    so type checks do not need to import it.
+    """
+    return sys.modules.get(name)
@@ -0,0 +1,107 @@
+import gc
+import os
+import sys
+import time
+import pickle
+import threading
+import tracemalloc
+from typing import Any, Optional
+
+from utils.chunked import ChunkedResult, is_dataframe
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of a process (this one by default), None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def result_size(result: Any) -> Optional[int]:
+    """
+    Size of a result in bytes: deep memory usage for DataFrames, the size of
+    the chunk file for chunked results, the pickled size otherwise.
+    """
+    if isinstance(result, ChunkedResult):
+        return result.nbytes
+    if is_dataframe(result):
+        return int(result.memory_usage(index=True, deep=True).sum())
+    try:
+        return len(pickle.dumps(result))
+    except Exception:
+        return sys.getsizeof(result)
+
+
+def _gc_collections() -> int:
+    return sum(generation["collections"] for generation in gc.get_stats())
+
+
+# tracemalloc is process-wide: meters share it, started by the first one to
+# enter (unless an outer tracer already runs) and stopped by the last to exit
+_tracing_lock = threading.Lock()
+_active_meters: set = set()
+_started_tracing = False
+
+
+def _fold_peak() -> None:
+    """
+    Folds the peak traced memory since the last fold into every active
+    meter, then resets it. Called with _tracing_lock held, whenever a meter
+    enters or exits, so no meter's peak is lost to another's reset.
+    """
+    traced, peak = tracemalloc.get_traced_memory()
+    for meter in _active_meters:
+        meter._peak = max(meter._peak, peak - meter._traced_start)
+    tracemalloc.reset_peak()
+
+
+class ResourceMeter:
+    """
+    Measures the resource footprint of the code run inside the with block:
+    peak Python allocations (tracemalloc), RSS delta, CPU time and GC
+    collections. They are those of the process, so they include other
+    threads of the same process, e.g. meters of concurrent jobs or calls.
+    Meters can be nested and used from several threads at once.
+    """
+
+    def __init__(self):
+        self.usage: dict = {}
+
+    def __enter__(self) -> "ResourceMeter":
+        global _started_tracing
+        with _tracing_lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _started_tracing = True
+            elif _active_meters:
+                _fold_peak()
+            else:
+                # an outer tracer (e.g. a profiler) is left running
+                tracemalloc.reset_peak()
+            self._traced_start = tracemalloc.get_traced_memory()[0]
+            self._peak = 0
+            _active_meters.add(self)
+        self._rss_start = rss_bytes()
+        self._gc_start = _gc_collections()
+        self._cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        global _started_tracing
+        cpu_time = time.process_time() - self._cpu_start
+        gc_collections = _gc_collections() - self._gc_start
+        rss_end = rss_bytes()
+        with _tracing_lock:
+            _fold_peak()
+            _active_meters.discard(self)
+            if not _active_meters and _started_tracing:
+                tracemalloc.stop()
+                _started_tracing = False
+        self.usage = {
+            "peak_alloc": max(self._peak, 0),
+            "rss_delta": rss_end - self._rss_start if rss_end is not None and self._rss_start is not None else None,
+            "cpu_time": cpu_time,
+            "gc_collections": gc_collections,
+        }